@@ -0,0 +1,345 @@
+"""Caché de avatares de Roblox: nombre de usuario -> ID de Roblox -> URL del rostro.
+
+Tiene dos niveles: un LRU en memoria y la tabla ``roblox_avatares``, que
+sobrevive a los reinicios. Una entrada es fresca durante ``fresh_ttl``; pasado
+ese tiempo se sigue entregando (stale-while-revalidate) mientras una tarea en
+segundo plano la actualiza, hasta ``max_stale``. Los usuarios inexistentes se
+guardan como entrada negativa y se vuelven a consultar tras ``negative_ttl``.
+
+Los embeds usan ``avatar_for(cedula)``, que nunca espera a Roblox: si la URL de
+la cédula quedó vieja, la actualización en segundo plano la corrige también en
+``cedulas.avatar_url``. Además, ``refresh_stale`` recorre todas las cédulas
+periódicamente y renueva las vencidas con llamadas por lotes de hasta 100 IDs.
+
+Las búsquedas simultáneas del mismo usuario (varios /crear-cedula a la vez, un
+reintento tras un timeout, una revalidación en curso) comparten una sola
+consulta a Roblox (single-flight).
+
+``resolve`` espera a Roblox como máximo ``lookup_deadline`` segundos. Si no
+alcanza (o Roblox está caído), devuelve el avatar por defecto y deja en cola un
+reintento en segundo plano que, cuando consigue la URL, la escribe en la cédula.
+"""
+import asyncio
+import logging
+import time
+from collections import namedtuple
+from datetime import datetime
+
+import db
+import entity_cache
+from entity_cache import MISSING, TTLCache
+from resilience import SingleFlight, backoff_delay
+from roblox import DEFAULT_AVATAR_URL, HEADSHOT_FALLBACK_URL, MAX_BATCH, RobloxCircuitOpen, RobloxUnavailable
+
+logger = logging.getLogger('bot.avatar_cache')
+
+# ``refreshed_at`` en segundos epoch; ``roblox_user_id`` None = el usuario no existe
+AvatarEntry = namedtuple('AvatarEntry', ['roblox_user_id', 'avatar_url', 'refreshed_at'])
+
+
+# Cédulas junto con su entrada de caché (si la hay), recorridas por user_id
+_SCAN_QUERY = '''
+SELECT c.user_id, c.usuario_roblox, c.avatar_url, a.roblox_user_id, a.avatar_url, a.refreshed_at
+FROM cedulas c
+LEFT JOIN roblox_avatares a ON a.username = LOWER(c.usuario_roblox)
+WHERE c.user_id > %s
+ORDER BY c.user_id
+LIMIT %s
+'''
+
+
+def _entry_from_row(values):
+    roblox_user_id, avatar_url, refreshed_at = values
+    return AvatarEntry(roblox_user_id, avatar_url, refreshed_at.timestamp())
+
+
+class AvatarCache:
+    """Resuelve avatares con caché en memoria y en base de datos."""
+
+    def __init__(self, client, fresh_ttl=86400.0, max_stale=7 * 86400.0, negative_ttl=3600.0,
+                 memory_size=5000, lookup_deadline=3.0, retry_attempts=5, retry_delay=30.0,
+                 max_retries_pending=500):
+        self.client = client
+        self.fresh_ttl = fresh_ttl
+        self.max_stale = max_stale
+        self.negative_ttl = negative_ttl
+        self.lookup_deadline = lookup_deadline
+        self.retry_attempts = retry_attempts
+        self.retry_delay = retry_delay
+        self.max_retries_pending = max_retries_pending
+        self._memory = TTLCache('avatares', max_size=memory_size, ttl=max_stale)
+        self._revalidating = {}  # username -> tarea en segundo plano
+        self._retrying = {}  # username -> reintento en cola tras una búsqueda fallida
+        self._flights = SingleFlight()
+        self.fetches = 0  # Resoluciones que llegaron a la red
+
+    def _age(self, entry):
+        return time.time() - entry.refreshed_at
+
+    def _is_fresh(self, entry):
+        ttl = self.fresh_ttl if entry.roblox_user_id else self.negative_ttl
+        return self._age(entry) < ttl
+
+    def _is_usable(self, entry):
+        return entry is not None and self._age(entry) < self.max_stale
+
+    async def _load(self, key):
+        """Entrada de la tabla (y la deja en memoria), o None."""
+        entry = self._memory.get(key)
+        if entry is not MISSING:
+            return entry
+        entry = await db.fetch_one(
+            'SELECT roblox_user_id, avatar_url, refreshed_at FROM roblox_avatares WHERE username = %s',
+            (key,), row=_entry_from_row
+        )
+        if entry is not None:
+            self._memory.set(key, entry)
+        return entry
+
+    async def _store(self, key, entry):
+        self._memory.set(key, entry)
+        refreshed_at = datetime.fromtimestamp(entry.refreshed_at).replace(microsecond=0)
+        await db.execute(
+            'REPLACE INTO roblox_avatares (username, roblox_user_id, avatar_url, refreshed_at) VALUES (%s, %s, %s, %s)',
+            (key, entry.roblox_user_id, entry.avatar_url, refreshed_at)
+        )
+
+    async def _fetch_shared(self, key, previous):
+        """``_fetch`` coalescido: una sola consulta a Roblox por usuario a la vez."""
+        return await self._flights.do(key, self._fetch, key, previous)
+
+    async def _fetch(self, key, previous):
+        """Consulta Roblox y guarda el resultado; el ID de Roblox ya conocido no se vuelve a buscar."""
+        self.fetches += 1
+        roblox_user_id = previous.roblox_user_id if previous else None
+        if not roblox_user_id:
+            roblox_user_id = await self.client.find_user_id(key)
+        avatar_url = None
+        refreshed_at = time.time()
+        if roblox_user_id:
+            try:
+                avatar_url = await self.client.headshot_url(roblox_user_id)
+            except RobloxUnavailable as e:
+                # Se guarda como vencida para reintentarla en el próximo uso
+                logger.warning(f"API de miniaturas no disponible para {key}: {e}")
+                refreshed_at -= self.fresh_ttl
+            # Si la API de miniaturas no trae la imagen, la URL directa redirige al rostro actual
+            avatar_url = avatar_url or HEADSHOT_FALLBACK_URL.format(user_id=roblox_user_id)
+        entry = AvatarEntry(roblox_user_id, avatar_url, refreshed_at)
+        await self._store(key, entry)
+        return entry
+
+    async def resolve(self, username, user_id=None):
+        """URL del avatar para ``username``; solo espera a Roblox si no hay nada utilizable en caché.
+
+        La espera se corta a los ``lookup_deadline`` segundos. En ese caso, o si
+        Roblox no está disponible, se devuelve la URL anterior o la por defecto y
+        se encola un reintento que corrige ``cedulas.avatar_url`` de ``user_id``.
+        """
+        key = username.lower()
+        entry = await self._load(key)
+        if self._is_usable(entry):
+            if not self._is_fresh(entry):
+                self._revalidate_later(key)
+            return entry.avatar_url or DEFAULT_AVATAR_URL
+        fallback_url = (entry and entry.avatar_url) or DEFAULT_AVATAR_URL
+        try:
+            # La consulta compartida sigue en segundo plano si se corta la espera
+            entry = await asyncio.wait_for(self._fetch_shared(key, entry), self.lookup_deadline)
+        except asyncio.TimeoutError:
+            logger.warning(f"Roblox no respondió a tiempo al resolver {username}; se usa el avatar por defecto")
+            self._retry_later(key, user_id, fallback_url)
+            return fallback_url
+        except RobloxUnavailable as e:
+            logger.warning(f"Roblox no disponible al resolver {username}: {e}")
+            self._retry_later(key, user_id, fallback_url)
+            return fallback_url
+        return entry.avatar_url or DEFAULT_AVATAR_URL
+
+    def avatar_for(self, cedula):
+        """URL del avatar para mostrar la cédula en un embed, sin esperar a la red ni a la base de datos.
+
+        Si la entrada en memoria falta, está vencida o no coincide con la URL
+        guardada en la cédula, se revalida en segundo plano.
+        """
+        key = cedula.usuario_roblox.lower()
+        entry = self._memory.get(key)
+        if entry is MISSING or not self._is_usable(entry):
+            self._revalidate_later(key, cedula)
+            return cedula.avatar_url or DEFAULT_AVATAR_URL
+        if not self._is_fresh(entry) or (entry.avatar_url and entry.avatar_url != cedula.avatar_url):
+            self._revalidate_later(key, cedula)
+        return entry.avatar_url or cedula.avatar_url or DEFAULT_AVATAR_URL
+
+    def _revalidate_later(self, key, cedula=None):
+        if key in self._revalidating:
+            return
+        task = asyncio.create_task(self._revalidate(key, cedula), name=f'avatar:{key}')
+        self._revalidating[key] = task
+        task.add_done_callback(lambda _: self._revalidating.pop(key, None))
+
+    async def _revalidate(self, key, cedula):
+        try:
+            entry = await self._load(key)
+            if entry is None or not self._is_fresh(entry):
+                entry = await self._fetch_shared(key, entry)
+            if cedula is not None and entry.avatar_url and entry.avatar_url != cedula.avatar_url:
+                await db.execute('UPDATE cedulas SET avatar_url = %s WHERE user_id = %s',
+                                 (entry.avatar_url, cedula.user_id))
+                entity_cache.invalidate(user_id=cedula.user_id)
+        except Exception as e:
+            # Es una mejora en segundo plano: si falla, se sigue mostrando la URL anterior
+            logger.warning(f"No se pudo actualizar el avatar de {key}: {e}")
+
+    def _retry_later(self, key, user_id, fallback_url):
+        if key in self._retrying:
+            return
+        if len(self._retrying) >= self.max_retries_pending:
+            # Con Roblox caído por mucho rato, el resto lo corrige refresh_stale o avatar_for
+            logger.debug(f"Cola de reintentos de avatares llena; se descarta {key}")
+            return
+        task = asyncio.create_task(self._retry(key, user_id, fallback_url), name=f'avatar-retry:{key}')
+        self._retrying[key] = task
+        task.add_done_callback(lambda _: self._retrying.pop(key, None))
+
+    async def _retry(self, key, user_id, fallback_url):
+        """Reintenta la búsqueda con backoff y, si la consigue, reemplaza ``fallback_url`` en la cédula."""
+        delay = self.retry_delay
+        for attempt in range(self.retry_attempts):
+            await asyncio.sleep(delay)
+            delay = self.retry_delay + backoff_delay(attempt, self.retry_delay, cap=600.0)
+            try:
+                entry = await self._load(key)
+                if entry is None or not self._is_fresh(entry):
+                    entry = await self._fetch_shared(key, entry)
+            except RobloxCircuitOpen as e:
+                delay = max(delay, e.retry_after)
+                continue
+            except RobloxUnavailable as e:
+                logger.debug(f"Reintento {attempt + 1} del avatar de {key} falló: {e}")
+                continue
+            except Exception as e:
+                logger.warning(f"No se pudo reintentar el avatar de {key}: {e}")
+                return
+            if user_id is not None and entry.avatar_url and entry.avatar_url != fallback_url:
+                try:
+                    # Solo si la cédula sigue con la URL provisoria (no se pisa un cambio posterior)
+                    await db.execute('UPDATE cedulas SET avatar_url = %s WHERE user_id = %s AND avatar_url = %s',
+                                     (entry.avatar_url, user_id, fallback_url))
+                    entity_cache.invalidate(user_id=user_id)
+                except Exception as e:
+                    logger.warning(f"No se pudo guardar el avatar reintentado de {key}: {e}")
+            return
+        logger.info(f"Se agotaron los reintentos del avatar de {key}; se corregirá en el próximo refresco")
+
+    async def refresh_stale(self, chunk_size=1000, batch_size=MAX_BATCH, concurrency=4):
+        """Renueva los avatares vencidos de todas las cédulas; devuelve cuántas cédulas cambiaron.
+
+        Recorre ``cedulas`` por tramos de ``chunk_size`` filas según user_id
+        (keyset, sin OFFSET). Las vencidas de cada tramo se piden a Roblox en lotes
+        de ``batch_size`` con a lo sumo ``concurrency`` lotes en vuelo, y cada lote
+        se escribe con una sentencia de varias filas por tabla.
+        """
+        batch_size = min(batch_size, MAX_BATCH)
+        semaphore = asyncio.Semaphore(concurrency)
+        last_user_id = 0
+        updated = 0
+        while True:
+            rows = await db.fetch_all(_SCAN_QUERY, (last_user_id, chunk_size), row=tuple, timeout=60)
+            if not rows:
+                break
+            last_user_id = rows[-1][0]
+            pending = [row for row in rows if self._needs_refresh(row)]
+            batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+            results = await asyncio.gather(*(self._refresh_batch(batch, semaphore) for batch in batches),
+                                           return_exceptions=True)
+            for result in results:
+                if isinstance(result, Exception):
+                    logger.warning(f"No se pudo actualizar un lote de avatares: {result}")
+                else:
+                    updated += result
+            if len(rows) < chunk_size:
+                break
+        if updated:
+            logger.info(f"Avatares actualizados en {updated} cédulas")
+        return updated
+
+    def _needs_refresh(self, row):
+        _, _, cedula_url, roblox_user_id, cached_url, refreshed_at = row
+        if refreshed_at is None:
+            return True
+        entry = AvatarEntry(roblox_user_id, cached_url, refreshed_at.timestamp())
+        # También las que solo necesitan copiar a la cédula una URL ya renovada
+        return not self._is_fresh(entry) or bool(cached_url and cached_url != cedula_url)
+
+    async def _refresh_batch(self, rows, semaphore):
+        """Renueva un lote de cédulas (a lo sumo ``MAX_BATCH``) y devuelve cuántas cambiaron."""
+        now = time.time()
+        entries = {}  # username -> AvatarEntry vigente
+        stale = {}  # username -> ID de Roblox conocido (o None) de las que hay que renovar
+        for _, username, _, roblox_user_id, cached_url, refreshed_at in rows:
+            key = username.lower()
+            entry = None if refreshed_at is None else AvatarEntry(roblox_user_id, cached_url, refreshed_at.timestamp())
+            if entry is not None and self._is_fresh(entry):
+                entries[key] = entry
+            else:
+                stale[key] = roblox_user_id
+
+        if stale:
+            unknown = [key for key, roblox_user_id in stale.items() if not roblox_user_id]
+            if unknown:
+                async with semaphore:
+                    found = await self.client.find_user_ids(unknown)
+                for key in unknown:
+                    stale[key] = found.get(key)
+            ids = [roblox_user_id for roblox_user_id in stale.values() if roblox_user_id]
+            urls = {}
+            if ids:
+                async with semaphore:
+                    urls = await self.client.headshot_urls(ids)
+            self.fetches += len(stale)
+            for key, roblox_user_id in stale.items():
+                avatar_url = None
+                if roblox_user_id:
+                    avatar_url = urls.get(roblox_user_id) or HEADSHOT_FALLBACK_URL.format(user_id=roblox_user_id)
+                entries[key] = AvatarEntry(roblox_user_id, avatar_url, now)
+
+        changed = [
+            (user_id, entries[username.lower()].avatar_url)
+            for user_id, username, cedula_url, *_ in rows
+            if entries[username.lower()].avatar_url and entries[username.lower()].avatar_url != cedula_url
+        ]
+        refreshed_at = datetime.fromtimestamp(now).replace(microsecond=0)
+        # Los textos cambian con el tamaño del lote: no se preparan
+        async with db.unit_of_work() as tx:
+            if stale:
+                tx.execute(
+                    'REPLACE INTO roblox_avatares (username, roblox_user_id, avatar_url, refreshed_at) VALUES '
+                    + ', '.join(['(%s, %s, %s, %s)'] * len(stale)),
+                    [value for key in stale for value in (key, entries[key].roblox_user_id, entries[key].avatar_url, refreshed_at)],
+                    prepared=False
+                )
+            if changed:
+                tx.execute(
+                    'UPDATE cedulas SET avatar_url = CASE user_id '
+                    + ' '.join(['WHEN %s THEN %s'] * len(changed))
+                    + ' END WHERE user_id IN (' + ', '.join(['%s'] * len(changed)) + ')',
+                    [value for pair in changed for value in pair] + [user_id for user_id, _ in changed],
+                    prepared=False
+                )
+        for key in stale:
+            self._memory.set(key, entries[key])
+        for user_id, _ in changed:
+            entity_cache.invalidate(user_id=user_id)
+        return len(changed)
+
+    async def close(self):
+        """Cancela las actualizaciones y reintentos en curso (se retoman al próximo uso)."""
+        tasks = list(self._revalidating.values()) + list(self._retrying.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self):
+        return {**self._memory.stats(), 'fetches': self.fetches, 'coalesced': self._flights.shared,
+                'revalidating': len(self._revalidating), 'retrying': len(self._retrying)}
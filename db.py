@@ -0,0 +1,765 @@
+"""Acceso a la base de datos (MySQL o SQLite) a través de un pool de conexiones.
+
+Los handlers usan la API asíncrona (``fetch_one``, ``fetch_all``, ``execute``,
+``unit_of_work`` y ``run_in_connection``): cada llamada se ejecuta en un executor acotado, fuera del
+event loop de discord.py, y con un tiempo máximo por llamada.
+
+Si se configura una réplica, las lecturas que lo piden (``replica_key``) van a
+ella, salvo que la misma clave se haya escrito hace poco: las escrituras fijan
+una ventana de read-your-writes en la que esas lecturas siguen yendo al primario.
+
+Con ``backend='sqlite'`` el mismo pool entrega conexiones de ``sqlite_backend``,
+que imitan la API de mysql.connector; el resto del módulo no cambia.
+
+Solo se reintentan los errores transitorios (conexión perdida, bloqueos y
+deadlocks) con backoff exponencial; si la base de datos deja de responder, un
+circuit breaker rechaza las llamadas de inmediato con ``DatabaseUnavailable``.
+"""
+import asyncio
+import functools
+import logging
+import threading
+import time
+from collections import OrderedDict, deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import mysql.connector
+from mysql.connector import errorcode, errors
+
+import query_stats
+import sqlite_backend
+from resilience import CircuitBreaker, CircuitOpenError, backoff_delay
+
+logger = logging.getLogger('bot.db')
+
+
+_statement_lock = threading.Lock()
+_statement_counters = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+
+def _count_statement(counter):
+    with _statement_lock:
+        _statement_counters[counter] += 1
+
+
+def statement_cache_stats():
+    """Aciertos, fallos y desalojos acumulados de las cachés de sentencias preparadas."""
+    with _statement_lock:
+        stats = dict(_statement_counters)
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+    return stats
+
+
+class StatementCache:
+    """Sentencias preparadas en el servidor para una conexión, con desalojo LRU.
+
+    Cada consulta distinta tiene su propio cursor preparado: la primera vez MySQL
+    la analiza (COM_STMT_PREPARE) y las siguientes solo se ejecuta con nuevos
+    parámetros. Solo la usa el hilo que tiene prestada la conexión.
+    """
+
+    def __init__(self, conn, capacity):
+        self._conn = conn
+        self.capacity = capacity
+        self._cursors = OrderedDict()
+
+    def __len__(self):
+        return len(self._cursors)
+
+    def get(self, query):
+        """Devuelve el cursor preparado para ``query``, preparándolo si hace falta."""
+        cursor = self._cursors.get(query)
+        if cursor is not None:
+            self._cursors.move_to_end(query)
+            _count_statement('hits')
+            return cursor
+        _count_statement('misses')
+        cursor = self._conn.cursor(prepared=True)
+        self._cursors[query] = cursor
+        while len(self._cursors) > self.capacity:
+            _, evicted = self._cursors.popitem(last=False)
+            _count_statement('evictions')
+            try:
+                evicted.close()  # Libera la sentencia en el servidor
+            except errors.Error:
+                pass
+        return cursor
+
+    def clear(self):
+        """Olvida las sentencias sin contactar al servidor (se liberan al cerrar la conexión)."""
+        self._cursors.clear()
+
+
+class _PoolEntry:
+    """Conexión física administrada por el pool."""
+
+    __slots__ = ('conn', 'created_at', 'last_used', 'statements')
+
+    def __init__(self, conn, statement_cache_size=0):
+        self.conn = conn
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.statements = StatementCache(conn, statement_cache_size) if statement_cache_size else None
+
+
+class PooledConnection:
+    """Conexión prestada por el pool; close() la devuelve en lugar de cerrarla."""
+
+    _pool = None
+    _entry = None
+
+    def __init__(self, pool, entry):
+        self._pool = pool
+        self._entry = entry
+
+    def __getattr__(self, name):
+        if self._entry is None:
+            raise errors.OperationalError("La conexión ya fue devuelta al pool")
+        return getattr(self._entry.conn, name)
+
+    def prepared(self, query):
+        """Cursor preparado y cacheado para ``query``, o None si la caché está desactivada."""
+        if self._entry is None:
+            raise errors.OperationalError("La conexión ya fue devuelta al pool")
+        statements = self._entry.statements
+        return statements.get(query) if statements is not None else None
+
+    def close(self):
+        """Devuelve la conexión al pool. Llamarlo más de una vez no tiene efecto."""
+        entry, self._entry = self._entry, None
+        if entry is not None:
+            self._pool._release(entry)
+
+    def invalidate(self):
+        """Descarta la conexión física (por ejemplo, después de perder el servidor)."""
+        entry, self._entry = self._entry, None
+        if entry is not None:
+            self._pool._discard(entry)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __del__(self):
+        # Red de seguridad para los handlers que pierden la referencia sin cerrar
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """Pool de conexiones MySQL con tamaño mínimo/máximo, pre-ping y reciclaje.
+
+    Las conexiones se entregan en orden LIFO para que las más usadas se mantengan
+    calientes y las sobrantes envejezcan hasta que ``health_check`` las cierre.
+    ``statement_cache_size`` es el máximo de sentencias preparadas por conexión
+    (0 desactiva la caché). ``connector`` abre las conexiones físicas con
+    ``config`` como argumentos (por defecto, ``mysql.connector.connect``).
+    """
+
+    def __init__(self, config, min_size=1, max_size=10, recycle=3600, idle_timeout=300,
+                 pre_ping=30, timeout=10, session_settings=(), statement_cache_size=64,
+                 connector=None):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError(f"Tamaño de pool inválido: min={min_size}, max={max_size}")
+        self._config = dict(config)
+        self._connector = connector or mysql.connector.connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.recycle = recycle
+        self.idle_timeout = idle_timeout
+        self.pre_ping = pre_ping
+        self.timeout = timeout
+        self.session_settings = tuple(session_settings)
+        self.statement_cache_size = statement_cache_size
+        self._idle = deque()
+        self._size = 0
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def _connect(self):
+        """Abre una conexión física y aplica la configuración de sesión una sola vez."""
+        conn = self._connector(**self._config)
+        try:
+            conn.autocommit = True
+            if self.session_settings:
+                cursor = conn.cursor()
+                try:
+                    for statement in self.session_settings:
+                        cursor.execute(statement)
+                finally:
+                    cursor.close()
+        except Exception:
+            conn.close()
+            raise
+        return _PoolEntry(conn, self.statement_cache_size)
+
+    def _is_usable(self, entry):
+        """Comprueba si una conexión inactiva puede volver a entregarse."""
+        now = time.monotonic()
+        if self.recycle and now - entry.created_at > self.recycle:
+            return False
+        if self.pre_ping is not None and now - entry.last_used >= self.pre_ping:
+            try:
+                entry.conn.ping(reconnect=False)
+            except errors.Error:
+                return False
+        return True
+
+    def acquire(self, timeout=None):
+        """Entrega una conexión del pool, abriendo una nueva si hay cupo."""
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            entry = None
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise errors.PoolError("El pool de conexiones está cerrado")
+                    if self._idle:
+                        entry = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise errors.PoolError(
+                            f"No hay conexiones disponibles en el pool (máximo {self.max_size})"
+                        )
+                    self._cond.wait(remaining)
+
+            if entry is None:
+                try:
+                    entry = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                return PooledConnection(self, entry)
+
+            if self._is_usable(entry):
+                return PooledConnection(self, entry)
+            self._discard(entry)
+
+    def _release(self, entry):
+        try:
+            if entry.conn.in_transaction:
+                entry.conn.rollback()
+        except errors.Error:
+            self._discard(entry)
+            return
+        with self._cond:
+            if self._closed:
+                self._size -= 1
+                close_entry = True
+            else:
+                entry.last_used = time.monotonic()
+                self._idle.append(entry)
+                close_entry = False
+            self._cond.notify()
+        if close_entry:
+            self._close_quietly(entry)
+
+    def _discard(self, entry):
+        self._close_quietly(entry)
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    @staticmethod
+    def _close_quietly(entry):
+        if entry.statements is not None:
+            entry.statements.clear()
+        try:
+            entry.conn.close()
+        except Exception:
+            pass
+
+    def health_check(self):
+        """Verifica las conexiones inactivas, cierra las vencidas y repone el mínimo."""
+        with self._cond:
+            idle, self._idle = list(self._idle), deque()
+            in_use = self._size - len(idle)
+
+        now = time.monotonic()
+        healthy = []
+        for entry in idle:
+            expired = self.recycle and now - entry.created_at > self.recycle
+            surplus = (in_use + len(healthy) >= self.min_size
+                       and self.idle_timeout and now - entry.last_used > self.idle_timeout)
+            if expired or surplus:
+                self._discard(entry)
+                continue
+            try:
+                entry.conn.ping(reconnect=False)
+            except errors.Error:
+                self._discard(entry)
+                continue
+            entry.last_used = now
+            healthy.append(entry)
+
+        with self._cond:
+            # Se devuelven al fondo de la pila para que las conexiones recién usadas sigan primero
+            self._idle.extendleft(reversed(healthy))
+            missing = self.min_size - self._size
+            self._size += max(missing, 0)
+            self._cond.notify_all()
+
+        for _ in range(max(missing, 0)):
+            try:
+                entry = self._connect()
+            except Exception as e:
+                logger.error(f"No se pudo abrir una conexión para el pool: {e}")
+                with self._cond:
+                    self._size -= 1
+                continue
+            self._release(entry)
+
+        return self.stats()
+
+    def stats(self):
+        """Devuelve el estado actual del pool."""
+        with self._cond:
+            idle = len(self._idle)
+            return {'size': self._size, 'idle': idle, 'in_use': self._size - idle}
+
+    def close(self):
+        """Cierra las conexiones inactivas; las prestadas se cierran al devolverse."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for entry in idle:
+            self._close_quietly(entry)
+
+
+class DatabaseTimeout(errors.OperationalError):
+    """La llamada a la base de datos superó su tiempo máximo."""
+
+
+class DatabaseUnavailable(CircuitOpenError):
+    """La base de datos está caída y el circuit breaker rechaza las llamadas."""
+
+    def __init__(self, name, retry_after):
+        super().__init__(name, retry_after)
+        self.args = (f"La base de datos no está disponible por el momento; reintenta en {retry_after:.0f} s",)
+
+
+# Errores en los que la sentencia nunca llegó a ejecutarse o fue revertida
+_RETRY_ALWAYS = frozenset({
+    errorcode.CR_CONNECTION_ERROR,
+    errorcode.CR_CONN_HOST_ERROR,
+    errorcode.ER_CON_COUNT_ERROR,
+    errorcode.ER_LOCK_WAIT_TIMEOUT,
+    errorcode.ER_LOCK_DEADLOCK,
+})
+# Conexión perdida a mitad de la sentencia: solo es seguro repetir lecturas
+_RETRY_IF_IDEMPOTENT = frozenset({
+    errorcode.CR_SERVER_GONE_ERROR,
+    errorcode.CR_SERVER_LOST,
+    errorcode.CR_SERVER_LOST_EXTENDED,
+})
+# Errores que indican que el servidor no responde (cuentan para el circuit breaker)
+_UNAVAILABLE = frozenset({
+    errorcode.CR_CONNECTION_ERROR,
+    errorcode.CR_CONN_HOST_ERROR,
+    errorcode.CR_SERVER_GONE_ERROR,
+    errorcode.CR_SERVER_LOST,
+    errorcode.CR_SERVER_LOST_EXTENDED,
+    errorcode.ER_CON_COUNT_ERROR,
+})
+
+
+def is_transient(exc, idempotent=False):
+    """Indica si vale la pena reintentar la llamada que lanzó ``exc``."""
+    errno = getattr(exc, 'errno', None)
+    if errno in _RETRY_ALWAYS:
+        return True
+    return idempotent and errno in _RETRY_IF_IDEMPOTENT
+
+
+def _breaks_connection(exc):
+    """Indica si ``exc`` deja la conexión inservible y hay que descartarla en lugar de devolverla al pool."""
+    if isinstance(exc, errors.InterfaceError) or getattr(exc, 'errno', None) in _UNAVAILABLE:
+        return True
+    # Los bloqueos y deadlocks revierten la sentencia pero la conexión sigue sana
+    return isinstance(exc, errors.OperationalError) and exc.errno not in _RETRY_ALWAYS
+
+
+def _signals_outage(exc):
+    """Indica si ``exc`` sugiere que la base de datos no está disponible."""
+    if isinstance(exc, (DatabaseTimeout, errors.PoolError)):
+        return True
+    return getattr(exc, 'errno', None) in _UNAVAILABLE
+
+
+WriteResult = namedtuple('WriteResult', ['rowcount', 'lastrowid'])
+
+BACKENDS = ('mysql', 'sqlite')
+
+backend = 'mysql'
+_pool = None
+_replica_pool = None
+_executor = None
+_query_timeout = 10.0
+_retry_attempts = 3
+_retry_base_delay = 0.1
+_retry_max_delay = 2.0
+_read_your_writes_window = 10.0
+_pinned = {}
+breaker = CircuitBreaker('mysql', error_class=DatabaseUnavailable)
+replica_breaker = CircuitBreaker('mysql-replica')
+
+
+def init_pool(config, max_concurrency=None, query_timeout=10.0, retry_attempts=3,
+              retry_base_delay=0.1, retry_max_delay=2.0, breaker_threshold=5,
+              breaker_reset=30.0, replica_config=None, read_your_writes_window=10.0,
+              backend_name='mysql', **options):
+    """Crea el pool global de conexiones y el executor que atiende a los comandos.
+
+    ``max_concurrency`` limita cuántas llamadas a la base de datos corren en
+    paralelo (por defecto, el tamaño máximo de los pools); las demás esperan en
+    cola sin bloquear el event loop. ``retry_*`` configura el backoff de los
+    errores transitorios y ``breaker_*`` el circuit breaker. ``replica_config``
+    agrega un pool de solo lectura con las mismas opciones que el primario.
+    ``backend_name='sqlite'`` usa ``config['database']`` como archivo SQLite.
+    """
+    global backend, _pool, _replica_pool, _executor, _query_timeout, _retry_attempts
+    global _retry_base_delay, _retry_max_delay, _read_your_writes_window
+    if backend_name not in BACKENDS:
+        raise ValueError(f"Backend de base de datos desconocido: {backend_name}")
+    if backend_name == 'sqlite':
+        options['connector'] = sqlite_backend.connect
+        options['statement_cache_size'] = 0  # sqlite3 ya cachea las sentencias de cada conexión
+        replica_config = None
+    backend = backend_name
+    for previous in (_pool, _replica_pool):
+        if previous is not None:
+            previous.close()
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+    _pool = ConnectionPool(config, **options)
+    _replica_pool = ConnectionPool(replica_config, **options) if replica_config else None
+    workers = _pool.max_size + (_replica_pool.max_size if _replica_pool else 0)
+    _executor = ThreadPoolExecutor(max_workers=max_concurrency or workers, thread_name_prefix='db')
+    _query_timeout = query_timeout
+    _retry_attempts = max(retry_attempts, 1)
+    _retry_base_delay = retry_base_delay
+    _retry_max_delay = retry_max_delay
+    _read_your_writes_window = read_your_writes_window
+    _pinned.clear()
+    for circuit in (breaker, replica_breaker):
+        circuit.failure_threshold = breaker_threshold
+        circuit.reset_timeout = breaker_reset
+    return _pool
+
+
+def get_pool():
+    """Devuelve el pool global de conexiones."""
+    if _pool is None:
+        raise RuntimeError("El pool de conexiones no fue inicializado (llama a db.init_pool)")
+    return _pool
+
+
+def get_replica_pool():
+    """Devuelve el pool de la réplica de lectura, o None si no hay réplica configurada."""
+    return _replica_pool
+
+
+def pin_primary(*keys, window=None):
+    """Envía al primario las lecturas de ``keys`` durante la ventana de read-your-writes."""
+    if _replica_pool is None or not keys:
+        return
+    now = time.monotonic()
+    if len(_pinned) > 1024:
+        for key, until in list(_pinned.items()):
+            if until <= now:
+                del _pinned[key]
+    until = now + (_read_your_writes_window if window is None else window)
+    for key in keys:
+        _pinned[key] = until
+
+
+def _reads_from_replica(key):
+    if _replica_pool is None or key is None:
+        return False
+    until = _pinned.get(key)
+    if until is not None:
+        if time.monotonic() < until:
+            return False
+        del _pinned[key]
+    return True
+
+
+def _with_connection(fn, *args, pool=None):
+    """Ejecuta ``fn(conn, *args)`` con una conexión del pool (un solo intento)."""
+    conn = (pool or get_pool()).acquire()
+    try:
+        return fn(conn, *args)
+    except errors.Error as e:
+        # Solo se descarta si quedó inutilizable; ante errores de datos (clave duplicada,
+        # SQL inválido...) close() revierte la transacción y la devuelve al pool con
+        # sus sentencias preparadas
+        if _breaks_connection(e):
+            conn.invalidate()
+        raise
+    finally:
+        conn.close()
+
+
+def _fetch(conn, query, params, many, row=None):
+    started = time.perf_counter()
+    failed = True
+    try:
+        # Las consultas con parámetros usan la sentencia preparada de la conexión
+        cursor = conn.prepared(query) if params else None
+        if cursor is not None:
+            cursor.execute(query, params)
+            if row is not None:
+                rows = [row(values) for values in cursor.fetchall()]
+            else:
+                columns = cursor.column_names
+                rows = [dict(zip(columns, values)) for values in cursor.fetchall()]
+        else:
+            # Con ``row`` alcanza un cursor de tuplas: la fila se arma por posición
+            cursor = conn.cursor(dictionary=row is None, buffered=True)
+            try:
+                cursor.execute(query, params)
+                rows = cursor.fetchall()
+                if row is not None:
+                    rows = [row(values) for values in rows]
+            finally:
+                cursor.close()
+        failed = False
+    finally:
+        # También se miden las que cancela MAX_EXECUTION_TIME o un lock wait: suelen ser las más lentas
+        query_stats.record(query, time.perf_counter() - started, params, failed=failed)
+    if many:
+        return rows
+    return rows[0] if rows else None
+
+
+def _run_statement(conn, query, params, prepared=True):
+    """Ejecuta una sentencia de escritura sin confirmarla."""
+    started = time.perf_counter()
+    failed = True
+    try:
+        cursor = conn.prepared(query) if params and prepared else None
+        if cursor is not None:
+            cursor.execute(query, params)
+            result = WriteResult(cursor.rowcount, cursor.lastrowid)
+        else:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(query, params)
+                result = WriteResult(cursor.rowcount, cursor.lastrowid)
+            finally:
+                cursor.close()
+        failed = False
+    finally:
+        query_stats.record(query, time.perf_counter() - started, params, failed=failed)
+    return result
+
+
+def _write(conn, query, params, prepared=True):
+    result = _run_statement(conn, query, params, prepared)
+    conn.commit()
+    return result
+
+
+def _write_batch(conn, statements):
+    """Ejecuta varias sentencias en una transacción con un único COMMIT."""
+    conn.start_transaction()
+    try:
+        results = [_run_statement(conn, query, params, prepared) for query, params, prepared in statements]
+        conn.commit()
+    except BaseException:
+        try:
+            conn.rollback()
+        except errors.Error:
+            pass
+        raise
+    return results
+
+
+async def to_thread(fn, *args, timeout=None):
+    """Ejecuta una función bloqueante en el executor de la base de datos."""
+    if _executor is None:
+        raise RuntimeError("El pool de conexiones no fue inicializado (llama a db.init_pool)")
+    timeout = _query_timeout if timeout is None else timeout
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(_executor, functools.partial(fn, *args))
+    try:
+        return await asyncio.wait_for(future, timeout)
+    except asyncio.TimeoutError:
+        raise DatabaseTimeout(f"La consulta superó el tiempo máximo de {timeout:g} s") from None
+
+
+async def run_in_connection(fn, *args, timeout=None, idempotent=False):
+    """Ejecuta ``fn(conn, *args)`` en el executor con una conexión del pool.
+
+    Los errores transitorios se reintentan con backoff exponencial y jitter; las
+    fallas de conexión repetidas abren el circuit breaker. ``idempotent`` permite
+    repetir la llamada aunque la conexión se haya perdido a mitad de camino.
+    """
+    breaker.before_call()
+    for attempt in range(_retry_attempts):
+        try:
+            result = await to_thread(_with_connection, fn, *args, timeout=timeout)
+        except errors.Error as e:
+            if attempt + 1 < _retry_attempts and is_transient(e, idempotent):
+                delay = backoff_delay(attempt, _retry_base_delay, _retry_max_delay)
+                logger.warning(f"Error transitorio de MySQL ({e}); reintento {attempt + 1} en {delay:.2f} s")
+                await asyncio.sleep(delay)
+                continue
+            if _signals_outage(e):
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            logger.error(f"Error al ejecutar la consulta: {e}")
+            raise
+        breaker.record_success()
+        return result
+
+
+async def _read(fn, *args, timeout=None, replica_key=None):
+    """Lectura que prefiere la réplica; si no responde, cae al primario."""
+    if _reads_from_replica(replica_key):
+        try:
+            replica_breaker.before_call()
+        except CircuitOpenError:
+            pass
+        else:
+            try:
+                result = await to_thread(functools.partial(_with_connection, pool=_replica_pool),
+                                         fn, *args, timeout=timeout)
+            except errors.Error as e:
+                if not _signals_outage(e):
+                    replica_breaker.record_success()
+                    raise
+                replica_breaker.record_failure()
+                logger.warning(f"La réplica de lectura no respondió ({e}); se usa el primario")
+            else:
+                replica_breaker.record_success()
+                return result
+    return await run_in_connection(fn, *args, timeout=timeout, idempotent=True)
+
+
+async def fetch_one(query, params=(), *, timeout=None, replica_key=None, row=None):
+    """Devuelve la primera fila de la consulta como diccionario, o None.
+
+    Con ``replica_key`` la consulta puede ir a la réplica, salvo que esa clave
+    esté fijada al primario por una escritura reciente. ``row`` arma cada fila
+    desde la tupla de valores (ver ``models``) en lugar de un diccionario.
+    """
+    return await _read(_fetch, query, params, False, row, timeout=timeout, replica_key=replica_key)
+
+
+async def fetch_all(query, params=(), *, timeout=None, replica_key=None, row=None):
+    """Devuelve todas las filas de la consulta como lista de diccionarios (o de ``row``)."""
+    return await _read(_fetch, query, params, True, row, timeout=timeout, replica_key=replica_key)
+
+
+async def execute(query, params=(), *, timeout=None, pin=(), prepared=True):
+    """Ejecuta una sentencia de escritura y la confirma; devuelve un WriteResult.
+
+    ``pin`` son las claves de lectura que quedan fijadas al primario tras escribir.
+    ``prepared=False`` evita ocupar la caché de sentencias con textos de un solo uso.
+    """
+    result = await run_in_connection(_write, query, params, prepared, timeout=timeout)
+    pin_primary(*pin)
+    return result
+
+
+async def explain(query, params=()):
+    """Plan de ejecución (filas de ``EXPLAIN``) de una sentencia, siempre en el primario."""
+    return await run_in_connection(_explain, query, params, idempotent=True)
+
+
+def _explain(conn, query, params):
+    cursor = conn.cursor(dictionary=True, buffered=True)
+    try:
+        prefix = 'EXPLAIN QUERY PLAN ' if backend == 'sqlite' else 'EXPLAIN '
+        cursor.execute(prefix + query, params)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+async def explain_slowest(n=5, key='total_ms'):
+    """Las ``n`` sentencias más costosas según ``query_stats`` junto con su plan.
+
+    El plan se pide con los parámetros de la ejecución más lenta; si falla, en su
+    lugar va el mensaje de error.
+    """
+    report = []
+    for entry in query_stats.top(n, key):
+        sample = query_stats.slowest_sample(entry['sql'])
+        plan = None
+        if sample and sample[0].lstrip()[:6].upper() in ('SELECT', 'UPDATE', 'DELETE', 'INSERT'):
+            try:
+                plan = await explain(*sample)
+            except Exception as e:
+                plan = str(e)
+        report.append((entry, plan))
+    return report
+
+
+class UnitOfWork:
+    """Sentencias de escritura que se confirman juntas en una sola transacción.
+
+    ``execute`` solo las acumula; al salir sin errores del bloque ``async with``
+    se envían todas por una misma conexión del pool y se confirman con un único
+    COMMIT. Si el bloque lanza una excepción no se envía nada. Después del commit,
+    ``results`` tiene un WriteResult por sentencia y las claves de ``pin`` quedan
+    fijadas al primario.
+    """
+
+    def __init__(self, timeout=None, pin=()):
+        self.timeout = timeout
+        self.pin = tuple(pin)
+        self.results = []
+        self._statements = []
+
+    def execute(self, query, params=(), prepared=True):
+        """Agrega una sentencia a la transacción (``prepared`` como en ``db.execute``)."""
+        self._statements.append((query, params, prepared))
+
+    async def commit(self):
+        """Ejecuta y confirma las sentencias acumuladas."""
+        statements, self._statements = self._statements, []
+        if statements:
+            self.results = await run_in_connection(_write_batch, statements, timeout=self.timeout)
+            pin_primary(*self.pin)
+        return self.results
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            await self.commit()
+        else:
+            self._statements.clear()
+        return False
+
+
+def unit_of_work(timeout=None, pin=()):
+    """Abre una unidad de trabajo: ``async with db.unit_of_work() as tx: tx.execute(...)``."""
+    return UnitOfWork(timeout, pin)
+
+
+def shutdown():
+    """Cierra el executor y los pools de conexiones (primario y réplica)."""
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+    for pool in (_pool, _replica_pool):
+        if pool is not None:
+            pool.close()
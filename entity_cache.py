@@ -0,0 +1,124 @@
+"""Caché en memoria de las filas más consultadas (cédulas, vehículos y propiedades).
+
+``repository`` la usa como caché read-through: busca primero aquí y solo va a la
+base de datos en un fallo, guardando lo que lee. Cada entrada vence a los ``ttl``
+segundos y, si la caché se llena, se descarta la usada hace más tiempo (LRU).
+Los "no existe" también se guardan (caché negativa) con un TTL más corto, para
+que las búsquedas repetidas de un ciudadano sin cédula no lleguen a la base de
+datos. Los comandos que escriben estas tablas llaman a ``invalidate``.
+
+Una lectura que empezó antes de una invalidación no guarda su resultado (ver
+``generation``), así que una fila recién escrita no se pisa con una versión vieja.
+Como la caché vive en el proceso, una escritura hecha por otro proceso se ve
+recién cuando vence la entrada; el TTL acota ese desfase.
+"""
+import time
+from collections import OrderedDict
+
+# Devuelto por ``get`` cuando la clave no está en caché (None significa "no existe")
+MISSING = object()
+
+
+class TTLCache:
+    """Diccionario acotado con vencimiento por entrada y desalojo LRU."""
+
+    def __init__(self, name, max_size=10000, ttl=60.0, negative_ttl=15.0):
+        if max_size < 1:
+            raise ValueError(f"Tamaño de caché inválido: {max_size}")
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries = OrderedDict()  # clave -> (vence, valor)
+        self.generation = 0  # Aumenta con cada invalidación
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Valor guardado para ``key`` (None si se guardó un "no existe"), o ``MISSING``."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return MISSING
+        expires, value = entry
+        if expires <= time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return MISSING
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value, generation=None):
+        """Guarda ``value``; ``None`` se guarda como "no existe" con ``negative_ttl``.
+
+        ``generation`` es el valor de ``self.generation`` antes de leer ``value``
+        de la base de datos: si hubo una invalidación desde entonces, no se guarda.
+        """
+        if generation is not None and generation != self.generation:
+            return
+        ttl = self.ttl if value is not None else self.negative_ttl
+        if ttl <= 0:
+            return
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, *keys):
+        self.generation += 1
+        for key in keys:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        self.generation += 1
+        self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+
+cedulas = TTLCache('cedulas')  # user_id (int) -> Cedula
+vehiculos = TTLCache('vehiculos')  # placa -> Vehiculo
+propiedades = TTLCache('propiedades')  # numero_domicilio -> Propiedad
+
+CACHES = (cedulas, vehiculos, propiedades)
+
+
+def configure(max_size=None, ttl=None, negative_ttl=None):
+    """Ajusta los límites de todas las cachés de entidades y las vacía."""
+    for cache in CACHES:
+        if max_size is not None:
+            cache.max_size = max_size
+        if ttl is not None:
+            cache.ttl = ttl
+        if negative_ttl is not None:
+            cache.negative_ttl = negative_ttl
+        cache.clear()
+
+
+def invalidate(user_id=None, placa=None, numero_domicilio=None):
+    """Descarta las entradas afectadas por una escritura."""
+    if user_id is not None:
+        cedulas.invalidate(int(user_id))
+    if placa is not None:
+        vehiculos.invalidate(placa)
+    if numero_domicilio is not None:
+        propiedades.invalidate(numero_domicilio)
+
+
+def stats():
+    """Estadísticas por caché: tamaño, aciertos, fallos, desalojos y tasa de aciertos."""
+    return {cache.name: cache.stats() for cache in CACHES}
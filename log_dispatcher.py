@@ -0,0 +1,367 @@
+"""Envío en segundo plano de los embeds de auditoría a los canales de logs.
+
+Los comandos encolan el embed con ``send`` y responden sin esperar a Discord.
+Cada canal tiene su propia cola y su propia tarea, que junta hasta 10 embeds
+por mensaje (el máximo de Discord, respetando también el tope de 6000
+caracteres por mensaje) cada ``flush_interval`` segundos o apenas hay un
+mensaje completo. Los 429 y los errores 5xx se reintentan con backoff; al
+cerrar el bot se envía lo que quede pendiente.
+
+Los canales que tienen un webhook configurado (``webhooks``) reciben los logs
+por él, con una sesión aiohttp propia y compartida entre todos los webhooks:
+así los logs no gastan los límites de tasa de las rutas del bot, que son los
+mismos que usan las respuestas a los comandos.
+
+Las colas están acotadas a ``max_pending`` embeds por canal. Si Discord no da
+abasto, los nuevos se escriben en ``spill_dir`` (un archivo JSONL por canal) y
+se vuelven a encolar cuando la cola se vacía; sin ``spill_dir`` se descartan y
+se cuentan, como en ``write_buffer``. Lo que no alcanza a enviarse al cerrar el
+bot también va a disco y se envía en el próximo inicio.
+"""
+import asyncio
+import json
+import logging
+import os
+from collections import deque
+
+import aiohttp
+import discord
+
+from resilience import backoff_delay
+
+logger = logging.getLogger('bot.log_dispatcher')
+
+# Límites de Discord por mensaje
+MAX_EMBEDS = 10
+MAX_EMBED_CHARS = 6000
+
+
+class _ChannelQueue:
+    __slots__ = ('pending', 'wakeup', 'task', 'lock', 'spilling')
+
+    def __init__(self):
+        self.pending = deque()
+        self.wakeup = asyncio.Event()
+        self.task = None
+        self.lock = asyncio.Lock()
+        self.spilling = False  # Hay embeds en disco: los nuevos van detrás de ellos para no desordenar
+
+
+def parse_webhooks(text):
+    """``{canal: url}`` desde ``"id_canal=url_webhook,id_canal=url_webhook"``."""
+    webhooks = {}
+    for item in text.split(','):
+        if not item.strip():
+            continue
+        channel_id, sep, url = item.partition('=')
+        if not sep or not channel_id.strip().isdigit():
+            raise ValueError(f"Webhook de logs mal configurado: {item.strip()!r} (se espera id_canal=url)")
+        webhooks[int(channel_id)] = url.strip()
+    return webhooks
+
+
+class WebhookSinks:
+    """Webhooks de los canales de logs sobre una sesión aiohttp de larga vida."""
+
+    def __init__(self, urls, limit=10, timeout=15.0):
+        self.urls = dict(urls)
+        self.limit = limit
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self._session = None
+        self._webhooks = {}
+
+    def __contains__(self, channel_id):
+        return channel_id in self.urls
+
+    def start(self):
+        """Crea la sesión compartida; debe llamarse con el event loop corriendo."""
+        if not self.urls or (self._session is not None and not self._session.closed):
+            return
+        connector = aiohttp.TCPConnector(limit=self.limit, ttl_dns_cache=300, keepalive_timeout=60.0)
+        self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        self._webhooks.clear()
+
+    def get(self, channel_id):
+        """Webhook del canal, o None si el canal no tiene uno (o la sesión no está abierta)."""
+        if channel_id not in self.urls or self._session is None or self._session.closed:
+            return None
+        webhook = self._webhooks.get(channel_id)
+        if webhook is None:
+            webhook = self._webhooks[channel_id] = discord.Webhook.from_url(
+                self.urls[channel_id], session=self._session)
+        return webhook
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        self._webhooks.clear()
+
+
+class LogDispatcher:
+    """Colas de embeds por canal de logs, vaciadas por tareas en segundo plano."""
+
+    def __init__(self, client, flush_interval=2.0, max_pending=1000, retry_attempts=5,
+                 retry_base_delay=1.0, retry_max_delay=60.0, webhooks=None, spill_dir=None):
+        self.client = client
+        self.webhooks = WebhookSinks(webhooks or {})
+        self.spill_dir = spill_dir
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.retry_attempts = retry_attempts
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self._channels = {}  # channel_id -> _ChannelQueue
+        self._running = False
+        self._closing = False
+        self.sent = 0  # Embeds entregados
+        self.messages = 0  # Mensajes usados para entregarlos
+        self.retries = 0
+        self.dropped = 0
+        self.spilled = 0  # Embeds escritos a disco por falta de espacio en la cola
+
+    def send(self, channel_id, embed):
+        """Encola ``embed`` para el canal; devuelve False si se descartó porque la cola está llena."""
+        queue = self._channels.get(channel_id)
+        if queue is None:
+            queue = self._channels[channel_id] = _ChannelQueue()
+            if self._running:
+                self._start_channel(channel_id, queue)
+        if queue.spilling or len(queue.pending) >= self.max_pending:
+            if not self._spill(channel_id, [embed]):
+                self._drop(channel_id, 1)
+                return False
+            return True
+        queue.pending.append(embed)
+        if len(queue.pending) >= MAX_EMBEDS:
+            queue.wakeup.set()
+        return True
+
+    def start(self):
+        """Inicia las tareas de envío; los embeds encolados antes se envían al empezar."""
+        self._running = True
+        self._closing = False
+        self.webhooks.start()
+        # Canales con logs guardados en disco por un cierre o una sobrecarga anterior
+        if self.spill_dir and os.path.isdir(self.spill_dir):
+            for filename in os.listdir(self.spill_dir):
+                name, ext = os.path.splitext(filename)
+                if ext == '.jsonl' and name.isdigit():
+                    self._channels.setdefault(int(name), _ChannelQueue()).spilling = True
+        for channel_id, queue in self._channels.items():
+            self._start_channel(channel_id, queue)
+
+    def _start_channel(self, channel_id, queue):
+        if queue.task is None or queue.task.done():
+            queue.task = asyncio.create_task(self._run(channel_id, queue), name=f'log_dispatcher:{channel_id}')
+
+    async def _run(self, channel_id, queue):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(queue.wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            queue.wakeup.clear()
+            await self._flush_channel(channel_id, queue)
+
+    def _next_batch(self, pending):
+        """Saca de la cola los embeds que caben en un mensaje."""
+        batch = [pending.popleft()]
+        chars = len(batch[0])
+        while pending and len(batch) < MAX_EMBEDS and chars + len(pending[0]) <= MAX_EMBED_CHARS:
+            chars += len(pending[0])
+            batch.append(pending.popleft())
+        return batch
+
+    async def _flush_channel(self, channel_id, queue):
+        async with queue.lock:
+            while True:
+                if not queue.pending and not self._unspill(channel_id, queue):
+                    return
+                batch = self._next_batch(queue.pending)
+                try:
+                    delivered = await self._deliver(channel_id, batch)
+                except asyncio.CancelledError:
+                    queue.pending.extendleft(reversed(batch))
+                    raise
+                if not delivered:
+                    # Se devuelven al frente de la cola (hasta donde quepan) para el próximo intento
+                    space = self.max_pending - len(queue.pending)
+                    queue.pending.extendleft(reversed(batch[:space]))
+                    if not self._spill(channel_id, batch[space:], queue, oldest=True):
+                        self._drop(channel_id, len(batch) - min(space, len(batch)))
+                    return
+
+    async def _resolve_channel(self, channel_id):
+        """Destino de los embeds del canal: su webhook si tiene uno, o el canal vía el bot."""
+        webhook = self.webhooks.get(channel_id)
+        if webhook is not None:
+            return webhook
+        channel = self.client.get_channel(channel_id)
+        if channel is None:
+            channel = await self.client.fetch_channel(channel_id)
+        return channel
+
+    def _spill_path(self, channel_id):
+        return os.path.join(self.spill_dir, f'{channel_id}.jsonl')
+
+    def _spill(self, channel_id, embeds, queue=None, oldest=False):
+        """Guarda ``embeds`` en el archivo del canal; False si no hay ``spill_dir`` o no se pudo escribir.
+
+        Se agregan al final, salvo con ``oldest=True`` (embeds sacados de la cola,
+        anteriores a los que ya están en disco), que van al principio.
+        """
+        if not embeds:
+            return True
+        if not self.spill_dir:
+            return False
+        path = self._spill_path(channel_id)
+        try:
+            lines = [json.dumps(embed.to_dict(), ensure_ascii=False, default=str) + '\n' for embed in embeds]
+            os.makedirs(self.spill_dir, exist_ok=True)
+            if oldest and os.path.exists(path):
+                with open(path, encoding='utf-8') as f:
+                    lines.extend(f.readlines())
+                mode = 'w'
+            else:
+                mode = 'a'
+            # Solo se llega aquí con la cola llena o al cerrar: la escritura corta no frena el event loop
+            with open(path, mode, encoding='utf-8') as f:
+                f.writelines(lines)
+        except (OSError, TypeError, ValueError) as e:
+            logger.error(f"No se pudieron guardar en disco {len(embeds)} embeds del canal {channel_id}: {e}")
+            return False
+        self.spilled += len(embeds)
+        (queue or self._channels[channel_id]).spilling = True
+        return True
+
+    def _unspill(self, channel_id, queue):
+        """Vuelve a encolar los embeds guardados en disco que quepan; False si no había ninguno."""
+        if not self.spill_dir:
+            return False
+        path = self._spill_path(channel_id)
+        try:
+            with open(path, encoding='utf-8') as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            queue.spilling = False
+            return False
+        except OSError as e:
+            logger.error(f"No se pudieron leer los logs guardados del canal {channel_id}: {e}")
+            return False
+        space = self.max_pending - len(queue.pending)
+        loaded, rest = lines[:space], lines[space:]
+        try:
+            if rest:
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.writelines(rest)
+            else:
+                os.remove(path)
+                queue.spilling = False
+        except OSError as e:
+            logger.error(f"No se pudo actualizar el archivo de logs guardados del canal {channel_id}: {e}")
+            return False
+        for line in loaded:
+            try:
+                queue.pending.append(discord.Embed.from_dict(json.loads(line)))
+            except ValueError:
+                self._drop(channel_id, 1)  # Línea truncada por un corte a mitad de escritura
+        return bool(queue.pending)
+
+    async def _deliver(self, channel_id, embeds):
+        """Envía un mensaje con ``embeds``; False si hay que reintentarlo más tarde."""
+        for attempt in range(self.retry_attempts):
+            try:
+                channel = await self._resolve_channel(channel_id)
+                await channel.send(embeds=embeds)
+            except (discord.NotFound, discord.Forbidden) as e:
+                # No se arregla reintentando: el lote se pierde
+                logger.error(f"No se pudo encontrar el canal de logs con ID {channel_id}: {e}")
+                self._drop(channel_id, len(embeds))
+                return True
+            except discord.RateLimited as e:
+                self.retries += 1
+                logger.warning(f"Discord limitó los logs del canal {channel_id}; pausa de {e.retry_after:.1f} s")
+                await asyncio.sleep(e.retry_after)
+            except discord.HTTPException as e:
+                if e.status != 429 and e.status < 500:
+                    logger.error(f"Discord rechazó {len(embeds)} embeds para el canal {channel_id}: {e}")
+                    self._drop(channel_id, len(embeds))
+                    return True
+                delay = getattr(e, 'retry_after', None) or backoff_delay(
+                    attempt, self.retry_base_delay, self.retry_max_delay)
+                self.retries += 1
+                logger.warning(f"Discord respondió {e.status} al enviar logs a {channel_id}; "
+                               f"reintento {attempt + 1} en {delay:.1f} s")
+                await asyncio.sleep(delay)
+            except (OSError, asyncio.TimeoutError) as e:
+                delay = backoff_delay(attempt, self.retry_base_delay, self.retry_max_delay)
+                self.retries += 1
+                logger.warning(f"Error de red al enviar logs a {channel_id} ({e}); reintento en {delay:.1f} s")
+                await asyncio.sleep(delay)
+            except Exception as e:
+                # Un error inesperado no debe detener la tarea del canal
+                logger.error(f"Error al enviar {len(embeds)} embeds al canal {channel_id}: {e}")
+                self._drop(channel_id, len(embeds))
+                return True
+            else:
+                self.sent += len(embeds)
+                self.messages += 1
+                return True
+        logger.error(f"No se pudieron enviar {len(embeds)} embeds al canal {channel_id} tras "
+                     f"{self.retry_attempts} intentos")
+        return False
+
+    def _drop(self, channel_id, count):
+        if not count:
+            return
+        previous = self.dropped
+        self.dropped += count
+        if previous == 0 or previous // 100 != self.dropped // 100:
+            logger.warning(f"Cola de logs del canal {channel_id} llena o sin destino; "
+                           f"{self.dropped} embeds descartados en total")
+
+    async def flush(self):
+        """Envía todo lo pendiente de todos los canales."""
+        await asyncio.gather(*(self._flush_channel(channel_id, queue)
+                               for channel_id, queue in list(self._channels.items())))
+
+    async def close(self, timeout=30.0):
+        """Detiene las tareas y envía lo que quede pendiente, esperando a lo sumo ``timeout`` segundos."""
+        self._running = False
+        self._closing = True
+        tasks = []
+        for queue in self._channels.values():
+            queue.wakeup.set()
+            if queue.task is not None:
+                # No se cancelan para no cortar un envío a mitad de camino
+                tasks.append(queue.task)
+                queue.task = None
+        try:
+            await asyncio.wait_for(self._drain(tasks), timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"Los logs pendientes no terminaron de enviarse en {timeout:g} s")
+        lost = 0
+        for channel_id, queue in self._channels.items():
+            # Al disco (se envían en el próximo inicio) o, sin spill_dir, se pierden
+            if queue.pending and not self._spill(channel_id, list(queue.pending), queue, oldest=True):
+                lost += len(queue.pending)
+            queue.pending.clear()
+        if lost:
+            logger.error(f"Se perdieron {lost} embeds de logs al cerrar")
+        await self.webhooks.close()
+
+    async def _drain(self, tasks):
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self.flush()
+
+    def stats(self):
+        return {
+            'pending': sum(len(queue.pending) for queue in self._channels.values()),
+            'sent': self.sent,
+            'messages': self.messages,
+            'retries': self.retries,
+            'dropped': self.dropped,
+            'spilled': self.spilled,
+            'webhooks': len(self.webhooks.urls),
+        }
@@ -1,13 +1,13 @@
 import os
+import asyncio
+import signal
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 from discord import app_commands
 import pymysql
 import logging
 from dotenv import load_dotenv
 import datetime
-import random
-import aiohttp
 import io
 from discord import Embed, Color, File
 from datetime import datetime, timedelta
@@ -16,6 +16,17 @@ import threading
 import time
 import pymysql.cursors
 import mysql.connector
+import avatar_cache
+import db
+import entity_cache
+import log_dispatcher
+import repository
+import roblox
+import rut_allocator
+import validaciones
+import query_stats
+import schema
+import write_buffer
 
 # Configuración del logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -29,204 +40,194 @@ TOKEN = os.getenv('DISCORD_TOKEN')
 intents = discord.Intents.default()
 intents.message_content = True
 intents.members = True
-bot = commands.Bot(command_prefix='!', intents=intents)
+
+
+class SantiagoBot(commands.Bot):
+    async def setup_hook(self):
+        """Se ejecuta una sola vez al iniciar el proceso (no en cada reconexión al gateway)"""
+        try:
+            await db.to_thread(db.get_pool().health_check)  # Abre las conexiones mínimas del pool
+            if db.get_replica_pool():
+                await db.to_thread(db.get_replica_pool().health_check)
+            await schema.run_migrations()
+            await schema.check_indexes()
+        except Exception as e:
+            logger.error(f'❌ Error al inicializar la base de datos: {e}')
+            raise
+        buffer_emergencias.start()
+        bitacora.start()
+        await roblox_client.start()
+
+        # Cerrar ordenadamente con SIGTERM (reinicios del hosting) para vaciar los buffers
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, lambda: asyncio.create_task(self.close()))
+        except (NotImplementedError, RuntimeError):
+            pass  # Windows no soporta add_signal_handler
+
+    async def close(self):
+        """Escribe las filas pendientes de los buffers y envía los logs encolados antes de desconectarse"""
+        await buffer_emergencias.close()
+        await bitacora.close()
+        await avatares.close()
+        await roblox_client.close()
+        await super().close()
+        # Cerrar las conexiones del pool en lugar de dejar que MySQL las corte como clientes abortados;
+        # fuera del event loop porque shutdown espera a que terminen los hilos del executor
+        await asyncio.get_running_loop().run_in_executor(None, db.shutdown)
+
+
+bot = SantiagoBot(command_prefix='!', intents=intents)
+
+# Backend de base de datos: 'mysql' (producción) o 'sqlite' (desarrollo local y pruebas de carga)
+DB_BACKEND = os.getenv('DB_BACKEND', 'mysql').lower()
 
 # Database configuration
-DB_CONFIG = {
-    'host': os.getenv('MYSQLHOST'),
-    'user': os.getenv('MYSQLUSER'),
-    'password': os.getenv('MYSQLPASSWORD'),
-    'database': os.getenv('MYSQLDATABASE'),
-    'port': os.getenv('MYSQLPORT', 3306)
+if DB_BACKEND == 'sqlite':
+    DB_CONFIG = {
+        'database': os.getenv('SQLITE_PATH', 'santiago_rp.db'),
+        'timeout': float(os.getenv('SQLITE_BUSY_TIMEOUT', 5))  # Segundos esperando un lock de escritura
+    }
+else:
+    DB_CONFIG = {
+        'host': os.getenv('MYSQLHOST'),
+        'user': os.getenv('MYSQLUSER'),
+        'password': os.getenv('MYSQLPASSWORD'),
+        'database': os.getenv('MYSQLDATABASE'),
+        'port': os.getenv('MYSQLPORT', 3306)
+    }
+
+    # Validar que todas las variables de entorno estén definidas
+    required_db_vars = ['host', 'user', 'password', 'database']
+    for key in required_db_vars:
+        if not DB_CONFIG[key]:
+            raise ValueError(f"Variable de entorno para '{key}' no está definida. Asegúrate de que MYSQL{key.upper()} esté configurada.")
+    # Convertir el puerto a entero si no es None
+    DB_CONFIG['port'] = int(DB_CONFIG['port']) if DB_CONFIG['port'] else 3306
+
+# Configuración del pool de conexiones
+DB_POOL_CONFIG = {
+    'min_size': int(os.getenv('DB_POOL_MIN_SIZE', 2)),
+    'max_size': int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+    'recycle': int(os.getenv('DB_POOL_RECYCLE', 3600)),  # Segundos de vida máxima de una conexión
+    'idle_timeout': int(os.getenv('DB_POOL_IDLE_TIMEOUT', 300)),  # Segundos antes de cerrar conexiones sobrantes
+    'pre_ping': int(os.getenv('DB_POOL_PRE_PING', 30)),  # Hacer ping si la conexión estuvo inactiva este tiempo
+    'timeout': float(os.getenv('DB_POOL_TIMEOUT', 10)),  # Espera máxima por una conexión libre
+    'statement_cache_size': int(os.getenv('DB_STATEMENT_CACHE_SIZE', 64)),  # Sentencias preparadas por conexión (0 = sin caché)
+    'session_settings': [
+        sentencia.strip()
+        for sentencia in os.getenv('MYSQL_SESSION_SETTINGS', 'SET NAMES utf8mb4 COLLATE utf8mb4_unicode_ci').split(';')
+        if sentencia.strip()
+    ]
+}
+DB_POOL_HEALTH_INTERVAL = int(os.getenv('DB_POOL_HEALTH_INTERVAL', 60))
+
+# Límites del acceso asíncrono a la base de datos
+DB_MAX_CONCURRENCY = int(os.getenv('DB_MAX_CONCURRENCY', DB_POOL_CONFIG['max_size']))  # Consultas simultáneas
+DB_QUERY_TIMEOUT = float(os.getenv('DB_QUERY_TIMEOUT', 10))  # Segundos máximos por llamada
+if DB_BACKEND == 'sqlite':
+    # WAL permite leer mientras otra conexión escribe
+    DB_POOL_CONFIG['session_settings'] = [
+        'PRAGMA journal_mode = WAL',
+        'PRAGMA synchronous = NORMAL',
+        'PRAGMA foreign_keys = ON'
+    ]
+else:
+    # El servidor también corta los SELECT que superen el mismo límite
+    DB_POOL_CONFIG['session_settings'].append(f"SET SESSION MAX_EXECUTION_TIME = {int(DB_QUERY_TIMEOUT * 1000)}")
+
+# Reintentos de errores transitorios y circuit breaker de la base de datos
+DB_RESILIENCE_CONFIG = {
+    'retry_attempts': int(os.getenv('DB_RETRY_ATTEMPTS', 3)),
+    'retry_base_delay': float(os.getenv('DB_RETRY_BASE_DELAY', 0.1)),  # Segundos del primer backoff
+    'retry_max_delay': float(os.getenv('DB_RETRY_MAX_DELAY', 2)),
+    'breaker_threshold': int(os.getenv('DB_BREAKER_THRESHOLD', 5)),  # Fallos consecutivos para abrir el circuito
+    'breaker_reset': float(os.getenv('DB_BREAKER_RESET', 30))  # Segundos antes de volver a intentar
 }
 
-# Validar que todas las variables de entorno estén definidas
-required_db_vars = ['host', 'user', 'password', 'database']
-for key in required_db_vars:
-    if not DB_CONFIG[key]:
-        raise ValueError(f"Variable de entorno para '{key}' no está definida. Asegúrate de que MYSQL{key.upper()} esté configurada.")
-# Convertir el puerto a entero si no es None
-DB_CONFIG['port'] = int(DB_CONFIG['port']) if DB_CONFIG['port'] else 3306
+# Réplica de lectura opcional para los comandos ver-*; usa las mismas credenciales si no se indican otras
+DB_REPLICA_CONFIG = None
+if os.getenv('MYSQL_REPLICA_HOST'):
+    DB_REPLICA_CONFIG = {
+        **DB_CONFIG,
+        'host': os.getenv('MYSQL_REPLICA_HOST'),
+        'port': int(os.getenv('MYSQL_REPLICA_PORT', DB_CONFIG['port'])),
+        'user': os.getenv('MYSQL_REPLICA_USER', DB_CONFIG['user']),
+        'password': os.getenv('MYSQL_REPLICA_PASSWORD', DB_CONFIG['password'])
+    }
+# Segundos en que un ciudadano recién modificado se sigue leyendo desde el primario
+DB_READ_YOUR_WRITES_WINDOW = float(os.getenv('DB_READ_YOUR_WRITES_WINDOW', 10))
 
-def get_db_connection():
-    """Establece una conexión a la base de datos MySQL."""
-    try:
-        conn = mysql.connector.connect(**DB_CONFIG)
-        return conn
-    except mysql.connector.Error as e:
-        logger.error(f"Error al conectar a la base de datos: {e}")
-        raise
+db.init_pool(DB_CONFIG, max_concurrency=DB_MAX_CONCURRENCY, query_timeout=DB_QUERY_TIMEOUT,
+             replica_config=DB_REPLICA_CONFIG, read_your_writes_window=DB_READ_YOUR_WRITES_WINDOW,
+             backend_name=DB_BACKEND, **DB_RESILIENCE_CONFIG, **DB_POOL_CONFIG)
 
-# Helper function to execute MySQL queries with retry logic (synchronous)
-def execute_with_retry(query, params=()):
-    conn = None
-    cursor = None
-    try:
-        for attempt in range(3):
-            try:
-                conn = mysql.connector.connect(**DB_CONFIG)
-                cursor = conn.cursor(dictionary=True)
-                cursor.execute(query, params)
-                if query.strip().upper().startswith(('INSERT', 'UPDATE', 'DELETE', 'CREATE', 'ALTER', 'DROP')):
-                    conn.commit()
-                return cursor, conn
-            except mysql.connector.Error as e:
-                if attempt < 2:
-                    time.sleep(1)
-                    continue
-                logger.error(f"Error al ejecutar la consulta: {e}")
-                raise e
-    except Exception as e:
-        logger.error(f"Error inesperado en execute_with_retry: {e}")
-        raise
-    finally:
-        pass  # El llamador debe cerrar cursor y conn
+# Registro de consultas lentas (se loguean con los parámetros censurados)
+query_stats.slow_threshold = float(os.getenv('DB_SLOW_QUERY_MS', 200)) / 1000
 
-def init_db():
-    """Inicializa la base de datos si no existe."""
-    tables = [
-        ('''
-        CREATE TABLE IF NOT EXISTS users (
-            user_id BIGINT PRIMARY KEY,
-            username TEXT NOT NULL,
-            points INTEGER DEFAULT 0,
-            last_daily TEXT
-        ) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci
-        ''', "users"),
-        ('''
-        CREATE TABLE IF NOT EXISTS guild_settings (
-            guild_id BIGINT PRIMARY KEY,
-            prefix VARCHAR(10) DEFAULT '!',
-            welcome_channel_id BIGINT,
-            welcome_message TEXT
-        ) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci
-        ''', "guild_settings"),
-        ('''
-        CREATE TABLE IF NOT EXISTS cedulas (
-            user_id BIGINT PRIMARY KEY,
-            rut VARCHAR(20) NOT NULL UNIQUE,
-            primer_nombre TEXT NOT NULL,
-            segundo_nombre TEXT NOT NULL,
-            apellido_paterno TEXT NOT NULL,
-            apellido_materno TEXT NOT NULL,
-            fecha_nacimiento TEXT NOT NULL,
-            edad INTEGER NOT NULL,
-            nacionalidad TEXT NOT NULL,
-            genero TEXT NOT NULL,
-            usuario_roblox TEXT NOT NULL,
-            fecha_emision TEXT NOT NULL,
-            fecha_vencimiento TEXT NOT NULL,
-            avatar_url TEXT
-        ) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci
-        ''', "cedulas"),
-        ('''
-        CREATE TABLE IF NOT EXISTS licencias (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            user_id BIGINT NOT NULL,
-            tipo_licencia TEXT NOT NULL,
-            nombre_licencia TEXT NOT NULL,
-            fecha_emision TEXT NOT NULL,
-            fecha_vencimiento TEXT NOT NULL,
-            emitida_por BIGINT NOT NULL,
-            FOREIGN KEY (user_id) REFERENCES cedulas(user_id)
-        ) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci
-        ''', "licencias"),
-        ('''
-        CREATE TABLE IF NOT EXISTS vehiculos (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            user_id BIGINT NOT NULL,
-            placa VARCHAR(20) NOT NULL UNIQUE,
-            modelo TEXT NOT NULL,
-            marca TEXT NOT NULL,
-            gama TEXT NOT NULL,
-            anio INTEGER NOT NULL,
-            color TEXT NOT NULL,
-            revision_tecnica TEXT NOT NULL,
-            permiso_circulacion TEXT NOT NULL,
-            codigo_pago TEXT NOT NULL,
-            imagen_url TEXT NOT NULL,
-            fecha_registro TEXT NOT NULL,
-            registrado_por BIGINT NOT NULL,
-            FOREIGN KEY (user_id) REFERENCES cedulas(user_id)
-        ) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci
-        ''', "vehiculos"),
-        ('''
-        CREATE TABLE IF NOT EXISTS payment_codes (
-            code VARCHAR(50) PRIMARY KEY,
-            amount BIGINT UNSIGNED NOT NULL,
-            description TEXT NOT NULL,
-            user_id BIGINT NOT NULL,
-            used BOOLEAN DEFAULT FALSE,
-            created_at TEXT NOT NULL,
-            used_at TEXT,
-            created_by BIGINT NOT NULL,
-            FOREIGN KEY (user_id) REFERENCES cedulas(user_id)
-        ) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci
-        ''', "payment_codes"),
-        ('''
-        CREATE TABLE IF NOT EXISTS propiedades (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            user_id BIGINT NOT NULL,
-            numero_domicilio VARCHAR(30) NOT NULL UNIQUE,
-            zona TEXT NOT NULL,
-            color TEXT NOT NULL,
-            numero_pisos INTEGER NOT NULL,
-            codigo_pago TEXT NOT NULL,
-            imagen_url TEXT NOT NULL,
-            fecha_registro TEXT NOT NULL,
-            registrado_por BIGINT NOT NULL,
-            FOREIGN KEY (user_id) REFERENCES cedulas(user_id)
-        ) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci
-        ''', "propiedades"),
-        ('''
-        CREATE TABLE IF NOT EXISTS arrestos (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            user_id TEXT NOT NULL,
-            rut TEXT NOT NULL,
-            razon TEXT NOT NULL,
-            tiempo_prision TEXT NOT NULL,
-            monto_multa INTEGER NOT NULL,
-            foto_url TEXT NOT NULL,
-            fecha_arresto TEXT NOT NULL,
-            oficial_id TEXT NOT NULL,
-            estado VARCHAR(20) DEFAULT 'Activo'
-        ) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci
-        ''', "arrestos"),
-        ('''
-        CREATE TABLE IF NOT EXISTS multas (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            user_id TEXT NOT NULL,
-            rut TEXT NOT NULL,
-            razon TEXT NOT NULL,
-            monto_multa INTEGER NOT NULL,
-            foto_url TEXT NOT NULL,
-            fecha_multa TEXT NOT NULL,
-            oficial_id TEXT NOT NULL,
-            estado VARCHAR(20) DEFAULT 'Pendiente'
-        ) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci
-        ''', "multas"),
-        ('''
-        CREATE TABLE IF NOT EXISTS emergencias (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            user_id BIGINT,
-            razon TEXT,
-            servicio TEXT,
-            ubicacion TEXT,
-            fecha TEXT,
-            servicios_notificados TEXT
-        ) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci
-        ''', "emergencias")
-    ]
+# Caché en memoria de cédulas, vehículos y propiedades (los "no existe" duran menos)
+entity_cache.configure(
+    max_size=int(os.getenv('ENTITY_CACHE_SIZE', 10000)),
+    ttl=float(os.getenv('ENTITY_CACHE_TTL', 60)),
+    negative_ttl=float(os.getenv('ENTITY_CACHE_NEGATIVE_TTL', 15))
+)
 
-    for query, table_name in tables:
-        cursor, conn = execute_with_retry(query)
-        try:
-            logger.info(f"Tabla '{table_name}' creada o verificada correctamente")
-        finally:
-            cursor.close()
-            conn.close()
+# Las alertas de /entorno se guardan en lote (INSERT de varias filas) desde un buffer acotado
+buffer_emergencias = write_buffer.InsertBuffer(
+    'emergencias',
+    ('user_id', 'razon', 'servicio', 'ubicacion', 'fecha', 'servicios_notificados'),
+    flush_interval=int(os.getenv('AUDIT_FLUSH_INTERVAL_MS', 500)) / 1000,
+    max_batch=int(os.getenv('AUDIT_BATCH_SIZE', 100)),
+    max_pending=int(os.getenv('AUDIT_MAX_PENDING', 5000))
+)
+
+# Los embeds de auditoría se envían en segundo plano, hasta 10 por mensaje y con una cola por canal de logs.
+# LOG_WEBHOOKS ("id_canal=url,...") los manda por webhooks, fuera de los límites de tasa del bot;
+# con LOG_SPILL_DIR lo que no cabe en la cola se guarda en disco en vez de descartarse.
+bitacora = log_dispatcher.LogDispatcher(
+    bot,
+    flush_interval=float(os.getenv('LOG_FLUSH_INTERVAL', 2)),
+    max_pending=int(os.getenv('LOG_MAX_PENDING', 1000)),
+    webhooks=log_dispatcher.parse_webhooks(os.getenv('LOG_WEBHOOKS', '')),
+    spill_dir=os.getenv('LOG_SPILL_DIR') or None
+)
+
+# Cliente compartido de las APIs de Roblox (conexiones keep-alive y caché DNS)
+roblox_client = roblox.RobloxClient(
+    total_timeout=float(os.getenv('ROBLOX_TIMEOUT', 4)),
+    connect_timeout=float(os.getenv('ROBLOX_CONNECT_TIMEOUT', 2)),
+    limit_per_host=int(os.getenv('ROBLOX_MAX_CONNECTIONS_PER_HOST', 8)),
+    rate=float(os.getenv('ROBLOX_RATE_PER_SECOND', 5)),  # Peticiones por segundo de todo el proceso
+    burst=int(os.getenv('ROBLOX_RATE_BURST', 10)),
+    breaker_threshold=int(os.getenv('ROBLOX_BREAKER_THRESHOLD', 5)),
+    breaker_reset=float(os.getenv('ROBLOX_BREAKER_RESET', 30)),
+    endpoint_reset=float(os.getenv('ROBLOX_ENDPOINT_RESET', 300))  # Segundos que se salta un endpoint caído
+)
+
+# Avatares resueltos: en memoria y en la tabla roblox_avatares (se actualizan en segundo plano al vencer)
+avatares = avatar_cache.AvatarCache(
+    roblox_client,
+    fresh_ttl=float(os.getenv('AVATAR_TTL_HOURS', 24)) * 3600,
+    max_stale=float(os.getenv('AVATAR_MAX_STALE_DAYS', 7)) * 86400,
+    negative_ttl=float(os.getenv('AVATAR_NEGATIVE_TTL_MINUTES', 60)) * 60,
+    lookup_deadline=float(os.getenv('ROBLOX_LOOKUP_DEADLINE', 3)),  # Espera máxima de /crear-cedula
+    retry_delay=float(os.getenv('AVATAR_RETRY_DELAY', 30))
+)
+
+# RUT desde un contador persistente permutado; cada proceso reserva bloques de valores
+asignador_rut = rut_allocator.RutAllocator(block_size=int(os.getenv('RUT_BLOCK_SIZE', 16)))
+# Intentos de /crear-cedula si el RUT asignado choca con uno anterior al contador
+INTENTOS_RUT = 3
 
-    logger.info("✅ Base de datos inicializada correctamente")
+# Formatos con que los embeds muestran las fechas guardadas como DATE/DATETIME
+FORMATO_FECHA = "%d/%m/%Y"
+FORMATO_FECHA_HORA = "%d/%m/%Y %H:%M:%S"
+FORMATO_FECHA_HORA_ISO = "%Y-%m-%d %H:%M:%S"  # Arrestos y multas
+
+def formatear_fecha(valor, formato=FORMATO_FECHA):
+    """Formatea una fecha de la base de datos para mostrarla en un embed"""
+    if hasattr(valor, 'strftime'):
+        return valor.strftime(formato)
+    return valor
 
 # Definir los tipos de licencias disponibles
 TIPOS_LICENCIAS = {
@@ -265,121 +266,14 @@ ESTADOS_PERMISO = [
 ZONAS_PROPIEDAD = ["Quilicura", "La Granja", "Las Condes", "Pudahuel"]
 
 # Función para generar un RUT chileno único y válido
-def generar_rut():
-    """Genera un RUT único."""
-    def calcular_digito_verificador(rut_base):
-        """Calcula el dígito verificador para un RUT."""
-        factores = [2, 3, 4, 5, 6, 7, 2, 3]
-        suma = 0
-        for i, digito in enumerate(str(rut_base)[::-1]):
-            suma += int(digito) * factores[i % len(factores)]
-        resto = suma % 11
-        dv = 11 - resto
-        if dv == 11:
-            return '0'
-        if dv == 10:
-            return 'K'
-        return str(dv)
-
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
-        while True:
-            rut_base = random.randint(10000000, 99999999)
-            digito_verificador = calcular_digito_verificador(rut_base)
-            rut = f"{rut_base}-{digito_verificador}"
-            cursor.execute("SELECT rut FROM cedulas WHERE rut = %s", (rut,))
-            if not cursor.fetchone():
-                return rut
-    finally:
-        cursor.close()
-        conn.close()
+async def generar_rut():
+    """Genera un RUT único (ver ``rut_allocator``: no consulta la tabla de cédulas)."""
+    return await asignador_rut.allocate()
 
-# Función para validar fecha de nacimiento
-def validar_fecha_nacimiento(fecha_str):
-    try:
-        # Convertir string a objeto datetime
-        fecha = datetime.strptime(fecha_str, "%d-%m-%Y")
-        
-        # Calcular edad
-        hoy = datetime.now()
-        edad = hoy.year - fecha.year - ((hoy.month, hoy.day) < (fecha.month, fecha.day))
-        
-        # Validar que la edad esté entre 18 y 80 años
-        if 18 <= edad <= 80:
-            return True, edad
-        else:
-            return False, None
-    except ValueError:
-        return False, None
 
-# Función para obtener avatar de Roblox
-async def obtener_avatar_roblox(username):
-    try:
-        # Verificar conexión a Roblox
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.get("https://www.roblox.com", timeout=5.0) as resp:
-                    if resp.status != 200:
-                        logger.warning(f"No se puede conectar al sitio web de Roblox, estado: {resp.status}")
-                        return "https://tr.rbxcdn.com/e5b3371b4efc7642a22c1b36265a9ba9/420/420/AvatarHeadshot/Png"
-            except Exception as e:
-                logger.warning(f"No se puede conectar al sitio web de Roblox: {e}")
-                return "https://tr.rbxcdn.com/e5b3371b4efc7642a22c1b36265a9ba9/420/420/AvatarHeadshot/Png"
-            
-            # Intentar diferentes APIs para encontrar el ID de usuario
-            apis_to_try = [
-                f"https://api.roblox.com/users/get-by-username?username={username}",
-                f"https://users.roblox.com/v1/users/search?keyword={username}&limit=10"
-            ]
-            
-            user_id = None
-            
-            for api_url in apis_to_try:
-                try:
-                    async with session.get(api_url, timeout=10.0) as resp:
-                        if resp.status != 200:
-                            continue
-                        
-                        data = await resp.json()
-                        
-                        if "Id" in data:
-                            user_id = data["Id"]
-                            break
-                        elif "data" in data and len(data["data"]) > 0:
-                            for user in data["data"]:
-                                if user.get("name", "").lower() == username.lower():
-                                    user_id = user.get("id")
-                                    break
-                            if user_id:
-                                break
-                except Exception as e:
-                    logger.warning(f"Error al intentar con API {api_url}: {e}")
-                    continue
-            
-            if not user_id:
-                logger.warning(f"No se pudo encontrar el ID de usuario para {username}, usando avatar predeterminado")
-                return "https://tr.rbxcdn.com/e5b3371b4efc7642a22c1b36265a9ba9/420/420/AvatarHeadshot/Png"
-            
-            # Obtener URL del avatar
-            try:
-                avatar_url = f"https://thumbnails.roblox.com/v1/users/avatar-headshot?userIds={user_id}&size=420x420&format=Png"
-                async with session.get(avatar_url, timeout=10.0) as resp:
-                    if resp.status == 200:
-                        avatar_data = await resp.json()
-                        if "data" in avatar_data and len(avatar_data["data"]) > 0:
-                            avatar_url = avatar_data["data"][0].get("imageUrl")
-                            if avatar_url:
-                                return avatar_url
-            except Exception as e:
-                logger.error(f"Error al obtener avatar: {e}")
-            
-            # Si todo lo anterior falla, usar URL directa
-            return f"https://www.roblox.com/headshot-thumbnail/image?userId={user_id}&width=420&height=420&format=png"
-                
-    except Exception as e:
-        logger.error(f"Error al buscar usuario de Roblox: {e}")
-        return "https://tr.rbxcdn.com/e5b3371b4efc7642a22c1b36265a9ba9/420/420/AvatarHeadshot/Png"
+async def rut_en_uso(rut):
+    """Indica si el RUT ya está asignado; solo se consulta tras chocar con el índice UNIQUE."""
+    return await db.fetch_one("SELECT 1 FROM cedulas WHERE rut = %s", (rut,), row=tuple) is not None
 
 # Lista de nacionalidades comunes para autocompletar
 NACIONALIDADES = [
@@ -415,18 +309,72 @@ async def autocompletar_genero(
         opciones.append(app_commands.Choice(name="Femenino", value="F"))
     return opciones
 
+@tasks.loop(seconds=DB_POOL_HEALTH_INTERVAL)
+async def revisar_pool_db():
+    """Verifica periódicamente las conexiones del pool y recicla las inactivas"""
+    try:
+        stats = await db.to_thread(db.get_pool().health_check)
+        logger.debug(f"Pool de conexiones: {stats}")
+        if db.get_replica_pool():
+            stats = await db.to_thread(db.get_replica_pool().health_check)
+            logger.debug(f"Pool de la réplica de lectura: {stats}")
+        logger.debug(f"Caché de sentencias preparadas: {db.statement_cache_stats()}")
+        logger.debug(f"Caché de entidades: {entity_cache.stats()}")
+        logger.debug(f"Caché de avatares: {avatares.stats()}")
+        logger.debug(f"Cliente de Roblox: {roblox_client.stats()}")
+        logger.debug(f"Logs en segundo plano: {bitacora.stats()}")
+    except Exception as e:
+        logger.error(f"Error al verificar el pool de conexiones: {e}")
+
+@tasks.loop(hours=float(os.getenv('AVATAR_REFRESH_INTERVAL_HOURS', 6)))
+async def refrescar_avatares():
+    """Renueva en lotes los avatares de Roblox vencidos de todas las cédulas"""
+    try:
+        await avatares.refresh_stale(
+            batch_size=int(os.getenv('AVATAR_REFRESH_BATCH_SIZE', 100)),
+            concurrency=int(os.getenv('AVATAR_REFRESH_CONCURRENCY', 4))
+        )
+    except Exception as e:
+        logger.error(f"Error al refrescar los avatares de Roblox: {e}")
+
+def embed_bd_no_disponible():
+    """Embed que se muestra cuando la base de datos no está disponible"""
+    embed = discord.Embed(
+        title="🛠️ Sistema no disponible",
+        description="La base de datos no está respondiendo en este momento. Por favor, intenta nuevamente en unos minutos.",
+        color=discord.Color.orange()
+    )
+    embed.set_footer(text="Santiago RP - Sistema de Registro Civil")
+    return embed
+
+@bot.tree.error
+async def on_app_command_error(interaction: discord.Interaction, error: app_commands.AppCommandError):
+    """Maneja los errores no controlados de los comandos de barra diagonal"""
+    original = getattr(error, 'original', error)
+    if not isinstance(original, db.DatabaseUnavailable):
+        nombre_comando = interaction.command.name if interaction.command else "desconocido"
+        logger.error(f"Error no controlado en el comando /{nombre_comando}: {error}", exc_info=error)
+        return
+
+    # Responder de inmediato en lugar de dejar la interacción colgada
+    embed = embed_bd_no_disponible()
+    try:
+        if interaction.response.is_done():
+            await interaction.followup.send(embed=embed, ephemeral=True)
+        else:
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+    except discord.HTTPException as e:
+        logger.error(f"No se pudo informar la caída de la base de datos: {e}")
+
 @bot.event
 async def on_ready():
     """Evento que se ejecuta cuando el bot está listo"""
     logger.info(f'🚀 Bot conectado como {bot.user.name}')
 
-    # Inicializar la base de datos
-    try:
-        init_db()
-        logger.info('✅ Base de datos inicializada correctamente')
-    except Exception as e:
-        logger.error(f'❌ Error al inicializar la base de datos: {e}')
-        raise
+    if not revisar_pool_db.is_running():
+        revisar_pool_db.start()
+    if not refrescar_avatares.is_running():
+        refrescar_avatares.start()
 
     # Sincronizar los comandos de aplicación con Discord
     try:
@@ -490,29 +438,24 @@ async def slash_crear_cedula(
         return
     
     # Verificar si el usuario ya tiene una cédula
-    cursor, conn = execute_with_retry('SELECT rut FROM cedulas WHERE user_id = %s', (str(interaction.user.id),))
-    try:
-        cedula_existente = cursor.fetchone()
-        if cedula_existente:
-            embed = discord.Embed(
-                title="❌ Ya tienes una cédula",
-                description=f"Ya tienes una cédula de identidad registrada con el RUT: **{cedula_existente['rut']}**",
-                color=discord.Color.red()
-            )
-            embed.add_field(
-                name="📋 Ver tu Cédula",
-                value=f"Puedes ver tu cédula en cualquier momento usando el comando `/ver-cedula` en el canal <#{1339386616803885089}>",
-                inline=False
-            )
-            embed.set_footer(text="Santiago RP - Sistema de Registro Civil")
-            await interaction.followup.send(embed=embed, ephemeral=True)
-            return
-    finally:
-        cursor.close()
-        conn.close()
+    cedula_existente = await db.fetch_one('SELECT rut FROM cedulas WHERE user_id = %s', (str(interaction.user.id),))
+    if cedula_existente:
+        embed = discord.Embed(
+            title="❌ Ya tienes una cédula",
+            description=f"Ya tienes una cédula de identidad registrada con el RUT: **{cedula_existente['rut']}**",
+            color=discord.Color.red()
+        )
+        embed.add_field(
+            name="📋 Ver tu Cédula",
+            value=f"Puedes ver tu cédula en cualquier momento usando el comando `/ver-cedula` en el canal <#{1339386616803885089}>",
+            inline=False
+        )
+        embed.set_footer(text="Santiago RP - Sistema de Registro Civil")
+        await interaction.followup.send(embed=embed, ephemeral=True)
+        return
     
     # Validar fecha de nacimiento
-    fecha_valida, edad = validar_fecha_nacimiento(fecha_nacimiento)
+    fecha_valida, edad = validaciones.validar_fecha_nacimiento(fecha_nacimiento)
     if not fecha_valida:
         embed = discord.Embed(
             title="❌ Fecha inválida",
@@ -532,30 +475,37 @@ async def slash_crear_cedula(
         await interaction.followup.send(embed=embed, ephemeral=True)
         return
 
-    # Obtener avatar de Roblox
-    avatar_url = await obtener_avatar_roblox(usuario_roblox)
-
-    # Generar RUT único
-    rut = generar_rut()
+    # Obtener avatar de Roblox (si Roblox no responde a tiempo, queda el por defecto y se reintenta)
+    avatar_url = await avatares.resolve(usuario_roblox, interaction.user.id)
 
     # Generar fechas de emisión y vencimiento
-    fecha_emision = datetime.now().strftime("%d/%m/%Y")
-    fecha_vencimiento = (datetime.now() + timedelta(days=365*5)).strftime("%d/%m/%Y")  # 5 años de validez
-
-    # Guardar en la base de datos
-    cursor, conn = execute_with_retry('''
-    INSERT INTO cedulas (
-        user_id, rut, primer_nombre, segundo_nombre, apellido_paterno, 
-        apellido_materno, fecha_nacimiento, edad, nacionalidad, genero, 
-        usuario_roblox, fecha_emision, fecha_vencimiento, avatar_url
-    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-    ''', (
-        str(interaction.user.id), rut, primer_nombre, segundo_nombre, apellido_paterno,
-        apellido_materno, fecha_nacimiento, edad, nacionalidad, genero.upper(),
-        usuario_roblox, fecha_emision, fecha_vencimiento, avatar_url
-    ))
+    fecha_emision = datetime.now().date()
+    fecha_vencimiento = fecha_emision + timedelta(days=365*5)  # 5 años de validez
 
     try:
+        # Generar RUT único y guardar en la base de datos
+        for intento in range(INTENTOS_RUT):
+            rut = await generar_rut()
+            try:
+                await db.execute('''
+                INSERT INTO cedulas (
+                    user_id, rut, primer_nombre, segundo_nombre, apellido_paterno, 
+                    apellido_materno, fecha_nacimiento, edad, nacionalidad, genero, 
+                    usuario_roblox, fecha_emision, fecha_vencimiento, avatar_url
+                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                ''', (
+                    str(interaction.user.id), rut, primer_nombre, segundo_nombre, apellido_paterno,
+                    apellido_materno, fecha_nacimiento, edad, nacionalidad, genero.upper(),
+                    usuario_roblox, fecha_emision, fecha_vencimiento, avatar_url
+                ), pin=(interaction.user.id,))
+                break
+            except mysql.connector.errors.IntegrityError:
+                # El índice UNIQUE es la última defensa: un RUT aleatorio de antes del contador
+                if intento + 1 == INTENTOS_RUT or not await rut_en_uso(rut):
+                    raise
+                logger.warning(f"El RUT {rut} ya estaba asignado; se genera otro")
+        entity_cache.invalidate(user_id=interaction.user.id)
+
         # Crear embed con la información de la cédula, siguiendo el formato de la imagen
         embed = discord.Embed(
             title="🇨🇱 SANTIAGO RP 🇨🇱\nSERVICIO DE REGISTRO CIVIL E IDENTIFICACIÓN\nCÉDULA DE IDENTIDAD",
@@ -595,12 +545,12 @@ async def slash_crear_cedula(
         )
         embed.add_field(
             name="Fecha Emisión",
-            value=fecha_emision,
+            value=formatear_fecha(fecha_emision),
             inline=True
         )
         embed.add_field(
             name="Fecha Vencimiento",
-            value=fecha_vencimiento,
+            value=formatear_fecha(fecha_vencimiento),
             inline=True
         )
         embed.add_field(
@@ -621,10 +571,6 @@ async def slash_crear_cedula(
         )
         await interaction.followup.send(embed=embed, ephemeral=True)
 
-    finally:
-        cursor.close()
-        conn.close()
-
 # Comando de barra diagonal para ver cédula
 @bot.tree.command(name="ver-cedula", description="Muestra tu cédula de identidad o la de otro usuario")
 @app_commands.describe(ciudadano="Usuario del que quieres ver la cédula (opcional)")
@@ -646,82 +592,73 @@ async def slash_ver_cedula(interaction: discord.Interaction, ciudadano: discord.
         ciudadano = interaction.user
     
     # Obtener la cédula de la base de datos
-    cursor, conn = execute_with_retry('''
-    SELECT * FROM cedulas WHERE user_id = %s
-    ''', (str(ciudadano.id),))
+    cedula = await repository.load_cedula(ciudadano.id, replica=True)
     
-    try:
-        cedula = cursor.fetchone()
-        
-        if not cedula:
-            embed = discord.Embed(
-                title="❌ Cédula no encontrada",
-                description=f"No se encontró una cédula registrada para {ciudadano.mention}.",
-                color=discord.Color.red()
-            )
-            await interaction.response.send_message(embed=embed, ephemeral=True)
-            return
-        
-        # Crear embed con la información de la cédula, siguiendo el formato de la imagen
+    if not cedula:
         embed = discord.Embed(
-            title="🇨🇱 SANTIAGO RP 🇨🇱\nSERVICIO DE REGISTRO CIVIL E IDENTIFICACIÓN\nCÉDULA DE IDENTIDAD",
-            description=f"**RUT:** {cedula['rut']}",
-            color=discord.Color.blue()
-        )
-        
-        embed.add_field(
-            name="Nombres",
-            value=f"{cedula['primer_nombre']} {cedula['segundo_nombre']}",
-            inline=True
-        )
-        embed.add_field(
-            name="Apellidos",
-            value=f"{cedula['apellido_paterno']} {cedula['apellido_materno']}",
-            inline=True
-        )
-        embed.add_field(
-            name="Nacionalidad",
-            value=cedula['nacionalidad'],
-            inline=True
-        )
-        embed.add_field(
-            name="Fecha Nacimiento",
-            value=cedula['fecha_nacimiento'],
-            inline=True
-        )
-        embed.add_field(
-            name="Sexo",
-            value=cedula['genero'],
-            inline=True
-        )
-        embed.add_field(
-            name="Edad",
-            value=f"{cedula['edad']} años",
-            inline=True
-        )
-        embed.add_field(
-            name="Fecha Emisión",
-            value=cedula['fecha_emision'],
-            inline=True
-        )
-        embed.add_field(
-            name="Fecha Vencimiento",
-            value=cedula['fecha_vencimiento'],
-            inline=True
-        )
-        embed.add_field(
-            name="Usuario de Roblox",
-            value=cedula['usuario_roblox'],
-            inline=True
+            title="❌ Cédula no encontrada",
+            description=f"No se encontró una cédula registrada para {ciudadano.mention}.",
+            color=discord.Color.red()
         )
-        
-        embed.set_thumbnail(url=cedula['avatar_url'])
-        
-        await interaction.response.send_message(embed=embed)
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+        return
+    
+    # Crear embed con la información de la cédula, siguiendo el formato de la imagen
+    embed = discord.Embed(
+        title="🇨🇱 SANTIAGO RP 🇨🇱\nSERVICIO DE REGISTRO CIVIL E IDENTIFICACIÓN\nCÉDULA DE IDENTIDAD",
+        description=f"**RUT:** {cedula.rut}",
+        color=discord.Color.blue()
+    )
+    
+    embed.add_field(
+        name="Nombres",
+        value=f"{cedula.primer_nombre} {cedula.segundo_nombre}",
+        inline=True
+    )
+    embed.add_field(
+        name="Apellidos",
+        value=f"{cedula.apellido_paterno} {cedula.apellido_materno}",
+        inline=True
+    )
+    embed.add_field(
+        name="Nacionalidad",
+        value=cedula.nacionalidad,
+        inline=True
+    )
+    embed.add_field(
+        name="Fecha Nacimiento",
+        value=cedula.fecha_nacimiento,
+        inline=True
+    )
+    embed.add_field(
+        name="Sexo",
+        value=cedula.genero,
+        inline=True
+    )
+    embed.add_field(
+        name="Edad",
+        value=f"{cedula.edad} años",
+        inline=True
+    )
+    embed.add_field(
+        name="Fecha Emisión",
+        value=formatear_fecha(cedula.fecha_emision),
+        inline=True
+    )
+    embed.add_field(
+        name="Fecha Vencimiento",
+        value=formatear_fecha(cedula.fecha_vencimiento),
+        inline=True
+    )
+    embed.add_field(
+        name="Usuario de Roblox",
+        value=cedula.usuario_roblox,
+        inline=True
+    )
     
-    finally:
-        cursor.close()
-        conn.close()
+    embed.set_thumbnail(url=avatares.avatar_for(cedula))
+    
+    await interaction.response.send_message(embed=embed)
 
 @bot.tree.command(name="eliminar-cedula", description="Elimina la cédula de identidad de un ciudadano")
 @app_commands.describe(ciudadano="Ciudadano cuya cédula deseas eliminar")
@@ -747,82 +684,66 @@ async def slash_eliminar_cedula(interaction: discord.Interaction, ciudadano: dis
             await interaction.followup.send(embed=embed, ephemeral=True)
             return
 
-        cursor, conn = execute_with_retry('''
-        SELECT rut, primer_nombre, segundo_nombre, apellido_paterno, apellido_materno
-        FROM cedulas WHERE user_id = %s
-        ''', (str(ciudadano.id),))
-        try:
-            result = cursor.fetchone()
-            if not result:
-                embed = discord.Embed(
-                    title="❌ Cédula no encontrada",
-                    description=f"{ciudadano.display_name} no tiene una cédula de identidad registrada.",
-                    color=discord.Color.red()
-                )
-                await interaction.followup.send(embed=embed, ephemeral=True)
-                return
-            rut = result['rut']
-            nombre_completo = f"{result['primer_nombre']} {result['segundo_nombre']} {result['apellido_paterno']} {result['apellido_materno']}"
-        finally:
-            cursor.close()
-            conn.close()
-
-        # Eliminar licencias relacionadas antes de eliminar la cédula
-        cursor, conn = execute_with_retry('DELETE FROM licencias WHERE user_id = %s', (str(ciudadano.id),))
-        cursor.close()
-        conn.close()
-
-        # Ahora sí elimina la cédula
-        cursor, conn = execute_with_retry('DELETE FROM cedulas WHERE user_id = %s', (str(ciudadano.id),))
-        try:
+        cedula = await repository.load_cedula(ciudadano.id)
+        if not cedula:
             embed = discord.Embed(
-                title="✅ Cédula Eliminada",
-                description=f"La cédula de identidad de {ciudadano.mention} ha sido eliminada correctamente.",
-                color=discord.Color.green()
-            )
-            embed.add_field(
-                name="Información eliminada",
-                value=f"RUT: {rut}\nNombre: {nombre_completo}",
-                inline=False
+                title="❌ Cédula no encontrada",
+                description=f"{ciudadano.display_name} no tiene una cédula de identidad registrada.",
+                color=discord.Color.red()
             )
-            embed.set_footer(text="Santiago RP - Sistema de Registro Civil")
-            await interaction.followup.send(embed=embed, ephemeral=False)
+            await interaction.followup.send(embed=embed, ephemeral=True)
+            return
+        rut = cedula.rut
+        nombre_completo = f"{cedula.primer_nombre} {cedula.segundo_nombre} {cedula.apellido_paterno} {cedula.apellido_materno}"
 
-            canal_logs = interaction.guild.get_channel(canal_logs_id)
-            if canal_logs:
-                log_embed = discord.Embed(
-                    title="🗑️ Cédula Eliminada",
-                    description=f"Se ha eliminado una cédula de identidad del sistema.",
-                    color=discord.Color.orange(),
-                    timestamp=datetime.now()
-                )
-                log_embed.add_field(
-                    name="Administrador",
-                    value=f"{interaction.user.mention} ({interaction.user.name})",
-                    inline=True
-                )
-                log_embed.add_field(
-                    name="Ciudadano",
-                    value=f"{ciudadano.mention} ({ciudadano.name})",
-                    inline=True
-                )
-                log_embed.add_field(
-                    name="RUT eliminado",
-                    value=rut,
-                    inline=True
-                )
-                log_embed.add_field(
-                    name="Nombre completo",
-                    value=nombre_completo,
-                    inline=False
-                )
-                log_embed.set_footer(text=f"ID del usuario: {ciudadano.id}")
-                await canal_logs.send(embed=log_embed)
-            else:
-                logger.error(f"No se pudo encontrar el canal de logs con ID {canal_logs_id}")
-        finally:
-            cursor.close()
-            conn.close()
+        # Eliminar las licencias y la cédula en una sola transacción
+        async with db.unit_of_work(pin=(ciudadano.id,)) as tx:
+            tx.execute('DELETE FROM licencias WHERE user_id = %s', (str(ciudadano.id),))
+            tx.execute('DELETE FROM cedulas WHERE user_id = %s', (str(ciudadano.id),))
+        entity_cache.invalidate(user_id=ciudadano.id)
+        embed = discord.Embed(
+            title="✅ Cédula Eliminada",
+            description=f"La cédula de identidad de {ciudadano.mention} ha sido eliminada correctamente.",
+            color=discord.Color.green()
+        )
+        embed.add_field(
+            name="Información eliminada",
+            value=f"RUT: {rut}\nNombre: {nombre_completo}",
+            inline=False
+        )
+        embed.set_footer(text="Santiago RP - Sistema de Registro Civil")
+        await interaction.followup.send(embed=embed, ephemeral=False)
+
+        log_embed = discord.Embed(
+            title="🗑️ Cédula Eliminada",
+            description=f"Se ha eliminado una cédula de identidad del sistema.",
+            color=discord.Color.orange(),
+            timestamp=datetime.now()
+        )
+        log_embed.add_field(
+            name="Administrador",
+            value=f"{interaction.user.mention} ({interaction.user.name})",
+            inline=True
+        )
+        log_embed.add_field(
+            name="Ciudadano",
+            value=f"{ciudadano.mention} ({ciudadano.name})",
+            inline=True
+        )
+        log_embed.add_field(
+            name="RUT eliminado",
+            value=rut,
+            inline=True
+        )
+        log_embed.add_field(
+            name="Nombre completo",
+            value=nombre_completo,
+            inline=False
+        )
+        log_embed.set_footer(text=f"ID del usuario: {ciudadano.id}")
+        bitacora.send(canal_logs_id, log_embed)
+    except db.DatabaseUnavailable:
+        raise
     except Exception as e:
         logger.error(f"Error al eliminar cédula: {e}")
         embed = discord.Embed(
@@ -896,38 +817,27 @@ async def slash_tramitar_licencia(
         await interaction.response.send_message(embed=embed, ephemeral=True)
         return
     
-    # Verificar si el ciudadano tiene cédula
-    cursor, conn = execute_with_retry('SELECT rut FROM cedulas WHERE user_id = %s', (str(ciudadano.id),))
-    try:
-        cedula = cursor.fetchone()
-        if not cedula:
-            embed = discord.Embed(
-                title="❌ Ciudadano sin cédula",
-                description=f"{ciudadano.mention} no tiene una cédula de identidad registrada. Debe tramitar su cédula primero.",
-                color=discord.Color.red()
-            )
-            await interaction.response.send_message(embed=embed, ephemeral=True)
-            return
-    finally:
-        cursor.close()
-        conn.close()
+    # Verificar si el ciudadano tiene cédula y si ya tiene la licencia, en una sola consulta
+    contexto = await repository.load_license_context(str(ciudadano.id), tipo_licencia)
+    if not contexto:
+        embed = discord.Embed(
+            title="❌ Ciudadano sin cédula",
+            description=f"{ciudadano.mention} no tiene una cédula de identidad registrada. Debe tramitar su cédula primero.",
+            color=discord.Color.red()
+        )
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+        return
+    cedula, licencia_existente = contexto
     
     # Verificar si el ciudadano ya tiene la licencia específica que está tramitando
-    cursor, conn = execute_with_retry('SELECT id FROM licencias WHERE user_id = %s AND tipo_licencia = %s', 
-                                     (str(ciudadano.id), tipo_licencia))
-    try:
-        licencia_existente = cursor.fetchone()
-        if licencia_existente:
-            embed = discord.Embed(
-                title="❌ Licencia ya tramitada",
-                description=f"{ciudadano.mention} ya tiene tramitada la licencia {TIPOS_LICENCIAS[tipo_licencia]['nombre']}.",
-                color=discord.Color.red()
-            )
-            await interaction.response.send_message(embed=embed, ephemeral=True)
-            return
-    finally:
-        cursor.close()
-        conn.close()
+    if licencia_existente:
+        embed = discord.Embed(
+            title="❌ Licencia ya tramitada",
+            description=f"{ciudadano.mention} ya tiene tramitada la licencia {TIPOS_LICENCIAS[tipo_licencia]['nombre']}.",
+            color=discord.Color.red()
+        )
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+        return
     
     # Verificar si el ciudadano tiene el rol requerido
     rol_id = TIPOS_LICENCIAS[tipo_licencia]['rol_id']
@@ -952,60 +862,57 @@ async def slash_tramitar_licencia(
         return
     
     # Calcular fechas de emisión y vencimiento
-    fecha_emision = datetime.now().strftime("%d/%m/%Y")
-    fecha_vencimiento = (datetime.now() + timedelta(days=365*2)).strftime("%d/%m/%Y")  # 2 años de validez
+    fecha_emision = datetime.now().date()
+    fecha_vencimiento = fecha_emision + timedelta(days=365*2)  # 2 años de validez
     
     # Guardar la licencia en la base de datos
     try:
-        cursor, conn = execute_with_retry('''
+        await db.execute('''
         INSERT INTO licencias 
         (user_id, tipo_licencia, nombre_licencia, fecha_emision, fecha_vencimiento, emitida_por) 
         VALUES (%s, %s, %s, %s, %s, %s)
         ''', (str(ciudadano.id), tipo_licencia, TIPOS_LICENCIAS[tipo_licencia]['nombre'], 
-              fecha_emision, fecha_vencimiento, str(interaction.user.id)))
+              fecha_emision, fecha_vencimiento, str(interaction.user.id)), pin=(ciudadano.id,))
         
-        try:
-            # Crear y enviar el mensaje embebido con la licencia
-            embed = discord.Embed(
-                title=f"🇨🇱 SANTIAGO RP 🇨🇱",
-                description="DIRECCIÓN DE TRÁNSITO Y TRANSPORTE PÚBLICO",
-                color=discord.Color.blue()
-            )
-            
-            embed.add_field(name="LICENCIA DE CONDUCIR", value=f"Tipo: {tipo_licencia}", inline=False)
-            embed.add_field(name="Descripción", value=TIPOS_LICENCIAS[tipo_licencia]['nombre'], inline=False)
-            embed.add_field(name="Titular", value=ciudadano.mention, inline=True)
-            embed.add_field(name="RUT", value=cedula['rut'], inline=True)
-            embed.add_field(name="Fecha Emisión", value=fecha_emision, inline=True)
-            embed.add_field(name="Fecha Vencimiento", value=fecha_vencimiento, inline=True)
-            embed.add_field(name="Emitida por", value=interaction.user.mention, inline=True)
-            
-            # Establecer la imagen del avatar del ciudadano
-            embed.set_thumbnail(url=ciudadano.display_avatar.url)
-            
-            # Enviar la licencia al canal
-            await interaction.response.send_message(embed=embed)
-            
-            # Enviar mensaje efímero de confirmación al usuario
-            confirmacion_embed = discord.Embed(
-                title="✅ ¡Licencia Tramitada con Éxito!",
-                description=f"La licencia {tipo_licencia} ha sido tramitada correctamente para {ciudadano.mention}",
-                color=discord.Color.green()
-            )
-            confirmacion_embed.add_field(
-                name="📋 Detalles",
-                value=f"Tipo: {tipo_licencia} - {TIPOS_LICENCIAS[tipo_licencia]['nombre']}\nVálida hasta: {fecha_vencimiento}",
-                inline=False
-            )
-            confirmacion_embed.set_footer(text="Santiago RP - Dirección de Tránsito")
-            
-            # Enviar mensaje efímero al usuario
-            await interaction.followup.send(embed=confirmacion_embed, ephemeral=True)
+        # Crear y enviar el mensaje embebido con la licencia
+        embed = discord.Embed(
+            title=f"🇨🇱 SANTIAGO RP 🇨🇱",
+            description="DIRECCIÓN DE TRÁNSITO Y TRANSPORTE PÚBLICO",
+            color=discord.Color.blue()
+        )
+        
+        embed.add_field(name="LICENCIA DE CONDUCIR", value=f"Tipo: {tipo_licencia}", inline=False)
+        embed.add_field(name="Descripción", value=TIPOS_LICENCIAS[tipo_licencia]['nombre'], inline=False)
+        embed.add_field(name="Titular", value=ciudadano.mention, inline=True)
+        embed.add_field(name="RUT", value=cedula.rut, inline=True)
+        embed.add_field(name="Fecha Emisión", value=formatear_fecha(fecha_emision), inline=True)
+        embed.add_field(name="Fecha Vencimiento", value=formatear_fecha(fecha_vencimiento), inline=True)
+        embed.add_field(name="Emitida por", value=interaction.user.mention, inline=True)
+        
+        # Establecer la imagen del avatar del ciudadano
+        embed.set_thumbnail(url=ciudadano.display_avatar.url)
         
-        finally:
-            cursor.close()
-            conn.close()
+        # Enviar la licencia al canal
+        await interaction.response.send_message(embed=embed)
+        
+        # Enviar mensaje efímero de confirmación al usuario
+        confirmacion_embed = discord.Embed(
+            title="✅ ¡Licencia Tramitada con Éxito!",
+            description=f"La licencia {tipo_licencia} ha sido tramitada correctamente para {ciudadano.mention}",
+            color=discord.Color.green()
+        )
+        confirmacion_embed.add_field(
+            name="📋 Detalles",
+            value=f"Tipo: {tipo_licencia} - {TIPOS_LICENCIAS[tipo_licencia]['nombre']}\nVálida hasta: {formatear_fecha(fecha_vencimiento)}",
+            inline=False
+        )
+        confirmacion_embed.set_footer(text="Santiago RP - Dirección de Tránsito")
+        
+        # Enviar mensaje efímero al usuario
+        await interaction.followup.send(embed=confirmacion_embed, ephemeral=True)
             
+    except db.DatabaseUnavailable:
+        raise
     except Exception as e:
         logger.error(f"Error al tramitar licencia: {e}")
         embed = discord.Embed(
@@ -1049,80 +956,58 @@ async def slash_ver_licencia(
         await interaction.response.send_message(embed=embed, ephemeral=True)
         return
     
-    # Verificar si el ciudadano tiene cédula y obtener su información
-    cursor, conn = execute_with_retry('''
-    SELECT rut, avatar_url 
-    FROM cedulas WHERE user_id = %s
-    ''', (str(ciudadano.id),))
-    
-    try:
-        cedula = cursor.fetchone()
-        if not cedula:
-            embed = discord.Embed(
-                title="❌ Ciudadano sin cédula",
-                description=f"{ciudadano.mention} no tiene una cédula de identidad registrada.",
-                color=discord.Color.red()
-            )
-            await interaction.response.send_message(embed=embed, ephemeral=True)
-            return
-        
-        rut = cedula['rut']
-        avatar_url = cedula['avatar_url']
-    
-    finally:
-        cursor.close()
-        conn.close()
+    # Obtener la cédula y la licencia específica del ciudadano en una sola consulta
+    contexto = await repository.load_license_context(str(ciudadano.id), tipo_licencia, replica=True)
+    if not contexto:
+        embed = discord.Embed(
+            title="❌ Ciudadano sin cédula",
+            description=f"{ciudadano.mention} no tiene una cédula de identidad registrada.",
+            color=discord.Color.red()
+        )
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+        return
     
-    # Obtener la licencia específica del ciudadano
-    cursor, conn = execute_with_retry('''
-    SELECT nombre_licencia, fecha_emision, fecha_vencimiento, emitida_por
-    FROM licencias 
-    WHERE user_id = %s AND tipo_licencia = %s
-    ''', (str(ciudadano.id), tipo_licencia))
+    cedula, licencia = contexto
+    rut = cedula.rut
+    avatar_url = avatares.avatar_for(cedula)
     
-    try:
-        licencia = cursor.fetchone()
-        if not licencia:
-            embed = discord.Embed(
-                title="❌ Licencia no encontrada",
-                description=f"{ciudadano.mention} no tiene la licencia tipo {tipo_licencia} tramitada.",
-                color=discord.Color.red()
-            )
-            await interaction.response.send_message(embed=embed, ephemeral=True)
-            return
-        
-        nombre_licencia = licencia['nombre_licencia']
-        fecha_emision = licencia['fecha_emision']
-        fecha_vencimiento = licencia['fecha_vencimiento']
-        emitida_por = licencia['emitida_por']
-        
-        # Obtener el nombre del emisor si está disponible
-        emisor = interaction.guild.get_member(int(emitida_por))
-        emisor_nombre = emisor.mention if emisor else "Desconocido"
-        
-        # Crear y enviar el mensaje embebido con la licencia
+    if not licencia:
         embed = discord.Embed(
-            title=f"🇨🇱 SANTIAGO RP 🇨🇱",
-            description="DIRECCIÓN DE TRÁNSITO Y TRANSPORTE PÚBLICO",
-            color=discord.Color.blue()
+            title="❌ Licencia no encontrada",
+            description=f"{ciudadano.mention} no tiene la licencia tipo {tipo_licencia} tramitada.",
+            color=discord.Color.red()
         )
-        
-        embed.add_field(name="LICENCIA DE CONDUCIR", value=f"Tipo: {tipo_licencia}", inline=False)
-        embed.add_field(name="Descripción", value=nombre_licencia, inline=False)
-        embed.add_field(name="Titular", value=ciudadano.mention, inline=True)
-        embed.add_field(name="RUT", value=rut, inline=True)
-        embed.add_field(name="Fecha Emisión", value=fecha_emision, inline=True)
-        embed.add_field(name="Fecha Vencimiento", value=fecha_vencimiento, inline=True)
-        embed.add_field(name="Emitida por", value=emisor_nombre, inline=True)
-        
-        # Establecer la imagen del avatar de la cédula en lugar del avatar de Discord
-        embed.set_thumbnail(url=avatar_url)
-        
-        await interaction.response.send_message(embed=embed)
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+        return
+    
+    nombre_licencia = licencia.nombre_licencia
+    fecha_emision = licencia.fecha_emision
+    fecha_vencimiento = licencia.fecha_vencimiento
+    emitida_por = licencia.emitida_por
+    
+    # Obtener el nombre del emisor si está disponible
+    emisor = interaction.guild.get_member(int(emitida_por))
+    emisor_nombre = emisor.mention if emisor else "Desconocido"
+    
+    # Crear y enviar el mensaje embebido con la licencia
+    embed = discord.Embed(
+        title=f"🇨🇱 SANTIAGO RP 🇨🇱",
+        description="DIRECCIÓN DE TRÁNSITO Y TRANSPORTE PÚBLICO",
+        color=discord.Color.blue()
+    )
+    
+    embed.add_field(name="LICENCIA DE CONDUCIR", value=f"Tipo: {tipo_licencia}", inline=False)
+    embed.add_field(name="Descripción", value=nombre_licencia, inline=False)
+    embed.add_field(name="Titular", value=ciudadano.mention, inline=True)
+    embed.add_field(name="RUT", value=rut, inline=True)
+    embed.add_field(name="Fecha Emisión", value=formatear_fecha(fecha_emision), inline=True)
+    embed.add_field(name="Fecha Vencimiento", value=formatear_fecha(fecha_vencimiento), inline=True)
+    embed.add_field(name="Emitida por", value=emisor_nombre, inline=True)
+    
+    # Establecer la imagen del avatar de la cédula en lugar del avatar de Discord
+    embed.set_thumbnail(url=avatar_url)
     
-    finally:
-        cursor.close()
-        conn.close()
+    await interaction.response.send_message(embed=embed)
 
 # Comando de barra diagonal para revocar licencia
 @bot.tree.command(name="revocar-licencia", description="Revoca una licencia específica de un ciudadano")
@@ -1178,118 +1063,93 @@ async def slash_revocar_licencia(
         await interaction.response.send_message(embed=embed, ephemeral=True)
         return
     
-    # Verificar si el ciudadano tiene la licencia específica
-    cursor, conn = execute_with_retry('''
-    SELECT id, nombre_licencia, fecha_emision FROM licencias 
-    WHERE user_id = %s AND tipo_licencia = %s
-    ''', (str(ciudadano.id), tipo_licencia))
-    
-    try:
-        licencia = cursor.fetchone()
-        if not licencia:
-            embed = discord.Embed(
-                title="❌ Licencia no encontrada",
-                description=f"{ciudadano.mention} no tiene la licencia {tipo_licencia} para revocar.",
-                color=discord.Color.red()
-            )
-            await interaction.response.send_message(embed=embed, ephemeral=True)
-            return
-        
-        # Guardar información de la licencia para el mensaje
-        licencia_id = licencia['id']
-        nombre_licencia = licencia['nombre_licencia']
-        fecha_emision = licencia['fecha_emision']
-    
-    finally:
-        cursor.close()
-        conn.close()
-    
-    # Obtener información de la cédula para el log
-    cursor, conn = execute_with_retry('SELECT rut FROM cedulas WHERE user_id = %s', (str(ciudadano.id),))
-    try:
-        cedula = cursor.fetchone()
-        rut = cedula['rut'] if cedula else "No disponible"
+    # Verificar si el ciudadano tiene la licencia específica (junto con su RUT para el log)
+    contexto = await repository.load_license_context(str(ciudadano.id), tipo_licencia)
+    if not contexto or not contexto[1]:
+        embed = discord.Embed(
+            title="❌ Licencia no encontrada",
+            description=f"{ciudadano.mention} no tiene la licencia {tipo_licencia} para revocar.",
+            color=discord.Color.red()
+        )
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+        return
     
-    finally:
-        cursor.close()
-        conn.close()
+    # Guardar información de la licencia para el mensaje
+    cedula, licencia = contexto
+    licencia_id = licencia.id
+    nombre_licencia = licencia.nombre_licencia
+    fecha_emision = licencia.fecha_emision
+    rut = cedula.rut or "No disponible"
     
     # Eliminar la licencia
     try:
-        cursor, conn = execute_with_retry('DELETE FROM licencias WHERE id = %s', (licencia_id,))
+        await db.execute('DELETE FROM licencias WHERE id = %s', (licencia_id,), pin=(ciudadano.id,))
         
-        try:
-            # Crear y enviar el mensaje de revocación
-            embed = discord.Embed(
-                title=f"🚫 LICENCIA REVOCADA",
-                description=f"Se ha revocado la licencia de {ciudadano.mention}",
-                color=discord.Color.red()
-            )
-            
-            embed.add_field(name="Tipo de licencia", value=f"{tipo_licencia} - {nombre_licencia}", inline=False)
-            embed.add_field(name="Motivo de revocación", value=motivo, inline=False)
-            embed.add_field(name="Autoridad", value=interaction.user.mention, inline=True)
-            embed.add_field(name="Fecha", value=datetime.now().strftime("%d/%m/%Y"), inline=True)
-            
-            # Establecer la imagen del avatar del ciudadano
-            embed.set_thumbnail(url=ciudadano.display_avatar.url)
-            
-            await interaction.response.send_message(embed=embed)
-            
-            # Enviar log al canal de logs
-            canal_logs = interaction.guild.get_channel(canal_logs_id)
-            if canal_logs:
-                log_embed = discord.Embed(
-                    title="🚫 Licencia Revocada",
-                    description=f"Se ha revocado una licencia del sistema.",
-                    color=discord.Color.red(),
-                    timestamp=datetime.now()
-                )
-                log_embed.add_field(
-                    name="Administrador",
-                    value=f"{interaction.user.mention} ({interaction.user.name})",
-                    inline=True
-                )
-                log_embed.add_field(
-                    name="Ciudadano",
-                    value=f"{ciudadano.mention} ({ciudadano.name})",
-                    inline=True
-                )
-                log_embed.add_field(
-                    name="RUT",
-                    value=rut,
-                    inline=True
-                )
-                log_embed.add_field(
-                    name="Licencia revocada",
-                    value=f"{tipo_licencia} - {nombre_licencia}",
-                    inline=False
-                )
-                log_embed.add_field(
-                    name="Fecha de emisión",
-                    value=fecha_emision,
-                    inline=True
-                )
-                log_embed.add_field(
-                    name="Fecha de revocación",
-                    value=datetime.now().strftime("%d/%m/%Y"),
-                    inline=True
-                )
-                log_embed.add_field(
-                    name="Motivo",
-                    value=motivo,
-                    inline=False
-                )
-                log_embed.set_footer(text=f"ID del usuario: {ciudadano.id}")
-                
-                await canal_logs.send(embed=log_embed)
-            else:
-                logger.error(f"No se pudo encontrar el canal de logs con ID {canal_logs_id}")
+        # Crear y enviar el mensaje de revocación
+        embed = discord.Embed(
+            title=f"🚫 LICENCIA REVOCADA",
+            description=f"Se ha revocado la licencia de {ciudadano.mention}",
+            color=discord.Color.red()
+        )
         
-        finally:
-            cursor.close()
-            conn.close()
+        embed.add_field(name="Tipo de licencia", value=f"{tipo_licencia} - {nombre_licencia}", inline=False)
+        embed.add_field(name="Motivo de revocación", value=motivo, inline=False)
+        embed.add_field(name="Autoridad", value=interaction.user.mention, inline=True)
+        embed.add_field(name="Fecha", value=datetime.now().strftime("%d/%m/%Y"), inline=True)
+        
+        # Establecer la imagen del avatar del ciudadano
+        embed.set_thumbnail(url=ciudadano.display_avatar.url)
+        
+        await interaction.response.send_message(embed=embed)
+        
+        # Enviar log al canal de logs
+        log_embed = discord.Embed(
+            title="🚫 Licencia Revocada",
+            description=f"Se ha revocado una licencia del sistema.",
+            color=discord.Color.red(),
+            timestamp=datetime.now()
+        )
+        log_embed.add_field(
+            name="Administrador",
+            value=f"{interaction.user.mention} ({interaction.user.name})",
+            inline=True
+        )
+        log_embed.add_field(
+            name="Ciudadano",
+            value=f"{ciudadano.mention} ({ciudadano.name})",
+            inline=True
+        )
+        log_embed.add_field(
+            name="RUT",
+            value=rut,
+            inline=True
+        )
+        log_embed.add_field(
+            name="Licencia revocada",
+            value=f"{tipo_licencia} - {nombre_licencia}",
+            inline=False
+        )
+        log_embed.add_field(
+            name="Fecha de emisión",
+            value=formatear_fecha(fecha_emision),
+            inline=True
+        )
+        log_embed.add_field(
+            name="Fecha de revocación",
+            value=datetime.now().strftime("%d/%m/%Y"),
+            inline=True
+        )
+        log_embed.add_field(
+            name="Motivo",
+            value=motivo,
+            inline=False
+        )
+        log_embed.set_footer(text=f"ID del usuario: {ciudadano.id}")
             
+        bitacora.send(canal_logs_id, log_embed)
+            
+    except db.DatabaseUnavailable:
+        raise
     except Exception as e:
         logger.error(f"Error al revocar licencia: {e}")
         embed = discord.Embed(
@@ -1299,23 +1159,6 @@ async def slash_revocar_licencia(
         )
         await interaction.response.send_message(embed=embed, ephemeral=True)
 
-# Función para validar formato de placa
-def validar_placa(placa):
-    """Valida que la placa tenga el formato ABC-123"""
-    import re
-    patron = re.compile(r'^[A-Z]{3}-\d{3}$')
-    return bool(patron.match(placa))
-
-# Función para validar año del vehículo
-def validar_anio(anio_str):
-    """Valida que el año sea un número entre 1900 y el año actual + 1"""
-    try:
-        anio = int(anio_str)
-        anio_actual = datetime.now().year
-        return 1900 <= anio <= anio_actual + 1, anio
-    except ValueError:
-        return False, None
-
 # Funciones para autocompletado
 async def autocompletar_gama(
     interaction: discord.Interaction,
@@ -1415,28 +1258,8 @@ async def slash_registrar_vehiculo(
         await interaction.followup.send(embed=embed, ephemeral=True)
         return
     
-    # Verificar si el ciudadano tiene cédula y obtener el avatar_url
-    cursor, conn = execute_with_retry('SELECT rut, avatar_url FROM cedulas WHERE user_id = %s', (str(ciudadano.id),))
-    try:
-        cedula = cursor.fetchone()
-        if not cedula:
-            embed = discord.Embed(
-                title="❌ Ciudadano sin cédula",
-                description=f"{ciudadano.mention} no tiene una cédula de identidad registrada. Debe tramitar su cédula primero.",
-                color=discord.Color.red()
-            )
-            await interaction.followup.send(embed=embed, ephemeral=True)
-            return
-        
-        rut = cedula['rut']
-        avatar_url = cedula['avatar_url']
-    
-    finally:
-        cursor.close()
-        conn.close()
-    
     # Validar formato de placa
-    if not validar_placa(placa):
+    if not validaciones.validar_placa(placa):
         embed = discord.Embed(
             title="❌ Formato de placa inválido",
             description="La placa debe tener el formato ABC-123 (tres letras mayúsculas, guion, tres números).",
@@ -1445,25 +1268,8 @@ async def slash_registrar_vehiculo(
         await interaction.followup.send(embed=embed, ephemeral=True)
         return
     
-    # Verificar si la placa ya está registrada
-    cursor, conn = execute_with_retry('SELECT id FROM vehiculos WHERE placa = %s', (placa,))
-    try:
-        placa_existente = cursor.fetchone()
-        if placa_existente:
-            embed = discord.Embed(
-                title="❌ Placa ya registrada",
-                description=f"La placa {placa} ya está registrada en el sistema.",
-                color=discord.Color.red()
-            )
-            await interaction.followup.send(embed=embed, ephemeral=True)
-            return
-    
-    finally:
-        cursor.close()
-        conn.close()
-    
     # Validar año del vehículo
-    anio_valido, anio_int = validar_anio(año)
+    anio_valido, anio_int = validaciones.validar_anio(año)
     if not anio_valido:
         embed = discord.Embed(
             title="❌ Año inválido",
@@ -1483,52 +1289,60 @@ async def slash_registrar_vehiculo(
         await interaction.followup.send(embed=embed, ephemeral=True)
         return
     
-    # Verificar si el código de pago existe y no está usado
-    cursor, conn = execute_with_retry('''
-    SELECT code, used FROM payment_codes 
-    WHERE code = %s AND user_id = %s
-    ''', (codigo_pago, str(ciudadano.id)))
+    # Obtener cédula, estado de la placa y del código de pago en una sola consulta
+    contexto = await repository.load_vehicle_registration_context(str(ciudadano.id), placa, codigo_pago)
+    if not contexto:
+        embed = discord.Embed(
+            title="❌ Ciudadano sin cédula",
+            description=f"{ciudadano.mention} no tiene una cédula de identidad registrada. Debe tramitar su cédula primero.",
+            color=discord.Color.red()
+        )
+        await interaction.followup.send(embed=embed, ephemeral=True)
+        return
     
-    try:
-        codigo_pago_data = cursor.fetchone()
-        if not codigo_pago_data:
-            embed = discord.Embed(
-                title="❌ Código de pago inválido",
-                description=f"El código de pago {codigo_pago} no existe o no pertenece al ciudadano especificado.",
-                color=discord.Color.red()
-            )
-            await interaction.followup.send(embed=embed, ephemeral=True)
-            return
-        
-        if codigo_pago_data['used']:
-            embed = discord.Embed(
-                title="❌ Código de pago ya usado",
-                description=f"El código de pago {codigo_pago} ya ha sido utilizado previamente.",
-                color=discord.Color.red()
-            )
-            await interaction.followup.send(embed=embed, ephemeral=True)
-            return
+    cedula, placa_registrada, codigo = contexto
+    rut = cedula.rut
+    avatar_url = avatares.avatar_for(cedula)
     
-    finally:
-        cursor.close()
-        conn.close()
+    # Verificar si la placa ya está registrada
+    if placa_registrada:
+        embed = discord.Embed(
+            title="❌ Placa ya registrada",
+            description=f"La placa {placa} ya está registrada en el sistema.",
+            color=discord.Color.red()
+        )
+        await interaction.followup.send(embed=embed, ephemeral=True)
+        return
+    
+    # Verificar si el código de pago existe y no está usado
+    if not codigo:
+        embed = discord.Embed(
+            title="❌ Código de pago inválido",
+            description=f"El código de pago {codigo_pago} no existe o no pertenece al ciudadano especificado.",
+            color=discord.Color.red()
+        )
+        await interaction.followup.send(embed=embed, ephemeral=True)
+        return
+    
+    if codigo.used:
+        embed = discord.Embed(
+            title="❌ Código de pago ya usado",
+            description=f"El código de pago {codigo_pago} ya ha sido utilizado previamente.",
+            color=discord.Color.red()
+        )
+        await interaction.followup.send(embed=embed, ephemeral=True)
+        return
     
     # Fecha de registro
-    fecha_registro = datetime.now().strftime("%d/%m/%Y")
+    fecha_registro = datetime.now().date()
     
     # Obtener URL de la imagen
     imagen_url = imagen.url
     
     # Registrar el vehículo y marcar el código como usado en una transacción
     try:
-        conn = mysql.connector.connect(**DB_CONFIG)
-        cursor = conn.cursor(dictionary=True)
-        try:
-            # Iniciar transacción
-            cursor.execute('START TRANSACTION')
-            
-            # Registrar el vehículo
-            cursor.execute('''
+        async with db.unit_of_work(pin=(ciudadano.id, ('placa', placa))) as tx:
+            tx.execute('''
             INSERT INTO vehiculos 
             (user_id, placa, modelo, marca, gama, anio, color, revision_tecnica, 
             permiso_circulacion, codigo_pago, imagen_url, fecha_registro, registrado_por) 
@@ -1537,90 +1351,71 @@ async def slash_registrar_vehiculo(
                   revision_tecnica, permiso_circulacion, codigo_pago, imagen_url, 
                   fecha_registro, str(interaction.user.id)))
             
-            # Marcar el código de pago como usado
-            cursor.execute('''
+            tx.execute('''
             UPDATE payment_codes 
             SET used = %s, used_at = %s 
             WHERE code = %s
-            ''', (True, datetime.now().strftime("%d/%m/%Y %H:%M:%S"), codigo_pago))
-            
-            # Confirmar transacción
-            conn.commit()
-            
-            # Crear y enviar el mensaje embebido con el vehículo registrado
-            embed = discord.Embed(
-                title=f"🇨🇱 SANTIAGO RP 🇨🇱",
-                description="REGISTRO CIVIL Y DE VEHÍCULOS",
-                color=discord.Color.blue()
-            )
-            
-            embed.add_field(name="CERTIFICADO DE REGISTRO VEHICULAR", value=f"Placa: {placa}", inline=False)
-            
-            # Información del vehículo
-            embed.add_field(name="Propietario", value=ciudadano.mention, inline=True)
-            embed.add_field(name="RUT", value=rut, inline=True)
-            embed.add_field(name="Fecha Registro", value=fecha_registro, inline=True)
-            
-            embed.add_field(name="Marca", value=marca, inline=True)
-            embed.add_field(name="Modelo", value=modelo, inline=True)
-            embed.add_field(name="Año", value=str(anio_int), inline=True)
-            
-            embed.add_field(name="Color", value=color, inline=True)
-            embed.add_field(name="Gama", value=gama, inline=True)
-            embed.add_field(name="Código de Pago", value=codigo_pago, inline=True)
-            
-            embed.add_field(name="Revisión Técnica", value=revision_tecnica, inline=True)
-            embed.add_field(name="Permiso de Circulación", value=permiso_circulacion, inline=True)
-            embed.add_field(name="Registrado por", value=interaction.user.mention, inline=True)
-            
-            # Establecer la imagen del vehículo
-            embed.set_image(url=imagen_url)
-            
-            # Establecer la imagen miniatura como el avatar_url de la cédula
-            embed.set_thumbnail(url=avatar_url)
-            
-            # Enviar el registro al canal
-            await interaction.followup.send(embed=embed)
-            
-            # Enviar mensaje efímero de confirmación al usuario
-            confirmacion_embed = discord.Embed(
-                title="✅ ¡Vehículo Registrado con Éxito!",
-                description=f"El vehículo con placa {placa} ha sido registrado correctamente para {ciudadano.mention}.",
-                color=discord.Color.green()
-            )
-            confirmacion_embed.add_field(
-                name="📋 Detalles",
-                value=f"**Marca:** {marca}\n**Modelo:** {modelo}\n**Año:** {anio_int}\n**Color:** {color}\n**Código de Pago:** {codigo_pago}",
-                inline=False
-            )
-            confirmacion_embed.set_footer(text="Santiago RP - Registro de Vehículos")
-            
-            await interaction.followup.send(embed=confirmacion_embed, ephemeral=True)
-        
-        except mysql.connector.Error as e:
-            conn.rollback()
-            logger.error(f"Error al registrar vehículo en la base de datos: {e}")
-            embed = discord.Embed(
-                title="❌ Error al registrar vehículo",
-                description=f"Ocurrió un error al registrar el vehículo: {str(e)}",
-                color=discord.Color.red()
-            )
-            await interaction.followup.send(embed=embed, ephemeral=True)
-            return
-        
-        finally:
-            cursor.close()
-            conn.close()
-    
+            ''', (True, datetime.now().replace(microsecond=0), codigo_pago))
+        entity_cache.invalidate(placa=placa)
     except mysql.connector.Error as e:
-        logger.error(f"Error al conectar a la base de datos: {e}")
+        logger.error(f"Error al registrar vehículo en la base de datos: {e}")
         embed = discord.Embed(
-            title="❌ Error de conexión",
-            description="No se pudo conectar a la base de datos. Inténtalo de nuevo más tarde.",
+            title="❌ Error al registrar vehículo",
+            description=f"Ocurrió un error al registrar el vehículo: {str(e)}",
             color=discord.Color.red()
         )
         await interaction.followup.send(embed=embed, ephemeral=True)
         return
+    
+    # Crear y enviar el mensaje embebido con el vehículo registrado
+    embed = discord.Embed(
+        title=f"🇨🇱 SANTIAGO RP 🇨🇱",
+        description="REGISTRO CIVIL Y DE VEHÍCULOS",
+        color=discord.Color.blue()
+    )
+    
+    embed.add_field(name="CERTIFICADO DE REGISTRO VEHICULAR", value=f"Placa: {placa}", inline=False)
+    
+    # Información del vehículo
+    embed.add_field(name="Propietario", value=ciudadano.mention, inline=True)
+    embed.add_field(name="RUT", value=rut, inline=True)
+    embed.add_field(name="Fecha Registro", value=formatear_fecha(fecha_registro), inline=True)
+    
+    embed.add_field(name="Marca", value=marca, inline=True)
+    embed.add_field(name="Modelo", value=modelo, inline=True)
+    embed.add_field(name="Año", value=str(anio_int), inline=True)
+    
+    embed.add_field(name="Color", value=color, inline=True)
+    embed.add_field(name="Gama", value=gama, inline=True)
+    embed.add_field(name="Código de Pago", value=codigo_pago, inline=True)
+    
+    embed.add_field(name="Revisión Técnica", value=revision_tecnica, inline=True)
+    embed.add_field(name="Permiso de Circulación", value=permiso_circulacion, inline=True)
+    embed.add_field(name="Registrado por", value=interaction.user.mention, inline=True)
+    
+    # Establecer la imagen del vehículo
+    embed.set_image(url=imagen_url)
+    
+    # Establecer la imagen miniatura como el avatar_url de la cédula
+    embed.set_thumbnail(url=avatar_url)
+    
+    # Enviar el registro al canal
+    await interaction.followup.send(embed=embed)
+    
+    # Enviar mensaje efímero de confirmación al usuario
+    confirmacion_embed = discord.Embed(
+        title="✅ ¡Vehículo Registrado con Éxito!",
+        description=f"El vehículo con placa {placa} ha sido registrado correctamente para {ciudadano.mention}.",
+        color=discord.Color.green()
+    )
+    confirmacion_embed.add_field(
+        name="📋 Detalles",
+        value=f"**Marca:** {marca}\n**Modelo:** {modelo}\n**Año:** {anio_int}\n**Color:** {color}\n**Código de Pago:** {codigo_pago}",
+        inline=False
+    )
+    confirmacion_embed.set_footer(text="Santiago RP - Registro de Vehículos")
+    
+    await interaction.followup.send(embed=confirmacion_embed, ephemeral=True)
 
 # Comando de barra diagonal para ver vehículo
 @bot.tree.command(name="ver-vehiculo", description="Muestra la información de un vehículo por su placa")
@@ -1640,7 +1435,7 @@ async def slash_ver_vehiculo(interaction: discord.Interaction, placa: str):
         return
     
     # Validar formato de placa
-    if not validar_placa(placa):
+    if not validaciones.validar_placa(placa):
         embed = discord.Embed(
             title="❌ Formato de placa inválido",
             description="La placa debe tener el formato ABC-123 (tres letras mayúsculas, guion, tres números).",
@@ -1650,86 +1445,72 @@ async def slash_ver_vehiculo(interaction: discord.Interaction, placa: str):
         return
     
     # Obtener información del vehículo y el avatar_url de la cédula
-    cursor, conn = execute_with_retry('''
-    SELECT v.user_id, v.modelo, v.marca, v.gama, v.anio, v.color, 
-           v.revision_tecnica, v.permiso_circulacion, v.codigo_pago, 
-           v.imagen_url, v.fecha_registro, v.registrado_por,
-           c.rut, c.avatar_url
-    FROM vehiculos v
-    JOIN cedulas c ON v.user_id = c.user_id
-    WHERE v.placa = %s
-    ''', (placa,))
-    
-    try:
-        vehiculo = cursor.fetchone()
-        if not vehiculo:
-            embed = discord.Embed(
-                title="❌ Vehículo no encontrado",
-                description=f"No se encontró ningún vehículo con la placa {placa}.",
-                color=discord.Color.red()
-            )
-            await interaction.response.send_message(embed=embed, ephemeral=True)
-            return
-        
-        user_id = vehiculo['user_id']
-        modelo = vehiculo['modelo']
-        marca = vehiculo['marca']
-        gama = vehiculo['gama']
-        anio = vehiculo['anio']
-        color = vehiculo['color']
-        revision_tecnica = vehiculo['revision_tecnica']
-        permiso_circulacion = vehiculo['permiso_circulacion']
-        codigo_pago = vehiculo['codigo_pago']
-        imagen_url = vehiculo['imagen_url']
-        fecha_registro = vehiculo['fecha_registro']
-        registrado_por = vehiculo['registrado_por']
-        rut = vehiculo['rut']
-        avatar_url = vehiculo['avatar_url']
-        
-        # Obtener información del propietario y registrador
-        propietario = interaction.guild.get_member(int(user_id))
-        registrador = interaction.guild.get_member(int(registrado_por))
-        
-        propietario_nombre = propietario.mention if propietario else "Desconocido"
-        registrador_nombre = registrador.mention if registrador else "Desconocido"
-        
-        # Crear y enviar el mensaje embebido con el vehículo
+    resultado = await repository.load_vehicle_with_owner(placa, replica=True)
+    if not resultado:
         embed = discord.Embed(
-            title=f"🇨🇱 SANTIAGO RP 🇨🇱",
-            description="REGISTRO CIVIL Y DE VEHÍCULOS",
-            color=discord.Color.blue()
+            title="❌ Vehículo no encontrado",
+            description=f"No se encontró ningún vehículo con la placa {placa}.",
+            color=discord.Color.red()
         )
-        
-        embed.add_field(name="CERTIFICADO DE REGISTRO VEHICULAR", value=f"Placa: {placa}", inline=False)
-        
-        # Información del vehículo
-        embed.add_field(name="Propietario", value=propietario_nombre, inline=True)
-        embed.add_field(name="RUT", value=rut, inline=True)
-        embed.add_field(name="Fecha Registro", value=fecha_registro, inline=True)
-        
-        embed.add_field(name="Marca", value=marca, inline=True)
-        embed.add_field(name="Modelo", value=modelo, inline=True)
-        embed.add_field(name="Año", value=str(anio), inline=True)
-        
-        embed.add_field(name="Color", value=color, inline=True)
-        embed.add_field(name="Gama", value=gama, inline=True)
-        embed.add_field(name="Código de Pago", value=codigo_pago, inline=True)
-        
-        embed.add_field(name="Revisión Técnica", value=revision_tecnica, inline=True)
-        embed.add_field(name="Permiso de Circulación", value=permiso_circulacion, inline=True)
-        embed.add_field(name="Registrado por", value=registrador_nombre, inline=True)
-        
-        # Establecer la imagen del vehículo
-        embed.set_image(url=imagen_url)
-        
-        # Establecer la imagen miniatura como el avatar_url de la cédula
-        embed.set_thumbnail(url=avatar_url)
-        
-        await interaction.response.send_message(embed=embed)
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+        return
+    
+    vehiculo, cedula = resultado
+    user_id = vehiculo.user_id
+    modelo = vehiculo.modelo
+    marca = vehiculo.marca
+    gama = vehiculo.gama
+    anio = vehiculo.anio
+    color = vehiculo.color
+    revision_tecnica = vehiculo.revision_tecnica
+    permiso_circulacion = vehiculo.permiso_circulacion
+    codigo_pago = vehiculo.codigo_pago
+    imagen_url = vehiculo.imagen_url
+    fecha_registro = vehiculo.fecha_registro
+    registrado_por = vehiculo.registrado_por
+    rut = cedula.rut
+    avatar_url = avatares.avatar_for(cedula)
+    
+    # Obtener información del propietario y registrador
+    propietario = interaction.guild.get_member(int(user_id))
+    registrador = interaction.guild.get_member(int(registrado_por))
+    
+    propietario_nombre = propietario.mention if propietario else "Desconocido"
+    registrador_nombre = registrador.mention if registrador else "Desconocido"
+    
+    # Crear y enviar el mensaje embebido con el vehículo
+    embed = discord.Embed(
+        title=f"🇨🇱 SANTIAGO RP 🇨🇱",
+        description="REGISTRO CIVIL Y DE VEHÍCULOS",
+        color=discord.Color.blue()
+    )
     
-    finally:
-        cursor.close()
-        conn.close()
+    embed.add_field(name="CERTIFICADO DE REGISTRO VEHICULAR", value=f"Placa: {placa}", inline=False)
+    
+    # Información del vehículo
+    embed.add_field(name="Propietario", value=propietario_nombre, inline=True)
+    embed.add_field(name="RUT", value=rut, inline=True)
+    embed.add_field(name="Fecha Registro", value=formatear_fecha(fecha_registro), inline=True)
+    
+    embed.add_field(name="Marca", value=marca, inline=True)
+    embed.add_field(name="Modelo", value=modelo, inline=True)
+    embed.add_field(name="Año", value=str(anio), inline=True)
+    
+    embed.add_field(name="Color", value=color, inline=True)
+    embed.add_field(name="Gama", value=gama, inline=True)
+    embed.add_field(name="Código de Pago", value=codigo_pago, inline=True)
+    
+    embed.add_field(name="Revisión Técnica", value=revision_tecnica, inline=True)
+    embed.add_field(name="Permiso de Circulación", value=permiso_circulacion, inline=True)
+    embed.add_field(name="Registrado por", value=registrador_nombre, inline=True)
+    
+    # Establecer la imagen del vehículo
+    embed.set_image(url=imagen_url)
+    
+    # Establecer la imagen miniatura como el avatar_url de la cédula
+    embed.set_thumbnail(url=avatar_url)
+    
+    await interaction.response.send_message(embed=embed)
 
 # Comando de barra diagonal para eliminar vehículo
 @bot.tree.command(name="eliminar-vehiculo", description="Elimina el registro de un vehículo")
@@ -1766,7 +1547,7 @@ async def slash_eliminar_vehiculo(interaction: discord.Interaction, placa: str):
         return
     
     # Validar formato de placa
-    if not validar_placa(placa):
+    if not validaciones.validar_placa(placa):
         embed = discord.Embed(
             title="❌ Formato de placa inválido",
             description="La placa debe tener el formato ABC-123 (tres letras mayúsculas, guion, tres números).",
@@ -1776,147 +1557,128 @@ async def slash_eliminar_vehiculo(interaction: discord.Interaction, placa: str):
         return
     
     # Verificar si el vehículo existe y obtener información completa
-    cursor, conn = execute_with_retry('''
-    SELECT v.user_id, v.marca, v.modelo, v.gama, v.anio, v.color, 
-           v.revision_tecnica, v.permiso_circulacion, v.codigo_pago, 
-           v.imagen_url, v.fecha_registro, c.rut, c.avatar_url
-    FROM vehiculos v
-    JOIN cedulas c ON v.user_id = c.user_id
-    WHERE v.placa = %s
-    ''', (placa,))
-    
-    try:
-        vehiculo = cursor.fetchone()
-        if not vehiculo:
-            embed = discord.Embed(
-                title="❌ Vehículo no encontrado",
-                description=f"No se encontró ningún vehículo con la placa {placa}.",
-                color=discord.Color.red()
-            )
-            await interaction.response.send_message(embed=embed, ephemeral=True)
-            return
-        
-        user_id = vehiculo['user_id']
-        marca = vehiculo['marca']
-        modelo = vehiculo['modelo']
-        gama = vehiculo['gama']
-        anio = vehiculo['anio']
-        color = vehiculo['color']
-        revision_tecnica = vehiculo['revision_tecnica']
-        permiso_circulacion = vehiculo['permiso_circulacion']
-        codigo_pago = vehiculo['codigo_pago']
-        imagen_url = vehiculo['imagen_url']
-        fecha_registro = vehiculo['fecha_registro']
-        rut = vehiculo['rut']
-        avatar_url = vehiculo['avatar_url']
-        
-        propietario = interaction.guild.get_member(int(user_id))
-        propietario_nombre = propietario.mention if propietario else "Desconocido"
+    resultado = await repository.load_vehicle_with_owner(placa)
+    if not resultado:
+        embed = discord.Embed(
+            title="❌ Vehículo no encontrado",
+            description=f"No se encontró ningún vehículo con la placa {placa}.",
+            color=discord.Color.red()
+        )
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+        return
     
-    finally:
-        cursor.close()
-        conn.close()
+    vehiculo, cedula = resultado
+    user_id = vehiculo.user_id
+    marca = vehiculo.marca
+    modelo = vehiculo.modelo
+    gama = vehiculo.gama
+    anio = vehiculo.anio
+    color = vehiculo.color
+    revision_tecnica = vehiculo.revision_tecnica
+    permiso_circulacion = vehiculo.permiso_circulacion
+    codigo_pago = vehiculo.codigo_pago
+    imagen_url = vehiculo.imagen_url
+    fecha_registro = vehiculo.fecha_registro
+    rut = cedula.rut
+    avatar_url = cedula.avatar_url
+    
+    propietario = interaction.guild.get_member(int(user_id))
+    propietario_nombre = propietario.mention if propietario else "Desconocido"
     
     # Eliminar el vehículo
     try:
-        cursor, conn = execute_with_retry('DELETE FROM vehiculos WHERE placa = %s', (placa,))
+        await db.execute('DELETE FROM vehiculos WHERE placa = %s', (placa,), pin=(int(user_id), ('placa', placa)))
+        entity_cache.invalidate(placa=placa)
         
-        try:
-            # Mensaje de éxito para el usuario
-            embed = discord.Embed(
-                title="✅ Vehículo Eliminado",
-                description=f"El registro del vehículo con placa {placa} ha sido eliminado correctamente.",
-                color=discord.Color.green()
-            )
-            embed.add_field(
-                name="Información eliminada",
-                value=f"Propietario: {propietario_nombre}\nRUT: {rut}\nVehículo: {marca} {modelo}",
-                inline=False
-            )
-            embed.set_footer(text="Santiago RP - Registro de Vehículos")
-            
-            await interaction.response.send_message(embed=embed)
-            
-            # Enviar log al canal de logs
-            canal_logs = interaction.guild.get_channel(canal_logs_id)
-            if canal_logs:
-                log_embed = discord.Embed(
-                    title="🗑️ Registro Vehicular Eliminado",
-                    description=f"Se ha eliminado un registro vehicular del sistema.",
-                    color=discord.Color.orange(),
-                    timestamp=datetime.now()
-                )
-                log_embed.add_field(
-                    name="Administrador",
-                    value=f"{interaction.user.mention} ({interaction.user.name})",
-                    inline=True
-                )
-                log_embed.add_field(
-                    name="Propietario",
-                    value=f"{propietario_nombre} ({propietario.name if propietario else 'Desconocido'})",
-                    inline=True
-                )
-                log_embed.add_field(
-                    name="RUT",
-                    value=rut,
-                    inline=True
-                )
-                log_embed.add_field(
-                    name="Placa",
-                    value=placa,
-                    inline=True
-                )
-                log_embed.add_field(
-                    name="Vehículo",
-                    value=f"{marca} {modelo}",
-                    inline=True
-                )
-                log_embed.add_field(
-                    name="Año",
-                    value=str(anio),
-                    inline=True
-                )
-                log_embed.add_field(
-                    name="Color",
-                    value=color,
-                    inline=True
-                )
-                log_embed.add_field(
-                    name="Gama",
-                    value=gama,
-                    inline=True
-                )
-                log_embed.add_field(
-                    name="Código de Pago",
-                    value=codigo_pago,
-                    inline=True
-                )
-                log_embed.add_field(
-                    name="Revisión Técnica",
-                    value=revision_tecnica,
-                    inline=True
-                )
-                log_embed.add_field(
-                    name="Permiso de Circulación",
-                    value=permiso_circulacion,
-                    inline=True
-                )
-                log_embed.add_field(
-                    name="Fecha de Registro",
-                    value=fecha_registro,
-                    inline=True
-                )
-                log_embed.set_thumbnail(url=avatar_url if avatar_url else "https://tr.rbxcdn.com/e5b3371b4efc7642a22c1b36265a9ba9/420/420/AvatarHeadshot/Png")
-                log_embed.set_footer(text=f"ID del usuario: {user_id}")
-                
-                await canal_logs.send(embed=log_embed)
-            else:
-                logger.error(f"No se pudo encontrar el canal de logs con ID {canal_logs_id}")
+        # Mensaje de éxito para el usuario
+        embed = discord.Embed(
+            title="✅ Vehículo Eliminado",
+            description=f"El registro del vehículo con placa {placa} ha sido eliminado correctamente.",
+            color=discord.Color.green()
+        )
+        embed.add_field(
+            name="Información eliminada",
+            value=f"Propietario: {propietario_nombre}\nRUT: {rut}\nVehículo: {marca} {modelo}",
+            inline=False
+        )
+        embed.set_footer(text="Santiago RP - Registro de Vehículos")
+        
+        await interaction.response.send_message(embed=embed)
         
-        finally:
-            cursor.close()
-            conn.close()
+        # Enviar log al canal de logs
+        log_embed = discord.Embed(
+            title="🗑️ Registro Vehicular Eliminado",
+            description=f"Se ha eliminado un registro vehicular del sistema.",
+            color=discord.Color.orange(),
+            timestamp=datetime.now()
+        )
+        log_embed.add_field(
+            name="Administrador",
+            value=f"{interaction.user.mention} ({interaction.user.name})",
+            inline=True
+        )
+        log_embed.add_field(
+            name="Propietario",
+            value=f"{propietario_nombre} ({propietario.name if propietario else 'Desconocido'})",
+            inline=True
+        )
+        log_embed.add_field(
+            name="RUT",
+            value=rut,
+            inline=True
+        )
+        log_embed.add_field(
+            name="Placa",
+            value=placa,
+            inline=True
+        )
+        log_embed.add_field(
+            name="Vehículo",
+            value=f"{marca} {modelo}",
+            inline=True
+        )
+        log_embed.add_field(
+            name="Año",
+            value=str(anio),
+            inline=True
+        )
+        log_embed.add_field(
+            name="Color",
+            value=color,
+            inline=True
+        )
+        log_embed.add_field(
+            name="Gama",
+            value=gama,
+            inline=True
+        )
+        log_embed.add_field(
+            name="Código de Pago",
+            value=codigo_pago,
+            inline=True
+        )
+        log_embed.add_field(
+            name="Revisión Técnica",
+            value=revision_tecnica,
+            inline=True
+        )
+        log_embed.add_field(
+            name="Permiso de Circulación",
+            value=permiso_circulacion,
+            inline=True
+        )
+        log_embed.add_field(
+            name="Fecha de Registro",
+            value=formatear_fecha(fecha_registro),
+            inline=True
+        )
+        log_embed.set_thumbnail(url=avatar_url if avatar_url else "https://tr.rbxcdn.com/e5b3371b4efc7642a22c1b36265a9ba9/420/420/AvatarHeadshot/Png")
+        log_embed.set_footer(text=f"ID del usuario: {user_id}")
+            
+        bitacora.send(canal_logs_id, log_embed)
             
+    except db.DatabaseUnavailable:
+        raise
     except Exception as e:
         logger.error(f"Error al eliminar vehículo: {e}")
         embed = discord.Embed(
@@ -1971,57 +1733,46 @@ async def slash_crear_codigo_pago(interaction: discord.Interaction, ciudadano: d
         return
     
     # Obtener información de la cédula
-    cursor, conn = execute_with_retry('SELECT rut, avatar_url FROM cedulas WHERE user_id = %s', (str(ciudadano.id),))
-    try:
-        cedula = cursor.fetchone()
-        if not cedula:
-            embed = discord.Embed(
-                title="❌ Ciudadano sin cédula",
-                description=f"{ciudadano.mention} no tiene una cédula de identidad registrada.",
-                color=discord.Color.red()
-            )
-            await interaction.response.send_message(embed=embed, ephemeral=True)
-            return
-        
-        rut = cedula['rut']
-        avatar_url = cedula['avatar_url']
+    cedula = await repository.load_cedula(ciudadano.id)
+    if not cedula:
+        embed = discord.Embed(
+            title="❌ Ciudadano sin cédula",
+            description=f"{ciudadano.mention} no tiene una cédula de identidad registrada.",
+            color=discord.Color.red()
+        )
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+        return
     
-    finally:
-        cursor.close()
-        conn.close()
+    rut = cedula.rut
+    avatar_url = cedula.avatar_url
     
     # Generar código único
     codigo = generar_codigo_pago()  # Use the generar_codigo_pago function for consistency
-    fecha_creacion = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
+    fecha_creacion = datetime.now().replace(microsecond=0)
     
     # Guardar el código en la base de datos
     try:
-        cursor, conn = execute_with_retry('''
+        await db.execute('''
         INSERT INTO payment_codes 
         (code, amount, description, user_id, created_at, created_by) 
         VALUES (%s, %s, %s, %s, %s, %s)
         ''', (codigo, monto, descripcion, str(ciudadano.id), fecha_creacion, str(interaction.user.id)))
         
-        try:
-            # Crear embed con la información del código de pago
-            embed = discord.Embed(
-                title="💸 CÓDIGO DE PAGO CREADO 💸",
-                description=f"Se ha creado un código de pago para {ciudadano.mention}",
-                color=discord.Color.green()
-            )
-            embed.add_field(name="Código", value=f"`{codigo}`", inline=True)
-            embed.add_field(name="Monto", value=f"${monto:,} CLP", inline=True)
-            embed.add_field(name="Descripción", value=descripcion, inline=False)
-            embed.add_field(name="RUT", value=rut, inline=True)
-            embed.add_field(name="Creado por", value=interaction.user.mention, inline=True)
-            embed.add_field(name="Fecha de Creación", value=fecha_creacion, inline=True)
-            embed.set_thumbnail(url=avatar_url)
-            
-            await interaction.response.send_message(embed=embed)
+        # Crear embed con la información del código de pago
+        embed = discord.Embed(
+            title="💸 CÓDIGO DE PAGO CREADO 💸",
+            description=f"Se ha creado un código de pago para {ciudadano.mention}",
+            color=discord.Color.green()
+        )
+        embed.add_field(name="Código", value=f"`{codigo}`", inline=True)
+        embed.add_field(name="Monto", value=f"${monto:,} CLP", inline=True)
+        embed.add_field(name="Descripción", value=descripcion, inline=False)
+        embed.add_field(name="RUT", value=rut, inline=True)
+        embed.add_field(name="Creado por", value=interaction.user.mention, inline=True)
+        embed.add_field(name="Fecha de Creación", value=formatear_fecha(fecha_creacion, FORMATO_FECHA_HORA), inline=True)
+        embed.set_thumbnail(url=avatar_url)
         
-        finally:
-            cursor.close()
-            conn.close()
+        await interaction.response.send_message(embed=embed)
     
     except mysql.connector.Error as e:
         logger.error(f"Error al crear código de pago: {e}")
@@ -2043,15 +1794,6 @@ async def autocompletar_zona(
         for zona in ZONAS_PROPIEDAD if current.lower() in zona.lower()
     ][:25]
 
-# Función para validar número de pisos
-def validar_numero_pisos(pisos_str):
-    """Valida que el número de pisos sea un entero positivo"""
-    try:
-        pisos = int(pisos_str)
-        return pisos > 0, pisos
-    except ValueError:
-        return False, None
-
 # Comando de barra diagonal para registrar propiedad
 @bot.tree.command(name="registrar-propiedad", description="Registra una propiedad para un ciudadano")
 @app_commands.describe(
@@ -2103,26 +1845,6 @@ async def slash_registrar_propiedad(
     # Diferir la respuesta
     await interaction.response.defer()
     
-    # Verificar si el ciudadano tiene cédula y obtener el avatar_url
-    cursor, conn = execute_with_retry('SELECT rut, avatar_url FROM cedulas WHERE user_id = %s', (str(ciudadano.id),))
-    try:
-        cedula = cursor.fetchone()
-        if not cedula:
-            embed = discord.Embed(
-                title="❌ Ciudadano sin cédula",
-                description=f"{ciudadano.mention} no tiene una cédula de identidad registrada. Debe tramitar su cédula primero.",
-                color=discord.Color.red()
-            )
-            await interaction.followup.send(embed=embed, ephemeral=True)
-            return
-        
-        rut = cedula['rut']
-        avatar_url = cedula['avatar_url']
-    
-    finally:
-        cursor.close()
-        conn.close()
-    
     # Validar número de domicilio
     if not numero_domicilio.strip():
         embed = discord.Embed(
@@ -2133,23 +1855,6 @@ async def slash_registrar_propiedad(
         await interaction.followup.send(embed=embed, ephemeral=True)
         return
     
-    # Verificar si el número de domicilio ya está registrado
-    cursor, conn = execute_with_retry('SELECT id FROM propiedades WHERE numero_domicilio = %s', (numero_domicilio,))
-    try:
-        domicilio_existente = cursor.fetchone()
-        if domicilio_existente:
-            embed = discord.Embed(
-                title="❌ Domicilio ya registrado",
-                description=f"El número de domicilio {numero_domicilio} ya está registrado en el sistema.",
-                color=discord.Color.red()
-            )
-            await interaction.followup.send(embed=embed, ephemeral=True)
-            return
-    
-    finally:
-        cursor.close()
-        conn.close()
-    
     # Validar zona
     if zona not in ZONAS_PROPIEDAD:
         embed = discord.Embed(
@@ -2171,7 +1876,7 @@ async def slash_registrar_propiedad(
         return
     
     # Validar número de pisos
-    pisos_validos, pisos_int = validar_numero_pisos(numero_pisos)
+    pisos_validos, pisos_int = validaciones.validar_numero_pisos(numero_pisos)
     if not pisos_validos:
         embed = discord.Embed(
             title="❌ Número de pisos inválido",
@@ -2191,170 +1896,172 @@ async def slash_registrar_propiedad(
         await interaction.followup.send(embed=embed, ephemeral=True)
         return
     
-    # Verificar si el código de pago existe y no está usado
-    cursor, conn = execute_with_retry('''
-    SELECT code, used FROM payment_codes 
-    WHERE code = %s AND user_id = %s
-    ''', (codigo_pago, str(ciudadano.id)))
+    # Obtener cédula, estado del domicilio y del código de pago en una sola consulta
+    contexto = await repository.load_property_registration_context(str(ciudadano.id), numero_domicilio, codigo_pago)
+    if not contexto:
+        embed = discord.Embed(
+            title="❌ Ciudadano sin cédula",
+            description=f"{ciudadano.mention} no tiene una cédula de identidad registrada. Debe tramitar su cédula primero.",
+            color=discord.Color.red()
+        )
+        await interaction.followup.send(embed=embed, ephemeral=True)
+        return
     
-    try:
-        codigo_pago_data = cursor.fetchone()
-        if not codigo_pago_data:
-            embed = discord.Embed(
-                title="❌ Código de pago inválido",
-                description=f"El código de pago {codigo_pago} no existe o no pertenece al ciudadano especificado.",
-                color=discord.Color.red()
-            )
-            await interaction.followup.send(embed=embed, ephemeral=True)
-            return
-        
-        if codigo_pago_data['used']:
-            embed = discord.Embed(
-                title="❌ Código de pago ya usado",
-                description=f"El código de pago {codigo_pago} ya ha sido utilizado previamente.",
-                color=discord.Color.red()
-            )
-            await interaction.followup.send(embed=embed, ephemeral=True)
-            return
+    cedula, domicilio_registrado, codigo = contexto
+    rut = cedula.rut
+    avatar_url = cedula.avatar_url
+    
+    # Verificar si el número de domicilio ya está registrado
+    if domicilio_registrado:
+        embed = discord.Embed(
+            title="❌ Domicilio ya registrado",
+            description=f"El número de domicilio {numero_domicilio} ya está registrado en el sistema.",
+            color=discord.Color.red()
+        )
+        await interaction.followup.send(embed=embed, ephemeral=True)
+        return
+    
+    # Verificar si el código de pago existe y no está usado
+    if not codigo:
+        embed = discord.Embed(
+            title="❌ Código de pago inválido",
+            description=f"El código de pago {codigo_pago} no existe o no pertenece al ciudadano especificado.",
+            color=discord.Color.red()
+        )
+        await interaction.followup.send(embed=embed, ephemeral=True)
+        return
     
-    finally:
-        cursor.close()
-        conn.close()
+    if codigo.used:
+        embed = discord.Embed(
+            title="❌ Código de pago ya usado",
+            description=f"El código de pago {codigo_pago} ya ha sido utilizado previamente.",
+            color=discord.Color.red()
+        )
+        await interaction.followup.send(embed=embed, ephemeral=True)
+        return
     
     # Fecha de registro
-    fecha_registro = datetime.now().strftime("%d/%m/%Y")
+    fecha_registro = datetime.now().date()
     
     # Obtener URL de la imagen
     imagen_url = imagen.url
     
-    # Registrar la propiedad y marcar el código como usado
+    # Registrar la propiedad y marcar el código como usado en una transacción
     try:
-        # Registrar la propiedad
-        cursor, conn = execute_with_retry('''
-        INSERT INTO propiedades 
-        (user_id, numero_domicilio, zona, color, numero_pisos, codigo_pago, imagen_url, fecha_registro, registrado_por) 
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-        ''', (str(ciudadano.id), numero_domicilio, zona, color, pisos_int, codigo_pago, imagen_url, 
-              fecha_registro, str(interaction.user.id)))
-        
-        try:
+        async with db.unit_of_work(pin=(ciudadano.id,)) as tx:
+            # Registrar la propiedad
+            tx.execute('''
+            INSERT INTO propiedades 
+            (user_id, numero_domicilio, zona, color, numero_pisos, codigo_pago, imagen_url, fecha_registro, registrado_por) 
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+            ''', (str(ciudadano.id), numero_domicilio, zona, color, pisos_int, codigo_pago, imagen_url, 
+                  fecha_registro, str(interaction.user.id)))
+            
             # Marcar el código de pago como usado
-            cursor, conn = execute_with_retry('''
+            tx.execute('''
             UPDATE payment_codes 
             SET used = %s, used_at = %s 
             WHERE code = %s
-            ''', (True, datetime.now().strftime("%d/%m/%Y %H:%M:%S"), codigo_pago))
-            
-            try:
-                # Crear y enviar el mensaje embebido con la propiedad registrada
-                embed = discord.Embed(
-                    title="🇨🇱 SANTIAGO RP 🇨🇱",
-                    description="REGISTRO CIVIL Y DE PROPIEDADES",
-                    color=discord.Color.blue()
-                )
-                
-                embed.add_field(name="CERTIFICADO DE REGISTRO DE PROPIEDAD", value=f"Domicilio: {numero_domicilio}", inline=False)
-                
-                embed.add_field(name="Propietario", value=ciudadano.mention, inline=True)
-                embed.add_field(name="RUT", value=rut, inline=True)
-                embed.add_field(name="Fecha Registro", value=fecha_registro, inline=True)
-                
-                embed.add_field(name="Zona", value=zona, inline=True)
-                embed.add_field(name="Color", value=color, inline=True)
-                embed.add_field(name="Número de Pisos", value=str(pisos_int), inline=True)
-                
-                embed.add_field(name="Código de Pago", value=codigo_pago, inline=True)
-                embed.add_field(name="Registrado por", value=interaction.user.mention, inline=True)
-                
-                embed.set_image(url=imagen_url)
-                embed.set_thumbnail(url=avatar_url)
-                
-                await interaction.followup.send(embed=embed)
-                
-                # Enviar mensaje efímero de confirmación al usuario
-                confirmacion_embed = discord.Embed(
-                    title="✅ ¡Propiedad Registrada con Éxito!",
-                    description=f"La propiedad con domicilio {numero_domicilio} ha sido registrada correctamente para {ciudadano.mention}",
-                    color=discord.Color.green()
-                )
-                confirmacion_embed.add_field(
-                    name="📋 Detalles",
-                    value=f"Zona: {zona}\nColor: {color}\nNúmero de Pisos: {pisos_int}\nCódigo de Pago: {codigo_pago}",
-                    inline=False
-                )
-                confirmacion_embed.set_footer(text="Santiago RP - Registro de Propiedades")
-                
-                await interaction.followup.send(embed=confirmacion_embed, ephemeral=True)
-                
-                # Enviar log al canal de logs
-                canal_logs = interaction.guild.get_channel(1363653392454520963)
-                if canal_logs:
-                    log_embed = discord.Embed(
-                        title="🏠 Propiedad Registrada",
-                        description=f"Se ha registrado una nueva propiedad en el sistema.",
-                        color=discord.Color.blue(),
-                        timestamp=datetime.now()
-                    )
-                    log_embed.add_field(
-                        name="Administrador",
-                        value=f"{interaction.user.mention} ({interaction.user.name})",
-                        inline=True
-                    )
-                    log_embed.add_field(
-                        name="Propietario",
-                        value=f"{ciudadano.mention} ({ciudadano.name})",
-                        inline=True
-                    )
-                    log_embed.add_field(
-                        name="RUT",
-                        value=rut,
-                        inline=True
-                    )
-                    log_embed.add_field(
-                        name="Domicilio",
-                        value=numero_domicilio,
-                        inline=True
-                    )
-                    log_embed.add_field(
-                        name="Zona",
-                        value=zona,
-                        inline=True
-                    )
-                    log_embed.add_field(
-                        name="Color",
-                        value=color,
-                        inline=True
-                    )
-                    log_embed.add_field(
-                        name="Número de Pisos",
-                        value=str(pisos_int),
-                        inline=True
-                    )
-                    log_embed.add_field(
-                        name="Código de Pago",
-                        value=codigo_pago,
-                        inline=True
-                    )
-                    log_embed.add_field(
-                        name="Fecha de Registro",
-                        value=fecha_registro,
-                        inline=True
-                    )
-                    log_embed.set_image(url=imagen_url)
-                    log_embed.set_thumbnail(url=avatar_url if avatar_url else "https://tr.rbxcdn.com/e5b3371b4efc7642a22c1b36265a9ba9/420/420/AvatarHeadshot/Png")
-                    log_embed.set_footer(text=f"ID del usuario: {ciudadano.id}")
-                    
-                    await canal_logs.send(embed=log_embed)
-                else:
-                    logger.error(f"No se pudo encontrar el canal de logs con ID 1363653392454520963")
-            
-            finally:
-                cursor.close()
-                conn.close()
+            ''', (True, datetime.now().replace(microsecond=0), codigo_pago))
+        entity_cache.invalidate(numero_domicilio=numero_domicilio)
+        
+        # Crear y enviar el mensaje embebido con la propiedad registrada
+        embed = discord.Embed(
+            title="🇨🇱 SANTIAGO RP 🇨🇱",
+            description="REGISTRO CIVIL Y DE PROPIEDADES",
+            color=discord.Color.blue()
+        )
+        
+        embed.add_field(name="CERTIFICADO DE REGISTRO DE PROPIEDAD", value=f"Domicilio: {numero_domicilio}", inline=False)
         
-        finally:
-            cursor.close()
-            conn.close()
+        embed.add_field(name="Propietario", value=ciudadano.mention, inline=True)
+        embed.add_field(name="RUT", value=rut, inline=True)
+        embed.add_field(name="Fecha Registro", value=formatear_fecha(fecha_registro), inline=True)
+        
+        embed.add_field(name="Zona", value=zona, inline=True)
+        embed.add_field(name="Color", value=color, inline=True)
+        embed.add_field(name="Número de Pisos", value=str(pisos_int), inline=True)
+        
+        embed.add_field(name="Código de Pago", value=codigo_pago, inline=True)
+        embed.add_field(name="Registrado por", value=interaction.user.mention, inline=True)
+        
+        embed.set_image(url=imagen_url)
+        embed.set_thumbnail(url=avatar_url)
+        
+        await interaction.followup.send(embed=embed)
+        
+        # Enviar mensaje efímero de confirmación al usuario
+        confirmacion_embed = discord.Embed(
+            title="✅ ¡Propiedad Registrada con Éxito!",
+            description=f"La propiedad con domicilio {numero_domicilio} ha sido registrada correctamente para {ciudadano.mention}",
+            color=discord.Color.green()
+        )
+        confirmacion_embed.add_field(
+            name="📋 Detalles",
+            value=f"Zona: {zona}\nColor: {color}\nNúmero de Pisos: {pisos_int}\nCódigo de Pago: {codigo_pago}",
+            inline=False
+        )
+        confirmacion_embed.set_footer(text="Santiago RP - Registro de Propiedades")
+        
+        await interaction.followup.send(embed=confirmacion_embed, ephemeral=True)
+        
+        # Enviar log al canal de logs
+        log_embed = discord.Embed(
+            title="🏠 Propiedad Registrada",
+            description=f"Se ha registrado una nueva propiedad en el sistema.",
+            color=discord.Color.blue(),
+            timestamp=datetime.now()
+        )
+        log_embed.add_field(
+            name="Administrador",
+            value=f"{interaction.user.mention} ({interaction.user.name})",
+            inline=True
+        )
+        log_embed.add_field(
+            name="Propietario",
+            value=f"{ciudadano.mention} ({ciudadano.name})",
+            inline=True
+        )
+        log_embed.add_field(
+            name="RUT",
+            value=rut,
+            inline=True
+        )
+        log_embed.add_field(
+            name="Domicilio",
+            value=numero_domicilio,
+            inline=True
+        )
+        log_embed.add_field(
+            name="Zona",
+            value=zona,
+            inline=True
+        )
+        log_embed.add_field(
+            name="Color",
+            value=color,
+            inline=True
+        )
+        log_embed.add_field(
+            name="Número de Pisos",
+            value=str(pisos_int),
+            inline=True
+        )
+        log_embed.add_field(
+            name="Código de Pago",
+            value=codigo_pago,
+            inline=True
+        )
+        log_embed.add_field(
+            name="Fecha de Registro",
+            value=formatear_fecha(fecha_registro),
+            inline=True
+        )
+        log_embed.set_image(url=imagen_url)
+        log_embed.set_thumbnail(url=avatar_url if avatar_url else "https://tr.rbxcdn.com/e5b3371b4efc7642a22c1b36265a9ba9/420/420/AvatarHeadshot/Png")
+        log_embed.set_footer(text=f"ID del usuario: {ciudadano.id}")
+            
+        bitacora.send(1363653392454520963, log_embed)
     
     except mysql.connector.Error as e:
         logger.error(f"Error al registrar propiedad: {e}")
@@ -2395,131 +2102,108 @@ async def slash_eliminar_propiedad(interaction: discord.Interaction, ciudadano:
         await interaction.response.send_message(embed=embed, ephemeral=True)
         return
     
-    # Verificar si la propiedad existe
-    cursor, conn = execute_with_retry('''
-    SELECT numero_domicilio, zona, color, numero_pisos, codigo_pago, imagen_url, fecha_registro
-    FROM propiedades WHERE user_id = %s AND numero_domicilio = %s
-    ''', (str(ciudadano.id), numero_domicilio))
+    # Verificar si la propiedad existe (trae también la cédula para el log)
+    resultado = await repository.load_property_with_owner(str(ciudadano.id), numero_domicilio)
+    if not resultado:
+        embed = discord.Embed(
+            title="❌ Propiedad no encontrada",
+            description=f"No se encontró una propiedad con el número de domicilio {numero_domicilio} para {ciudadano.display_name}.",
+            color=discord.Color.red()
+        )
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+        return
     
-    try:
-        result = cursor.fetchone()
-        if not result:
-            embed = discord.Embed(
-                title="❌ Propiedad no encontrada",
-                description=f"No se encontró una propiedad con el número de domicilio {numero_domicilio} para {ciudadano.display_name}.",
-                color=discord.Color.red()
-            )
-            await interaction.response.send_message(embed=embed, ephemeral=True)
-            return
-        
-        numero_domicilio_prop = result['numero_domicilio']
-        zona = result['zona']
-        color = result['color']
-        numero_pisos = result['numero_pisos']
-        codigo_pago = result['codigo_pago']
-        imagen_url = result['imagen_url']
-        fecha_registro = result['fecha_registro']
-    
-    finally:
-        cursor.close()
-        conn.close()
-    
-    # Obtener información de la cédula para el log
-    cursor, conn = execute_with_retry('SELECT rut, avatar_url FROM cedulas WHERE user_id = %s', (str(ciudadano.id),))
-    try:
-        cedula = cursor.fetchone()
-        rut = cedula['rut'] if cedula else "No disponible"
-        avatar_url = cedula['avatar_url'] if cedula else "https://tr.rbxcdn.com/e5b3371b4efc7642a22c1b36265a9ba9/420/420/AvatarHeadshot/Png"
+    propiedad, cedula = resultado
+    numero_domicilio_prop = propiedad.numero_domicilio
+    zona = propiedad.zona
+    color = propiedad.color
+    numero_pisos = propiedad.numero_pisos
+    codigo_pago = propiedad.codigo_pago
+    imagen_url = propiedad.imagen_url
+    fecha_registro = propiedad.fecha_registro
     
-    finally:
-        cursor.close()
-        conn.close()
+    # Información de la cédula para el log
+    rut = cedula.rut if cedula else "No disponible"
+    avatar_url = (cedula and cedula.avatar_url) or "https://tr.rbxcdn.com/e5b3371b4efc7642a22c1b36265a9ba9/420/420/AvatarHeadshot/Png"
     
     # Eliminar la propiedad
     try:
-        cursor, conn = execute_with_retry('DELETE FROM propiedades WHERE user_id = %s AND numero_domicilio = %s', (str(ciudadano.id), numero_domicilio))
+        await db.execute('DELETE FROM propiedades WHERE user_id = %s AND numero_domicilio = %s', (str(ciudadano.id), numero_domicilio),
+                         pin=(ciudadano.id,))
+        entity_cache.invalidate(numero_domicilio=numero_domicilio)
         
-        try:
-            # Mensaje de éxito
-            embed = discord.Embed(
-                title="✅ Propiedad Eliminada",
-                description=f"La propiedad con número de domicilio {numero_domicilio} de {ciudadano.mention} ha sido eliminada correctamente.",
-                color=discord.Color.green()
-            )
-            embed.add_field(
-                name="Información eliminada",
-                value=f"Número de Domicilio: {numero_domicilio_prop}\nZona: {zona}",
-                inline=False
-            )
-            embed.set_footer(text="Santiago RP - Registro de Propiedades")
-            
-            await interaction.response.send_message(embed=embed)
+        # Mensaje de éxito
+        embed = discord.Embed(
+            title="✅ Propiedad Eliminada",
+            description=f"La propiedad con número de domicilio {numero_domicilio} de {ciudadano.mention} ha sido eliminada correctamente.",
+            color=discord.Color.green()
+        )
+        embed.add_field(
+            name="Información eliminada",
+            value=f"Número de Domicilio: {numero_domicilio_prop}\nZona: {zona}",
+            inline=False
+        )
+        embed.set_footer(text="Santiago RP - Registro de Propiedades")
+        
+        await interaction.response.send_message(embed=embed)
+        
+        # Enviar log al canal de logs
+        log_embed = discord.Embed(
+            title="🗑️ Propiedad Eliminada",
+            description=f"Se ha eliminado una propiedad del sistema.",
+            color=discord.Color.orange(),
+            timestamp=datetime.now()
+        )
+        log_embed.add_field(
+            name="Administrador",
+            value=f"{interaction.user.mention} ({interaction.user.name})",
+            inline=True
+        )
+        log_embed.add_field(
+            name="Ciudadano",
+            value=f"{ciudadano.mention} ({ciudadano.name})",
+            inline=True
+        )
+        log_embed.add_field(
+            name="RUT",
+            value=rut,
+            inline=True
+        )
+        log_embed.add_field(
+            name="Número de Domicilio",
+            value=numero_domicilio_prop,
+            inline=True
+        )
+        log_embed.add_field(
+            name="Zona",
+            value=zona,
+            inline=True
+        )
+        log_embed.add_field(
+            name="Color",
+            value=color,
+            inline=True
+        )
+        log_embed.add_field(
+            name="Número de Pisos",
+            value=str(numero_pisos),
+            inline=True
+        )
+        log_embed.add_field(
+            name="Código de Pago",
+            value=codigo_pago,
+            inline=True
+        )
+        log_embed.add_field(
+            name="Fecha de Registro",
+            value=formatear_fecha(fecha_registro),
+            inline=True
+        )
+        log_embed.set_thumbnail(url=avatar_url)
+        log_embed.set_image(url=imagen_url if imagen_url else None)
+        log_embed.set_footer(text=f"ID del usuario: {ciudadano.id}")
             
-            # Enviar log al canal de logs
-            canal_logs = interaction.guild.get_channel(canal_logs_id)
-            if canal_logs:
-                log_embed = discord.Embed(
-                    title="🗑️ Propiedad Eliminada",
-                    description=f"Se ha eliminado una propiedad del sistema.",
-                    color=discord.Color.orange(),
-                    timestamp=datetime.now()
-                )
-                log_embed.add_field(
-                    name="Administrador",
-                    value=f"{interaction.user.mention} ({interaction.user.name})",
-                    inline=True
-                )
-                log_embed.add_field(
-                    name="Ciudadano",
-                    value=f"{ciudadano.mention} ({ciudadano.name})",
-                    inline=True
-                )
-                log_embed.add_field(
-                    name="RUT",
-                    value=rut,
-                    inline=True
-                )
-                log_embed.add_field(
-                    name="Número de Domicilio",
-                    value=numero_domicilio_prop,
-                    inline=True
-                )
-                log_embed.add_field(
-                    name="Zona",
-                    value=zona,
-                    inline=True
-                )
-                log_embed.add_field(
-                    name="Color",
-                    value=color,
-                    inline=True
-                )
-                log_embed.add_field(
-                    name="Número de Pisos",
-                    value=str(numero_pisos),
-                    inline=True
-                )
-                log_embed.add_field(
-                    name="Código de Pago",
-                    value=codigo_pago,
-                    inline=True
-                )
-                log_embed.add_field(
-                    name="Fecha de Registro",
-                    value=fecha_registro,
-                    inline=True
-                )
-                log_embed.set_thumbnail(url=avatar_url)
-                log_embed.set_image(url=imagen_url if imagen_url else None)
-                log_embed.set_footer(text=f"ID del usuario: {ciudadano.id}")
-                
-                await canal_logs.send(embed=log_embed)
-            else:
-                logger.error(f"No se pudo encontrar el canal de logs con ID {canal_logs_id}")
-        
-        finally:
-            cursor.close()
-            conn.close()
+        bitacora.send(canal_logs_id, log_embed)
     
     except mysql.connector.Error as e:
         logger.error(f"Error al eliminar propiedad: {e}")
@@ -2548,70 +2232,53 @@ async def slash_ver_propiedad(interaction: discord.Interaction, ciudadano: disco
         await interaction.response.send_message(embed=embed, ephemeral=True)
         return
     
-    # Obtener información de la cédula
-    cursor, conn = execute_with_retry('SELECT rut, avatar_url FROM cedulas WHERE user_id = %s', (str(ciudadano.id),))
-    try:
-        cedula = cursor.fetchone()
-        if not cedula:
-            embed = discord.Embed(
-                title="❌ Ciudadano sin cédula",
-                description=f"{ciudadano.mention} no tiene una cédula de identidad registrada.",
-                color=discord.Color.red()
-            )
-            await interaction.response.send_message(embed=embed, ephemeral=True)
-            return
-        
-        rut = cedula['rut']
-        avatar_url = cedula['avatar_url']
-    
-    finally:
-        cursor.close()
-        conn.close()
+    # Obtener la cédula y la propiedad en una sola consulta
+    contexto = await repository.load_property_context(str(ciudadano.id), numero_domicilio, replica=True)
+    if not contexto:
+        embed = discord.Embed(
+            title="❌ Ciudadano sin cédula",
+            description=f"{ciudadano.mention} no tiene una cédula de identidad registrada.",
+            color=discord.Color.red()
+        )
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+        return
     
-    # Obtener la propiedad
-    cursor, conn = execute_with_retry('''
-    SELECT numero_domicilio, zona, color, numero_pisos, codigo_pago, imagen_url, fecha_registro, registrado_por
-    FROM propiedades WHERE user_id = %s AND numero_domicilio = %s
-    ''', (str(ciudadano.id), numero_domicilio))
+    cedula, propiedad = contexto
+    rut = cedula.rut
+    avatar_url = avatares.avatar_for(cedula)
     
-    try:
-        propiedad = cursor.fetchone()
-        if not propiedad:
-            embed = discord.Embed(
-                title="❌ Propiedad no encontrada",
-                description=f"No se encontró una propiedad con el número de domicilio {numero_domicilio} para {ciudadano.mention}.",
-                color=discord.Color.red()
-            )
-            await interaction.response.send_message(embed=embed, ephemeral=True)
-            return
-        
-        # Obtener el nombre del registrador si está disponible
-        registrado_por = interaction.guild.get_member(int(propiedad['registrado_por']))
-        registrado_por_nombre = registrado_por.mention if registrado_por else "Desconocido"
-        
-        # Crear embed con la información de la propiedad
+    if not propiedad:
         embed = discord.Embed(
-            title=f"🏠 SANTIAGO RP 🏠",
-            description="REGISTRO DE PROPIEDADES",
-            color=discord.Color.blue()
+            title="❌ Propiedad no encontrada",
+            description=f"No se encontró una propiedad con el número de domicilio {numero_domicilio} para {ciudadano.mention}.",
+            color=discord.Color.red()
         )
-        embed.add_field(name="Número de Domicilio", value=propiedad['numero_domicilio'], inline=True)
-        embed.add_field(name="Zona", value=propiedad['zona'], inline=True)
-        embed.add_field(name="Color", value=propiedad['color'], inline=True)
-        embed.add_field(name="Número de Pisos", value=propiedad['numero_pisos'], inline=True)
-        embed.add_field(name="Código de Pago", value=propiedad['codigo_pago'], inline=True)
-        embed.add_field(name="Fecha de Registro", value=propiedad['fecha_registro'], inline=True)
-        embed.add_field(name="Registrado por", value=registrado_por_nombre, inline=True)
-        embed.add_field(name="Titular", value=ciudadano.mention, inline=True)
-        embed.add_field(name="RUT", value=rut, inline=True)
-        embed.set_image(url=propiedad['imagen_url'])
-        embed.set_thumbnail(url=avatar_url)
-        
-        await interaction.response.send_message(embed=embed)
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+        return
+    
+    # Obtener el nombre del registrador si está disponible
+    registrado_por = interaction.guild.get_member(int(propiedad.registrado_por))
+    registrado_por_nombre = registrado_por.mention if registrado_por else "Desconocido"
     
-    finally:
-        cursor.close()
-        conn.close()
+    # Crear embed con la información de la propiedad
+    embed = discord.Embed(
+        title=f"🏠 SANTIAGO RP 🏠",
+        description="REGISTRO DE PROPIEDADES",
+        color=discord.Color.blue()
+    )
+    embed.add_field(name="Número de Domicilio", value=propiedad.numero_domicilio, inline=True)
+    embed.add_field(name="Zona", value=propiedad.zona, inline=True)
+    embed.add_field(name="Color", value=propiedad.color, inline=True)
+    embed.add_field(name="Número de Pisos", value=propiedad.numero_pisos, inline=True)
+    embed.add_field(name="Código de Pago", value=propiedad.codigo_pago, inline=True)
+    embed.add_field(name="Fecha de Registro", value=formatear_fecha(propiedad.fecha_registro), inline=True)
+    embed.add_field(name="Registrado por", value=registrado_por_nombre, inline=True)
+    embed.add_field(name="Titular", value=ciudadano.mention, inline=True)
+    embed.add_field(name="RUT", value=rut, inline=True)
+    embed.set_image(url=propiedad.imagen_url)
+    embed.set_thumbnail(url=avatar_url)
+    
+    await interaction.response.send_message(embed=embed)
 
 # Function for autocompleting emergency services
 async def autocompletar_servicio(
@@ -2803,72 +2470,47 @@ async def slash_entorno(
     await interaction.response.send_message(embed=embed_confirmacion, ephemeral=True)
 
     # Registrar la alerta en la base de datos (para auditoría)
-    try:
-        cursor, conn = execute_with_retry('''
-        CREATE TABLE IF NOT EXISTS emergencias (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            user_id BIGINT,
-            razon TEXT,
-            servicio VARCHAR(255),
-            ubicacion TEXT,
-            fecha VARCHAR(50),
-            servicios_notificados TEXT
-        )
-        ''')
-        try:
-            cursor, conn = execute_with_retry('''
-            INSERT INTO emergencias 
-            (user_id, razon, servicio, ubicacion, fecha, servicios_notificados) 
-            VALUES (%s, %s, %s, %s, %s, %s)
-            ''', (
-                str(interaction.user.id),
-                razon,
-                servicio,
-                ubicacion,
-                datetime.now().strftime("%d/%m/%Y %H:%M:%S"),
-                ", ".join(servicios_notificados)
-            ))
-            logger.info(f"Emergencia registrada para el usuario {interaction.user.id}")
-        finally:
-            cursor.close()
-            conn.close()
-    except mysql.connector.Error as e:
-        logger.error(f"Error al registrar emergencia en la base de datos: {e}")
+    # Se encola en el buffer de escritura: se inserta en lote junto con otras alertas
+    if buffer_emergencias.add(
+        str(interaction.user.id),
+        razon,
+        servicio,
+        ubicacion,
+        datetime.now().strftime("%d/%m/%Y %H:%M:%S"),
+        ", ".join(servicios_notificados)
+    ):
+        logger.info(f"Emergencia registrada para el usuario {interaction.user.id}")
 
     # Enviar log al canal de logs
     canal_logs_id = 1363652764613480560
-    canal_logs = interaction.guild.get_channel(canal_logs_id)
-    if canal_logs:
-        log_embed = discord.Embed(
-            title="🚨 Alerta de Emergencia Reportada",
-            description="Se ha reportado una nueva emergencia.",
-            color=discord.Color.red(),
-            timestamp=datetime.now()
-        )
-        log_embed.add_field(
-            name="Usuario",
-            value=f"{interaction.user.mention} ({interaction.user.name})",
-            inline=True
-        )
-        log_embed.add_field(
-            name="Razón",
-            value=razon,
-            inline=True
-        )
-        log_embed.add_field(
-            name="Ubicación",
-            value=ubicacion,
-            inline=True
-        )
-        log_embed.add_field(
-            name="Servicios Notificados",
-            value=", ".join(servicios_notificados),
-            inline=False
-        )
-        log_embed.set_footer(text=f"ID del usuario: {interaction.user.id}")
-        await canal_logs.send(embed=log_embed)
-    else:
-        logger.error(f"No se pudo encontrar el canal de logs con ID {canal_logs_id}")
+    log_embed = discord.Embed(
+        title="🚨 Alerta de Emergencia Reportada",
+        description="Se ha reportado una nueva emergencia.",
+        color=discord.Color.red(),
+        timestamp=datetime.now()
+    )
+    log_embed.add_field(
+        name="Usuario",
+        value=f"{interaction.user.mention} ({interaction.user.name})",
+        inline=True
+    )
+    log_embed.add_field(
+        name="Razón",
+        value=razon,
+        inline=True
+    )
+    log_embed.add_field(
+        name="Ubicación",
+        value=ubicacion,
+        inline=True
+    )
+    log_embed.add_field(
+        name="Servicios Notificados",
+        value=", ".join(servicios_notificados),
+        inline=False
+    )
+    log_embed.set_footer(text=f"ID del usuario: {interaction.user.id}")
+    bitacora.send(canal_logs_id, log_embed)
 
 @bot.tree.command(
     name="arrestar-a",
@@ -2952,250 +2594,227 @@ async def slash_arrestar_ciudadano(
     await interaction.response.defer(ephemeral=True, thinking=True)
     
     try:
-        # Iniciar conexión a la base de datos
-        conn = mysql.connector.connect(**DB_CONFIG)
-        cursor = conn.cursor(dictionary=True)
+        # Obtener en una sola consulta la cédula del ciudadano y la del oficial
+        cedula, oficial_info = await repository.load_enforcement_context(detenido.id, interaction.user.id)
+        if not cedula:
+            embed = discord.Embed(
+                title="📄 CÉDULA NO ENCONTRADA 📄",
+                description=f"{detenido.mention} no tiene cédula registrada en el sistema.",
+                color=discord.Color.orange()
+            )
+            embed.set_footer(text="Sistema de Justicia - SantiagoRP")
+            await interaction.followup.send(embed=embed, ephemeral=True)
+            return
+        
+        nombre, apellido, rut, roblox_avatar = cedula.primer_nombre, cedula.apellido_paterno, cedula.rut, avatares.avatar_for(cedula)
+        
+        # Validar URL del avatar
+        default_avatar_url = "https://discord.com/assets/1f0bfc0865d324c2587920a7d80c609b.png"
+        avatar_url = None
+        if roblox_avatar and isinstance(roblox_avatar, str) and roblox_avatar.startswith(('http://', 'https://')):
+            avatar_url = roblox_avatar
+        else:
+            try:
+                avatar_url = detenido.display_avatar.url if detenido.display_avatar else default_avatar_url
+            except Exception as e:
+                logger.warning(f"Error al obtener display_avatar.url para el usuario {detenido.id}: {str(e)}")
+                avatar_url = default_avatar_url
+        
+        # Registrar el arresto
+        fecha_arresto = datetime.now().replace(microsecond=0)
+        foto_url = foto.url
+        
+        resultado = await db.execute('''
+        INSERT INTO arrestos (
+            user_id, rut, razon, tiempo_prision, monto_multa, 
+            foto_url, fecha_arresto, oficial_id, estado
+        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+        ''', (
+            detenido.id, rut, razon, tiempo_prision, monto_multa, 
+            foto_url, fecha_arresto, interaction.user.id, 'Activo'
+        ), pin=(detenido.id,))
+        
+        arresto_id = resultado.lastrowid
+        
+        # Nombre del oficial según su cédula
+        nombre_oficial = "Oficial Desconocido"
+        if oficial_info:
+            nombre_oficial = f"{oficial_info.primer_nombre} {oficial_info.apellido_paterno}"
+        
+        # Determinar la institución del oficial
+        institucion = "Funcionario Público"
+        for role in interaction.user.roles:
+            if role.id == 1339386615205859423:
+                institucion = "Carabineros de Chile"
+                break
+            elif role.id == 1339386615205859422:
+                institucion = "Policía de Investigaciones"
+                break
+        
+        # Crear ficha de antecedentes
+        embed_antecedentes = discord.Embed(
+            title="🚨 REGISTRO DE DETENCIÓN 🚨",
+            description=f"**FICHA DE ANTECEDENTES PENALES**\nN° {arresto_id:06d}",
+            color=discord.Color.dark_red(),
+            timestamp=datetime.now()
+        )
+        
+        embed_antecedentes.add_field(
+            name="👤 DATOS DEL DETENIDO",
+            value=f"**Nombre:** {nombre} {apellido}\n**RUT:** {rut}\n**ID:** {detenido.id}",
+            inline=False
+        )
+        
+        embed_antecedentes.add_field(
+            name="⚖️ INFRACCIÓN COMETIDA",
+            value=f"```yaml\n{razon}\n```",
+            inline=False
+        )
+        
+        embed_antecedentes.add_field(
+            name="🔒 SENTENCIA",
+            value=f"**Tiempo de prisión:** {tiempo_prision}\n**Multa:** ${monto_multa:,} CLP",
+            inline=True
+        )
+        
+        embed_antecedentes.add_field(
+            name="📅 FECHAS",
+            value=f"**Detención:** <t:{int(datetime.now().timestamp())}:F>",
+            inline=True
+        )
+        
+        embed_antecedentes.add_field(
+            name="👮 OFICIAL A CARGO",
+            value=f"**Nombre:** {nombre_oficial}\n**Institución:** {institucion}\n**ID:** {interaction.user.id}",
+            inline=False
+        )
+        
+        embed_antecedentes.set_image(url=foto_url)
+        embed_antecedentes.set_thumbnail(url=avatar_url)
+        embed_antecedentes.set_footer(
+            text=f"Sistema Judicial de SantiagoRP • Expediente N° {arresto_id:06d}",
+            icon_url=interaction.guild.icon.url if interaction.guild.icon else None
+        )
+        
+        # Enviar al canal de antecedentes
+        canal_antecedentes_id = 1363655409797304400
+        canal_antecedentes = interaction.guild.get_channel(canal_antecedentes_id)
+        
+        if canal_antecedentes:
+            await canal_antecedentes.send(embed=embed_antecedentes)
+            canal_nombre = canal_antecedentes.mention
+        else:
+            canal_nombre = "canal de antecedentes"
+            logger.error(f"No se pudo encontrar el canal de antecedentes con ID {canal_antecedentes_id}")
         
+        # Enviar confirmación al oficial
+        embed_confirmacion = discord.Embed(
+            title="✅ ARRESTO REGISTRADO CON ÉXITO",
+            description=f"Se ha registrado el arresto de {nombre} {apellido} en el sistema y publicado en {canal_nombre}.",
+            color=discord.Color.green()
+        )
+        
+        embed_confirmacion.add_field(
+            name="📋 Detalles",
+            value=f"**Expediente N°:** {arresto_id:06d}\n**Delito:** {razon}\n**Sentencia:** {tiempo_prision}",
+            inline=False
+        )
+        
+        embed_confirmacion.set_footer(
+            text="Sistema Judicial de SantiagoRP",
+            icon_url=interaction.guild.icon.url if interaction.guild.icon else None
+        )
+        
+        await interaction.followup.send(embed=embed_confirmacion, ephemeral=True)
+        
+        # Enviar DM al detenido
         try:
-            # Verificar cédula del ciudadano
-            cursor.execute('''
-            SELECT primer_nombre, apellido_paterno, rut, avatar_url
-            FROM cedulas WHERE user_id = %s
-            ''', (str(detenido.id),))
-            cedula = cursor.fetchone()
-            if not cedula:
-                embed = discord.Embed(
-                    title="📄 CÉDULA NO ENCONTRADA 📄",
-                    description=f"{detenido.mention} no tiene cédula registrada en el sistema.",
-                    color=discord.Color.orange()
-                )
-                embed.set_footer(text="Sistema de Justicia - SantiagoRP")
-                await interaction.followup.send(embed=embed, ephemeral=True)
-                return
-            
-            nombre, apellido, rut, roblox_avatar = cedula['primer_nombre'], cedula['apellido_paterno'], cedula['rut'], cedula['avatar_url']
-            
-            # Validar URL del avatar
-            default_avatar_url = "https://discord.com/assets/1f0bfc0865d324c2587920a7d80c609b.png"
-            avatar_url = None
-            if roblox_avatar and isinstance(roblox_avatar, str) and roblox_avatar.startswith(('http://', 'https://')):
-                avatar_url = roblox_avatar
-            else:
-                try:
-                    avatar_url = detenido.display_avatar.url if detenido.display_avatar else default_avatar_url
-                except Exception as e:
-                    logger.warning(f"Error al obtener display_avatar.url para el usuario {detenido.id}: {str(e)}")
-                    avatar_url = default_avatar_url
-            
-            # Registrar el arresto
-            fecha_arresto = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            foto_url = foto.url
-            
-            cursor.execute('''
-            INSERT INTO arrestos (
-                user_id, rut, razon, tiempo_prision, monto_multa, 
-                foto_url, fecha_arresto, oficial_id, estado
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-            ''', (
-                str(detenido.id), rut, razon, tiempo_prision, monto_multa, 
-                foto_url, fecha_arresto, str(interaction.user.id), 'Activo'
-            ))
-            conn.commit()
-            
-            arresto_id = cursor.lastrowid
-            
-            # Obtener información del oficial
-            cursor.execute('''
-            SELECT primer_nombre, apellido_paterno
-            FROM cedulas WHERE user_id = %s
-            ''', (str(interaction.user.id),))
-            oficial_info = cursor.fetchone()
-            nombre_oficial = "Oficial Desconocido"
-            if oficial_info and 'primer_nombre' in oficial_info and 'apellido_paterno' in oficial_info:
-                nombre_oficial = f"{oficial_info['primer_nombre']} {oficial_info['apellido_paterno']}"
-            
-            # Determinar la institución del oficial
-            institucion = "Funcionario Público"
-            for role in interaction.user.roles:
-                if role.id == 1339386615205859423:
-                    institucion = "Carabineros de Chile"
-                    break
-                elif role.id == 1339386615205859422:
-                    institucion = "Policía de Investigaciones"
-                    break
-            
-            # Crear ficha de antecedentes
-            embed_antecedentes = discord.Embed(
-                title="🚨 REGISTRO DE DETENCIÓN 🚨",
-                description=f"**FICHA DE ANTECEDENTES PENALES**\nN° {arresto_id:06d}",
-                color=discord.Color.dark_red(),
+            embed_dm = discord.Embed(
+                title="🚨 NOTIFICACIÓN DE ARRESTO 🚨",
+                description="**Has sido arrestado por las autoridades de SantiagoRP.**\nPor favor, revisa los detalles a continuación y sigue las instrucciones proporcionadas.",
+                color=discord.Color.red(),
                 timestamp=datetime.now()
             )
             
-            embed_antecedentes.add_field(
-                name="👤 DATOS DEL DETENIDO",
-                value=f"**Nombre:** {nombre} {apellido}\n**RUT:** {rut}\n**ID:** {detenido.id}",
-                inline=False
+            embed_dm.add_field(
+                name="👤 Datos Personales",
+                value=f"**Nombre:** {nombre} {apellido}\n**RUT:** {rut}",
+                inline=True
             )
             
-            embed_antecedentes.add_field(
-                name="⚖️ INFRACCIÓN COMETIDA",
+            embed_dm.add_field(
+                name="⚖️ Delito Cometido",
                 value=f"```yaml\n{razon}\n```",
                 inline=False
             )
             
-            embed_antecedentes.add_field(
-                name="🔒 SENTENCIA",
+            embed_dm.add_field(
+                name="🔒 Sentencia",
                 value=f"**Tiempo de prisión:** {tiempo_prision}\n**Multa:** ${monto_multa:,} CLP",
                 inline=True
             )
             
-            embed_antecedentes.add_field(
-                name="📅 FECHAS",
-                value=f"**Detención:** <t:{int(datetime.now().timestamp())}:F>",
+            embed_dm.add_field(
+                name="👮 Autoridad Responsable",
+                value=f"**Oficial:** {nombre_oficial}\n**Institución:** {institucion}",
                 inline=True
             )
             
-            embed_antecedentes.add_field(
-                name="👮 OFICIAL A CARGO",
-                value=f"**Nombre:** {nombre_oficial}\n**Institución:** {institucion}\n**ID:** {interaction.user.id}",
+            embed_dm.add_field(
+                name="📋 Instrucciones",
+                value="Dirígete al canal de antecedentes para más detalles y sigue las indicaciones de las autoridades. Si tienes dudas, contacta a un oficial en el servidor.",
                 inline=False
             )
             
-            embed_antecedentes.set_image(url=foto_url)
-            embed_antecedentes.set_thumbnail(url=avatar_url)
-            embed_antecedentes.set_footer(
-                text=f"Sistema Judicial de SantiagoRP • Expediente N° {arresto_id:06d}",
+            embed_dm.set_thumbnail(url=foto_url)
+            embed_dm.set_footer(
+                text=f"Expediente N° {arresto_id:06d} • Sistema Judicial de SantiagoRP",
                 icon_url=interaction.guild.icon.url if interaction.guild.icon else None
             )
             
-            # Enviar al canal de antecedentes
-            canal_antecedentes_id = 1363655409797304400
-            canal_antecedentes = interaction.guild.get_channel(canal_antecedentes_id)
-            
-            if canal_antecedentes:
-                await canal_antecedentes.send(embed=embed_antecedentes)
-                canal_nombre = canal_antecedentes.mention
-            else:
-                canal_nombre = "canal de antecedentes"
-                logger.error(f"No se pudo encontrar el canal de antecedentes con ID {canal_antecedentes_id}")
-            
-            # Enviar confirmación al oficial
-            embed_confirmacion = discord.Embed(
-                title="✅ ARRESTO REGISTRADO CON ÉXITO",
-                description=f"Se ha registrado el arresto de {nombre} {apellido} en el sistema y publicado en {canal_nombre}.",
-                color=discord.Color.green()
-            )
-            
+            await detenido.send(embed=embed_dm)
+            logger.info(f"DM de arresto enviado a {detenido.id}")
+        except discord.Forbidden:
+            logger.warning(f"No se pudo enviar DM al detenido {detenido.id}: DMs deshabilitados")
             embed_confirmacion.add_field(
-                name="📋 Detalles",
-                value=f"**Expediente N°:** {arresto_id:06d}\n**Delito:** {razon}\n**Sentencia:** {tiempo_prision}",
+                name="⚠️ Advertencia",
+                value="No se pudo enviar un DM al detenido (DMs deshabilitados).",
                 inline=False
             )
-            
-            embed_confirmacion.set_footer(
-                text="Sistema Judicial de SantiagoRP",
-                icon_url=interaction.guild.icon.url if interaction.guild.icon else None
-            )
-            
             await interaction.followup.send(embed=embed_confirmacion, ephemeral=True)
-            
-            # Enviar DM al detenido
-            try:
-                embed_dm = discord.Embed(
-                    title="🚨 NOTIFICACIÓN DE ARRESTO 🚨",
-                    description="**Has sido arrestado por las autoridades de SantiagoRP.**\nPor favor, revisa los detalles a continuación y sigue las instrucciones proporcionadas.",
-                    color=discord.Color.red(),
-                    timestamp=datetime.now()
-                )
-                
-                embed_dm.add_field(
-                    name="👤 Datos Personales",
-                    value=f"**Nombre:** {nombre} {apellido}\n**RUT:** {rut}",
-                    inline=True
-                )
-                
-                embed_dm.add_field(
-                    name="⚖️ Delito Cometido",
-                    value=f"```yaml\n{razon}\n```",
-                    inline=False
-                )
-                
-                embed_dm.add_field(
-                    name="🔒 Sentencia",
-                    value=f"**Tiempo de prisión:** {tiempo_prision}\n**Multa:** ${monto_multa:,} CLP",
-                    inline=True
-                )
-                
-                embed_dm.add_field(
-                    name="👮 Autoridad Responsable",
-                    value=f"**Oficial:** {nombre_oficial}\n**Institución:** {institucion}",
-                    inline=True
-                )
-                
-                embed_dm.add_field(
-                    name="📋 Instrucciones",
-                    value="Dirígete al canal de antecedentes para más detalles y sigue las indicaciones de las autoridades. Si tienes dudas, contacta a un oficial en el servidor.",
-                    inline=False
-                )
-                
-                embed_dm.set_thumbnail(url=foto_url)
-                embed_dm.set_footer(
-                    text=f"Expediente N° {arresto_id:06d} • Sistema Judicial de SantiagoRP",
-                    icon_url=interaction.guild.icon.url if interaction.guild.icon else None
-                )
-                
-                await detenido.send(embed=embed_dm)
-                logger.info(f"DM de arresto enviado a {detenido.id}")
-            except discord.Forbidden:
-                logger.warning(f"No se pudo enviar DM al detenido {detenido.id}: DMs deshabilitados")
-                embed_confirmacion.add_field(
-                    name="⚠️ Advertencia",
-                    value="No se pudo enviar un DM al detenido (DMs deshabilitados).",
-                    inline=False
-                )
-                await interaction.followup.send(embed=embed_confirmacion, ephemeral=True)
-            except Exception as e:
-                logger.error(f"Error al enviar DM al detenido {detenido.id}: {str(e)}")
-            
-            # Registrar en el canal de logs
-            canal_logs_id = 1363655836265877674
-            canal_logs = interaction.guild.get_channel(canal_logs_id)
-            if canal_logs:
-                log_embed = discord.Embed(
-                    title="🚨 Arresto Registrado",
-                    description="Se ha registrado un nuevo arresto en el sistema.",
-                    color=discord.Color.red(),
-                    timestamp=datetime.now()
-                )
-                log_embed.add_field(
-                    name="Detenido",
-                    value=f"{nombre} {apellido} ({rut})",
-                    inline=True
-                )
-                log_embed.add_field(
-                    name="Oficial",
-                    value=f"{nombre_oficial} ({institucion})",
-                    inline=True
-                )
-                log_embed.add_field(
-                    name="Delito",
-                    value=razon,
-                    inline=False
-                )
-                log_embed.add_field(
-                    name="Sentencia",
-                    value=f"Tiempo: {tiempo_prision}\nMulta: ${monto_multa:,} CLP",
-                    inline=True
-                )
-                log_embed.set_footer(text=f"Expediente N° {arresto_id:06d}")
-                await canal_logs.send(embed=log_embed)
-            else:
-                logger.error(f"No se pudo encontrar el canal de logs con ID {canal_logs_id}")
+        except Exception as e:
+            logger.error(f"Error al enviar DM al detenido {detenido.id}: {str(e)}")
         
-        finally:
-            cursor.close()
-            conn.close()
+        # Registrar en el canal de logs
+        canal_logs_id = 1363655836265877674
+        log_embed = discord.Embed(
+            title="🚨 Arresto Registrado",
+            description="Se ha registrado un nuevo arresto en el sistema.",
+            color=discord.Color.red(),
+            timestamp=datetime.now()
+        )
+        log_embed.add_field(
+            name="Detenido",
+            value=f"{nombre} {apellido} ({rut})",
+            inline=True
+        )
+        log_embed.add_field(
+            name="Oficial",
+            value=f"{nombre_oficial} ({institucion})",
+            inline=True
+        )
+        log_embed.add_field(
+            name="Delito",
+            value=razon,
+            inline=False
+        )
+        log_embed.add_field(
+            name="Sentencia",
+            value=f"Tiempo: {tiempo_prision}\nMulta: ${monto_multa:,} CLP",
+            inline=True
+        )
+        log_embed.set_footer(text=f"Expediente N° {arresto_id:06d}")
+        bitacora.send(canal_logs_id, log_embed)
     
     except mysql.connector.Error as e:
         logger.error(f"Error al registrar arresto en la base de datos: {e}")
@@ -3285,250 +2904,227 @@ async def slash_multar_ciudadano(
     await interaction.response.defer(ephemeral=True, thinking=True)
     
     try:
-        # Iniciar conexión a la base de datos
-        conn = mysql.connector.connect(**DB_CONFIG)
-        cursor = conn.cursor(dictionary=True)
+        # Obtener en una sola consulta la cédula del ciudadano y la del oficial
+        cedula, oficial_info = await repository.load_enforcement_context(multado.id, interaction.user.id)
+        if not cedula:
+            embed = discord.Embed(
+                title="📄 CÉDULA NO ENCONTRADA 📄",
+                description=f"{multado.mention} no tiene cédula registrada en el sistema.",
+                color=discord.Color.orange()
+            )
+            embed.set_footer(text="Sistema de Justicia - SantiagoRP")
+            await interaction.followup.send(embed=embed, ephemeral=True)
+            return
         
-        try:
-            # Verificar cédula del ciudadano
-            cursor.execute('''
-            SELECT primer_nombre, apellido_paterno, rut, avatar_url
-            FROM cedulas WHERE user_id = %s
-            ''', (str(multado.id),))
-            cedula = cursor.fetchone()
-            if not cedula:
-                embed = discord.Embed(
-                    title="📄 CÉDULA NO ENCONTRADA 📄",
-                    description=f"{multado.mention} no tiene cédula registrada en el sistema.",
-                    color=discord.Color.orange()
-                )
-                embed.set_footer(text="Sistema de Justicia - SantiagoRP")
-                await interaction.followup.send(embed=embed, ephemeral=True)
-                return
-            
-            nombre, apellido, rut, roblox_avatar = cedula['primer_nombre'], cedula['apellido_paterno'], cedula['rut'], cedula['avatar_url']
-            
-            # Validar URL del avatar
-            default_avatar_url = "https://discord.com/assets/1f0bfc0865d324c2587920a7d80c609b.png"
-            avatar_url = None
-            if roblox_avatar and isinstance(roblox_avatar, str) and roblox_avatar.startswith(('http://', 'https://')):
-                avatar_url = roblox_avatar
-            else:
-                try:
-                    avatar_url = multado.display_avatar.url if multado.display_avatar else default_avatar_url
-                except Exception as e:
-                    logger.warning(f"Error al obtener display_avatar.url para el usuario {multado.id}: {str(e)}")
-                    avatar_url = default_avatar_url
-            
-            # Registrar la multa
-            fecha_multa = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            foto_url = foto.url
-            
-            cursor.execute('''
-            INSERT INTO multas (
-                user_id, rut, razon, monto_multa, foto_url, 
-                fecha_multa, oficial_id, estado
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            ''', (
-                str(multado.id), rut, razon, monto_multa, foto_url, 
-                fecha_multa, str(interaction.user.id), 'Pendiente'
-            ))
-            conn.commit()
-            
-            multa_id = cursor.lastrowid
-            
-            # Obtener información del oficial
-            cursor.execute('''
-            SELECT primer_nombre, apellido_paterno
-            FROM cedulas WHERE user_id = %s
-            ''', (str(interaction.user.id),))
-            oficial_info = cursor.fetchone()
-            nombre_oficial = "Oficial Desconocido"
-            if oficial_info and 'primer_nombre' in oficial_info and 'apellido_paterno' in oficial_info:
-                nombre_oficial = f"{oficial_info['primer_nombre']} {oficial_info['apellido_paterno']}"
-            
-            # Determinar la institución del oficial
-            institucion = "Funcionario Público"
-            for role in interaction.user.roles:
-                if role.id == 1339386615205859423:
-                    institucion = "Carabineros de Chile"
-                    break
-                elif role.id == 1339386615205859422:
-                    institucion = "Policía de Investigaciones"
-                    break
-            
-            # Crear ficha de la multa
-            embed_multa = discord.Embed(
-                title="📝 REGISTRO DE MULTA 📝",
-                description=f"**FICHA DE MULTA**\nN° {multa_id:06d}",
+        nombre, apellido, rut, roblox_avatar = cedula.primer_nombre, cedula.apellido_paterno, cedula.rut, avatares.avatar_for(cedula)
+        
+        # Validar URL del avatar
+        default_avatar_url = "https://discord.com/assets/1f0bfc0865d324c2587920a7d80c609b.png"
+        avatar_url = None
+        if roblox_avatar and isinstance(roblox_avatar, str) and roblox_avatar.startswith(('http://', 'https://')):
+            avatar_url = roblox_avatar
+        else:
+            try:
+                avatar_url = multado.display_avatar.url if multado.display_avatar else default_avatar_url
+            except Exception as e:
+                logger.warning(f"Error al obtener display_avatar.url para el usuario {multado.id}: {str(e)}")
+                avatar_url = default_avatar_url
+        
+        # Registrar la multa
+        fecha_multa = datetime.now().replace(microsecond=0)
+        foto_url = foto.url
+        
+        resultado = await db.execute('''
+        INSERT INTO multas (
+            user_id, rut, razon, monto_multa, foto_url, 
+            fecha_multa, oficial_id, estado
+        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        ''', (
+            multado.id, rut, razon, monto_multa, foto_url, 
+            fecha_multa, interaction.user.id, 'Pendiente'
+        ), pin=(multado.id,))
+        
+        multa_id = resultado.lastrowid
+        
+        # Nombre del oficial según su cédula
+        nombre_oficial = "Oficial Desconocido"
+        if oficial_info:
+            nombre_oficial = f"{oficial_info.primer_nombre} {oficial_info.apellido_paterno}"
+        
+        # Determinar la institución del oficial
+        institucion = "Funcionario Público"
+        for role in interaction.user.roles:
+            if role.id == 1339386615205859423:
+                institucion = "Carabineros de Chile"
+                break
+            elif role.id == 1339386615205859422:
+                institucion = "Policía de Investigaciones"
+                break
+        
+        # Crear ficha de la multa
+        embed_multa = discord.Embed(
+            title="📝 REGISTRO DE MULTA 📝",
+            description=f"**FICHA DE MULTA**\nN° {multa_id:06d}",
+            color=discord.Color.gold(),
+            timestamp=datetime.now()
+        )
+        
+        embed_multa.add_field(
+            name="👤 DATOS DEL CIUDADANO",
+            value=f"**Nombre:** {nombre} {apellido}\n**RUT:** {rut}\n**ID:** {multado.id}",
+            inline=False
+        )
+        
+        embed_multa.add_field(
+            name="⚖️ MOTIVO DE LA MULTA",
+            value=f"```yaml\n{razon}\n```",
+            inline=False
+        )
+        
+        embed_multa.add_field(
+            name="💸 MONTO",
+            value=f"**Multa:** ${monto_multa:,} CLP",
+            inline=True
+        )
+        
+        embed_multa.add_field(
+            name="📅 FECHA",
+            value=f"**Multa emitida:** <t:{int(datetime.now().timestamp())}:F>",
+            inline=True
+        )
+        
+        embed_multa.add_field(
+            name="👮 OFICIAL A CARGO",
+            value=f"**Nombre:** {nombre_oficial}\n**Institución:** {institucion}\n**ID:** {interaction.user.id}",
+            inline=False
+        )
+        
+        embed_multa.set_image(url=foto_url)
+        embed_multa.set_thumbnail(url=avatar_url)
+        embed_multa.set_footer(
+            text=f"Sistema Judicial de SantiagoRP • Multa N° {multa_id:06d}",
+            icon_url=interaction.guild.icon.url if interaction.guild.icon else None
+        )
+        
+        # Enviar al canal de multas
+        canal_multas_id = 1356084986918342748
+        canal_multas = interaction.guild.get_channel(canal_multas_id)
+        
+        if canal_multas:
+            await canal_multas.send(embed=embed_multa)
+            canal_nombre = canal_multas.mention
+        else:
+            canal_nombre = "canal de multas"
+            logger.error(f"No se pudo encontrar el canal de multas con ID {canal_multas_id}")
+        
+        # Enviar confirmación al oficial
+        embed_confirmacion = discord.Embed(
+            title="✅ MULTA REGISTRADA CON ÉXITO",
+            description=f"Se ha registrado la multa de {nombre} {apellido} en el sistema y publicada en {canal_nombre}.",
+            color=discord.Color.green()
+        )
+        
+        embed_confirmacion.add_field(
+            name="📋 Detalles",
+            value=f"**Multa N°:** {multa_id:06d}\n**Motivo:** {razon}\n**Monto:** ${monto_multa:,} CLP",
+            inline=False
+        )
+        
+        embed_confirmacion.set_footer(
+            text="Sistema Judicial de SantiagoRP",
+            icon_url=interaction.guild.icon.url if interaction.guild.icon else None
+        )
+        
+        await interaction.followup.send(embed=embed_confirmacion, ephemeral=True)
+        
+        # Enviar DM al ciudadano multado
+        try:
+            embed_dm = discord.Embed(
+                title="📝 NOTIFICACIÓN DE MULTA 📝",
+                description="**Has recibido una multa por parte de las autoridades de SantiagoRP.**\nPor favor, revisa los detalles a continuación y sigue las instrucciones proporcionadas.",
                 color=discord.Color.gold(),
                 timestamp=datetime.now()
             )
             
-            embed_multa.add_field(
-                name="👤 DATOS DEL CIUDADANO",
-                value=f"**Nombre:** {nombre} {apellido}\n**RUT:** {rut}\n**ID:** {multado.id}",
-                inline=False
+            embed_dm.add_field(
+                name="👤 Datos Personales",
+                value=f"**Nombre:** {nombre} {apellido}\n**RUT:** {rut}",
+                inline=True
             )
             
-            embed_multa.add_field(
-                name="⚖️ MOTIVO DE LA MULTA",
+            embed_dm.add_field(
+                name="⚖️ Motivo de la Multa",
                 value=f"```yaml\n{razon}\n```",
                 inline=False
             )
             
-            embed_multa.add_field(
-                name="💸 MONTO",
+            embed_dm.add_field(
+                name="💸 Monto",
                 value=f"**Multa:** ${monto_multa:,} CLP",
                 inline=True
             )
             
-            embed_multa.add_field(
-                name="📅 FECHA",
-                value=f"**Multa emitida:** <t:{int(datetime.now().timestamp())}:F>",
+            embed_dm.add_field(
+                name="👮 Autoridad Responsable",
+                value=f"**Oficial:** {nombre_oficial}\n**Institución:** {institucion}",
                 inline=True
             )
             
-            embed_multa.add_field(
-                name="👮 OFICIAL A CARGO",
-                value=f"**Nombre:** {nombre_oficial}\n**Institución:** {institucion}\n**ID:** {interaction.user.id}",
+            embed_dm.add_field(
+                name="📋 Instrucciones",
+                value="Dirígete al canal de multas para más detalles y sigue las indicaciones de las autoridades. Si tienes dudas, contacta a un oficial en el servidor.",
                 inline=False
             )
             
-            embed_multa.set_image(url=foto_url)
-            embed_multa.set_thumbnail(url=avatar_url)
-            embed_multa.set_footer(
-                text=f"Sistema Judicial de SantiagoRP • Multa N° {multa_id:06d}",
+            embed_dm.set_thumbnail(url=foto_url)
+            embed_dm.set_footer(
+                text=f"Multa N° {multa_id:06d} • Sistema Judicial de SantiagoRP",
                 icon_url=interaction.guild.icon.url if interaction.guild.icon else None
             )
             
-            # Enviar al canal de multas
-            canal_multas_id = 1356084986918342748
-            canal_multas = interaction.guild.get_channel(canal_multas_id)
-            
-            if canal_multas:
-                await canal_multas.send(embed=embed_multa)
-                canal_nombre = canal_multas.mention
-            else:
-                canal_nombre = "canal de multas"
-                logger.error(f"No se pudo encontrar el canal de multas con ID {canal_multas_id}")
-            
-            # Enviar confirmación al oficial
-            embed_confirmacion = discord.Embed(
-                title="✅ MULTA REGISTRADA CON ÉXITO",
-                description=f"Se ha registrado la multa de {nombre} {apellido} en el sistema y publicada en {canal_nombre}.",
-                color=discord.Color.green()
-            )
-            
+            await multado.send(embed=embed_dm)
+            logger.info(f"DM de multa enviado a {multado.id}")
+        except discord.Forbidden:
+            logger.warning(f"No se pudo enviar DM al ciudadano multado {multado.id}: DMs deshabilitados")
             embed_confirmacion.add_field(
-                name="📋 Detalles",
-                value=f"**Multa N°:** {multa_id:06d}\n**Motivo:** {razon}\n**Monto:** ${monto_multa:,} CLP",
+                name="⚠️ Advertencia",
+                value="No se pudo enviar un DM al ciudadano multado (DMs deshabilitados).",
                 inline=False
             )
-            
-            embed_confirmacion.set_footer(
-                text="Sistema Judicial de SantiagoRP",
-                icon_url=interaction.guild.icon.url if interaction.guild.icon else None
-            )
-            
             await interaction.followup.send(embed=embed_confirmacion, ephemeral=True)
-            
-            # Enviar DM al ciudadano multado
-            try:
-                embed_dm = discord.Embed(
-                    title="📝 NOTIFICACIÓN DE MULTA 📝",
-                    description="**Has recibido una multa por parte de las autoridades de SantiagoRP.**\nPor favor, revisa los detalles a continuación y sigue las instrucciones proporcionadas.",
-                    color=discord.Color.gold(),
-                    timestamp=datetime.now()
-                )
-                
-                embed_dm.add_field(
-                    name="👤 Datos Personales",
-                    value=f"**Nombre:** {nombre} {apellido}\n**RUT:** {rut}",
-                    inline=True
-                )
-                
-                embed_dm.add_field(
-                    name="⚖️ Motivo de la Multa",
-                    value=f"```yaml\n{razon}\n```",
-                    inline=False
-                )
-                
-                embed_dm.add_field(
-                    name="💸 Monto",
-                    value=f"**Multa:** ${monto_multa:,} CLP",
-                    inline=True
-                )
-                
-                embed_dm.add_field(
-                    name="👮 Autoridad Responsable",
-                    value=f"**Oficial:** {nombre_oficial}\n**Institución:** {institucion}",
-                    inline=True
-                )
-                
-                embed_dm.add_field(
-                    name="📋 Instrucciones",
-                    value="Dirígete al canal de multas para más detalles y sigue las indicaciones de las autoridades. Si tienes dudas, contacta a un oficial en el servidor.",
-                    inline=False
-                )
-                
-                embed_dm.set_thumbnail(url=foto_url)
-                embed_dm.set_footer(
-                    text=f"Multa N° {multa_id:06d} • Sistema Judicial de SantiagoRP",
-                    icon_url=interaction.guild.icon.url if interaction.guild.icon else None
-                )
-                
-                await multado.send(embed=embed_dm)
-                logger.info(f"DM de multa enviado a {multado.id}")
-            except discord.Forbidden:
-                logger.warning(f"No se pudo enviar DM al ciudadano multado {multado.id}: DMs deshabilitados")
-                embed_confirmacion.add_field(
-                    name="⚠️ Advertencia",
-                    value="No se pudo enviar un DM al ciudadano multado (DMs deshabilitados).",
-                    inline=False
-                )
-                await interaction.followup.send(embed=embed_confirmacion, ephemeral=True)
-            except Exception as e:
-                logger.error(f"Error al enviar DM al ciudadano multado {multado.id}: {str(e)}")
-            
-            # Registrar en el canal de logs
-            canal_logs_id = 1363655836265877674
-            canal_logs = interaction.guild.get_channel(canal_logs_id)
-            if canal_logs:
-                log_embed = discord.Embed(
-                    title="📝 Multa Registrada",
-                    description="Se ha registrado una nueva multa en el sistema.",
-                    color=discord.Color.gold(),
-                    timestamp=datetime.now()
-                )
-                log_embed.add_field(
-                    name="Ciudadano Multado",
-                    value=f"{nombre} {apellido} ({rut})",
-                    inline=True
-                )
-                log_embed.add_field(
-                    name="Oficial",
-                    value=f"{nombre_oficial} ({institucion})",
-                    inline=True
-                )
-                log_embed.add_field(
-                    name="Motivo",
-                    value=razon,
-                    inline=False
-                )
-                log_embed.add_field(
-                    name="Monto",
-                    value=f"${monto_multa:,} CLP",
-                    inline=True
-                )
-                log_embed.set_footer(text=f"Multa N° {multa_id:06d}")
-                await canal_logs.send(embed=log_embed)
-            else:
-                logger.error(f"No se pudo encontrar el canal de logs con ID {canal_logs_id}")
+        except Exception as e:
+            logger.error(f"Error al enviar DM al ciudadano multado {multado.id}: {str(e)}")
         
-        finally:
-            cursor.close()
-            conn.close()
+        # Registrar en el canal de logs
+        canal_logs_id = 1363655836265877674
+        log_embed = discord.Embed(
+            title="📝 Multa Registrada",
+            description="Se ha registrado una nueva multa en el sistema.",
+            color=discord.Color.gold(),
+            timestamp=datetime.now()
+        )
+        log_embed.add_field(
+            name="Ciudadano Multado",
+            value=f"{nombre} {apellido} ({rut})",
+            inline=True
+        )
+        log_embed.add_field(
+            name="Oficial",
+            value=f"{nombre_oficial} ({institucion})",
+            inline=True
+        )
+        log_embed.add_field(
+            name="Motivo",
+            value=razon,
+            inline=False
+        )
+        log_embed.add_field(
+            name="Monto",
+            value=f"${monto_multa:,} CLP",
+            inline=True
+        )
+        log_embed.set_footer(text=f"Multa N° {multa_id:06d}")
+        bitacora.send(canal_logs_id, log_embed)
     
     except mysql.connector.Error as e:
         logger.error(f"Error al registrar multa en la base de datos: {e}")
@@ -3585,203 +3181,175 @@ async def slash_borrar_antecedentes(interaction: discord.Interaction, ciudadano:
     await interaction.response.defer(thinking=True)
     
     try:
-        # Iniciar conexión a la base de datos
-        conn = mysql.connector.connect(**DB_CONFIG)
-        cursor = conn.cursor(dictionary=True)
+        # Obtener la cédula y los antecedentes pendientes en una sola consulta
+        antecedentes = await repository.load_criminal_record(ciudadano.id)
+        if not antecedentes:
+            embed = discord.Embed(
+                title="📄 CÉDULA NO ENCONTRADA 📄",
+                description=f"{ciudadano.mention} no tiene cédula registrada en el sistema.",
+                color=discord.Color.orange()
+            )
+            embed.set_footer(text="Sistema de Justicia - SantiagoRP")
+            await interaction.followup.send(embed=embed, ephemeral=True)
+            return
         
-        try:
-            # Verificar cédula del ciudadano
-            cursor.execute('''
-            SELECT primer_nombre, apellido_paterno, rut, avatar_url
-            FROM cedulas WHERE user_id = %s
-            ''', (str(ciudadano.id),))
-            cedula = cursor.fetchone()
-            if not cedula:
-                embed = discord.Embed(
-                    title="📄 CÉDULA NO ENCONTRADA 📄",
-                    description=f"{ciudadano.mention} no tiene cédula registrada en el sistema.",
-                    color=discord.Color.orange()
-                )
-                embed.set_footer(text="Sistema de Justicia - SantiagoRP")
-                await interaction.followup.send(embed=embed, ephemeral=True)
-                return
-            
-            nombre = cedula['primer_nombre']
-            apellido = cedula['apellido_paterno']
-            rut = cedula['rut']
-            roblox_avatar = cedula['avatar_url']
-            
-            # Validar URL del avatar
-            default_avatar_url = "https://discord.com/assets/1f0bfc0865d324c2587920a7d80c609b.png"
-            avatar_url = None
-            if roblox_avatar and isinstance(roblox_avatar, str) and roblox_avatar.startswith(('http://', 'https://')):
-                avatar_url = roblox_avatar
-            else:
-                try:
-                    avatar_url = ciudadano.display_avatar.url if ciudadano.display_avatar else default_avatar_url
-                except Exception as e:
-                    logger.warning(f"Error al obtener display_avatar.url para el usuario {ciudadano.id}: {str(e)}")
-                    avatar_url = default_avatar_url
-            
-            if not avatar_url:
-                logger.warning(f"No se pudo determinar una URL válida para el thumbnail del usuario {ciudadano.id}")
+        cedula = antecedentes.cedula
+        nombre = cedula.primer_nombre
+        apellido = cedula.apellido_paterno
+        rut = cedula.rut
+        roblox_avatar = cedula.avatar_url
+        
+        # Validar URL del avatar
+        default_avatar_url = "https://discord.com/assets/1f0bfc0865d324c2587920a7d80c609b.png"
+        avatar_url = None
+        if roblox_avatar and isinstance(roblox_avatar, str) and roblox_avatar.startswith(('http://', 'https://')):
+            avatar_url = roblox_avatar
+        else:
+            try:
+                avatar_url = ciudadano.display_avatar.url if ciudadano.display_avatar else default_avatar_url
+            except Exception as e:
+                logger.warning(f"Error al obtener display_avatar.url para el usuario {ciudadano.id}: {str(e)}")
                 avatar_url = default_avatar_url
-            
-            # Obtener arrestos y multas antes de borrar (para el log)
-            cursor.execute('''
-            SELECT id, razon, tiempo_prision, monto_multa, fecha_arresto
-            FROM arrestos WHERE user_id = %s AND estado = 'Activo'
-            ''', (str(ciudadano.id),))
-            arrestos = cursor.fetchall()
-            
-            cursor.execute('''
-            SELECT id, razon, monto_multa, fecha_multa
-            FROM multas WHERE user_id = %s AND estado = 'Pendiente'
-            ''', (str(ciudadano.id),))
-            multas = cursor.fetchall()
-            
-            # Si no hay antecedentes, mostrar mensaje
-            if not arrestos and not multas:
-                embed = discord.Embed(
-                    title="🟢 SIN ANTECEDENTES 🟢",
-                    description=f"{ciudadano.mention} no tiene antecedentes penales para borrar.",
-                    color=discord.Color.green()
-                )
-                embed.add_field(
-                    name="👤 Ciudadano",
-                    value=f"**Nombre:** {nombre} {apellido}\n**RUT:** {rut}",
-                    inline=False
-                )
-                embed.set_thumbnail(url=avatar_url)
-                embed.set_footer(
-                    text="Sistema de Justicia - SantiagoRP",
-                    icon_url=interaction.guild.icon.url if interaction.guild.icon else None
-                )
-                await interaction.followup.send(embed=embed)
-                return
-            
-            # Borrar arrestos
-            cursor.execute('''
-            DELETE FROM arrestos WHERE user_id = %s
-            ''', (str(ciudadano.id),))
-            
-            # Borrar multas
-            cursor.execute('''
-            DELETE FROM multas WHERE user_id = %s
-            ''', (str(ciudadano.id),))
-            
-            conn.commit()
-            
-            # Crear mensaje de confirmación
+        
+        if not avatar_url:
+            logger.warning(f"No se pudo determinar una URL válida para el thumbnail del usuario {ciudadano.id}")
+            avatar_url = default_avatar_url
+        
+        # Arrestos y multas antes de borrar (para el log)
+        arrestos = antecedentes.arrestos
+        multas = antecedentes.multas
+        
+        # Si no hay antecedentes, mostrar mensaje
+        if not arrestos and not multas:
             embed = discord.Embed(
-                title="🗑️ ANTECEDENTES BORRADOS 🗑️",
-                description=f"Se han eliminado todos los antecedentes penales de {ciudadano.mention}.",
+                title="🟢 SIN ANTECEDENTES 🟢",
+                description=f"{ciudadano.mention} no tiene antecedentes penales para borrar.",
                 color=discord.Color.green()
             )
-            
             embed.add_field(
                 name="👤 Ciudadano",
-                value=f"**Nombre:** {nombre} {apellido}\n**RUT:** {rut}\n**ID:** {ciudadano.id}",
+                value=f"**Nombre:** {nombre} {apellido}\n**RUT:** {rut}",
                 inline=False
             )
-            
-            embed.add_field(
-                name="📊 Resumen",
-                value=f"**Arrestos eliminados:** {len(arrestos)}\n**Multas eliminadas:** {len(multas)}",
-                inline=True
-            )
-            
-            embed.add_field(
-                name="👮 Autoridad",
-                value=f"**Usuario:** {interaction.user.mention}\n**ID:** {interaction.user.id}",
-                inline=True
-            )
-            
             embed.set_thumbnail(url=avatar_url)
             embed.set_footer(
                 text="Sistema de Justicia - SantiagoRP",
                 icon_url=interaction.guild.icon.url if interaction.guild.icon else None
             )
-            
             await interaction.followup.send(embed=embed)
-            
-            # Enviar log al canal de logs
-            canal_logs = interaction.guild.get_channel(CANAL_LOGS_ID)
-            if canal_logs:
-                log_embed = discord.Embed(
-                    title="🗑️ Antecedentes Penales Borrados",
-                    description="Se han eliminado los antecedentes penales de un ciudadano.",
-                    color=discord.Color.orange(),
-                    timestamp=datetime.now()
-                )
-                
-                log_embed.add_field(
-                    name="👤 Ciudadano",
-                    value=f"**Nombre:** {nombre} {apellido}\n**RUT:** {rut}\n**ID:** {ciudadano.id}",
-                    inline=True
-                )
-                
-                log_embed.add_field(
-                    name="👮 Autoridad",
-                    value=f"**Usuario:** {interaction.user.mention}\n**ID:** {interaction.user.id}",
-                    inline=True
-                )
-                
-                # Detalles de arrestos eliminados
-                if arrestos:
-                    arrestos_texto = ""
-                    for arresto in arrestos:
-                        arresto_id = arresto['id']
-                        razon = arresto['razon']
-                        tiempo_prision = arresto['tiempo_prision']
-                        monto_multa = arresto['monto_multa']
-                        fecha_arresto = arresto['fecha_arresto']
-                        arrestos_texto += (
-                            f"**Expediente N° {arresto_id:06d}**\n"
-                            f"📜 Delito: {razon}\n"
-                            f"⛓️ Sentencia: {tiempo_prision}\n"
-                            f"💸 Multa: ${monto_multa:,} CLP\n"
-                            f"📅 Fecha: {fecha_arresto}\n\n"
-                        )
-                    log_embed.add_field(
-                        name="🚨 Arrestos Eliminados",
-                        value=arrestos_texto,
-                        inline=False
-                    )
-                
-                # Detalles de multas eliminadas
-                if multas:
-                    multas_texto = ""
-                    for multa in multas:
-                        multa_id = multa['id']
-                        razon = multa['razon']
-                        monto_multa = multa['monto_multa']
-                        fecha_multa = multa['fecha_multa']
-                        multas_texto += (
-                            f"**Multa N° {multa_id:06d}**\n"
-                            f"📜 Motivo: {razon}\n"
-                            f"💸 Monto: ${monto_multa:,} CLP\n"
-                            f"📅 Fecha: {fecha_multa}\n\n"
-                        )
-                    log_embed.add_field(
-                        name="📝 Multas Eliminadas",
-                        value=multas_texto,
-                        inline=False
-                    )
-                
-                log_embed.set_thumbnail(url=avatar_url)
-                log_embed.set_footer(
-                    text=f"Sistema de Justicia - SantiagoRP",
-                    icon_url=interaction.guild.icon.url if interaction.guild.icon else None
-                )
-                
-                await canal_logs.send(embed=log_embed)
-            else:
-                logger.error(f"No se pudo encontrar el canal de logs con ID {CANAL_LOGS_ID}")
+            return
+        
+        # Borrar arrestos y multas en una sola transacción
+        async with db.unit_of_work(pin=(ciudadano.id,)) as tx:
+            tx.execute('''
+            DELETE FROM arrestos WHERE user_id = %s
+            ''', (ciudadano.id,))
+            tx.execute('''
+            DELETE FROM multas WHERE user_id = %s
+            ''', (ciudadano.id,))
+        
+        # Crear mensaje de confirmación
+        embed = discord.Embed(
+            title="🗑️ ANTECEDENTES BORRADOS 🗑️",
+            description=f"Se han eliminado todos los antecedentes penales de {ciudadano.mention}.",
+            color=discord.Color.green()
+        )
+        
+        embed.add_field(
+            name="👤 Ciudadano",
+            value=f"**Nombre:** {nombre} {apellido}\n**RUT:** {rut}\n**ID:** {ciudadano.id}",
+            inline=False
+        )
+        
+        embed.add_field(
+            name="📊 Resumen",
+            value=f"**Arrestos eliminados:** {len(arrestos)}\n**Multas eliminadas:** {len(multas)}",
+            inline=True
+        )
+        
+        embed.add_field(
+            name="👮 Autoridad",
+            value=f"**Usuario:** {interaction.user.mention}\n**ID:** {interaction.user.id}",
+            inline=True
+        )
+        
+        embed.set_thumbnail(url=avatar_url)
+        embed.set_footer(
+            text="Sistema de Justicia - SantiagoRP",
+            icon_url=interaction.guild.icon.url if interaction.guild.icon else None
+        )
+        
+        await interaction.followup.send(embed=embed)
         
-        finally:
-            cursor.close()
-            conn.close()
+        # Enviar log al canal de logs
+        log_embed = discord.Embed(
+            title="🗑️ Antecedentes Penales Borrados",
+            description="Se han eliminado los antecedentes penales de un ciudadano.",
+            color=discord.Color.orange(),
+            timestamp=datetime.now()
+        )
+            
+        log_embed.add_field(
+            name="👤 Ciudadano",
+            value=f"**Nombre:** {nombre} {apellido}\n**RUT:** {rut}\n**ID:** {ciudadano.id}",
+            inline=True
+        )
+            
+        log_embed.add_field(
+            name="👮 Autoridad",
+            value=f"**Usuario:** {interaction.user.mention}\n**ID:** {interaction.user.id}",
+            inline=True
+        )
+            
+        # Detalles de arrestos eliminados
+        if arrestos:
+            arrestos_texto = ""
+            for arresto in arrestos:
+                arresto_id = arresto.id
+                razon = arresto.razon
+                tiempo_prision = arresto.tiempo_prision
+                monto_multa = arresto.monto_multa
+                fecha_arresto = arresto.fecha_arresto
+                arrestos_texto += (
+                    f"**Expediente N° {arresto_id:06d}**\n"
+                    f"📜 Delito: {razon}\n"
+                    f"⛓️ Sentencia: {tiempo_prision}\n"
+                    f"💸 Multa: ${monto_multa:,} CLP\n"
+                    f"📅 Fecha: {formatear_fecha(fecha_arresto, FORMATO_FECHA_HORA_ISO)}\n\n"
+                )
+            log_embed.add_field(
+                name="🚨 Arrestos Eliminados",
+                value=arrestos_texto,
+                inline=False
+            )
+            
+        # Detalles de multas eliminadas
+        if multas:
+            multas_texto = ""
+            for multa in multas:
+                multa_id = multa.id
+                razon = multa.razon
+                monto_multa = multa.monto_multa
+                fecha_multa = multa.fecha_multa
+                multas_texto += (
+                    f"**Multa N° {multa_id:06d}**\n"
+                    f"📜 Motivo: {razon}\n"
+                    f"💸 Monto: ${monto_multa:,} CLP\n"
+                    f"📅 Fecha: {formatear_fecha(fecha_multa, FORMATO_FECHA_HORA_ISO)}\n\n"
+                )
+            log_embed.add_field(
+                name="📝 Multas Eliminadas",
+                value=multas_texto,
+                inline=False
+            )
+            
+        log_embed.set_thumbnail(url=avatar_url)
+        log_embed.set_footer(
+            text=f"Sistema de Justicia - SantiagoRP",
+            icon_url=interaction.guild.icon.url if interaction.guild.icon else None
+        )
+            
+        bitacora.send(CANAL_LOGS_ID, log_embed)
     
     except mysql.connector.Error as e:
         logger.error(f"Error al borrar antecedentes en la base de datos: {e}")
@@ -3801,6 +3369,8 @@ async def slash_borrar_antecedentes(interaction: discord.Interaction, ciudadano:
         )
         embed.set_footer(text="Sistema de Justicia - SantiagoRP")
         await interaction.followup.send(embed=embed, ephemeral=True)
+    except db.DatabaseUnavailable:
+        raise
     except Exception as e:
         logger.error(f"Error inesperado en borrar_antecedentes: {str(e)}")
         embed = discord.Embed(
@@ -3836,189 +3406,152 @@ async def slash_ver_antecedentes(interaction: discord.Interaction, ciudadano: di
     await interaction.response.defer(thinking=True)
     
     try:
-        # Iniciar conexión a la base de datos
-        conn = mysql.connector.connect(**DB_CONFIG)
-        cursor = conn.cursor(dictionary=True)
+        # Obtener la cédula y los antecedentes pendientes en una sola consulta
+        antecedentes = await repository.load_criminal_record(ciudadano.id, replica=True)
+        if not antecedentes:
+            embed = discord.Embed(
+                title="📄 CÉDULA NO ENCONTRADA 📄",
+                description=f"{ciudadano.mention} no tiene cédula registrada en el sistema.",
+                color=discord.Color.orange()
+            )
+            embed.set_footer(text="Sistema de Justicia - SantiagoRP")
+            await interaction.followup.send(embed=embed, ephemeral=True)
+            return
         
-        try:
-            # Verificar cédula del ciudadano
-            cursor.execute('''
-            SELECT primer_nombre, apellido_paterno, rut, avatar_url
-            FROM cedulas WHERE user_id = %s
-            ''', (str(ciudadano.id),))
-            cedula = cursor.fetchone()
-            if not cedula:
-                embed = discord.Embed(
-                    title="📄 CÉDULA NO ENCONTRADA 📄",
-                    description=f"{ciudadano.mention} no tiene cédula registrada en el sistema.",
-                    color=discord.Color.orange()
-                )
-                embed.set_footer(text="Sistema de Justicia - SantiagoRP")
-                await interaction.followup.send(embed=embed, ephemeral=True)
-                return
-            
-            nombre = cedula['primer_nombre']
-            apellido = cedula['apellido_paterno']
-            rut = cedula['rut']
-            roblox_avatar = cedula['avatar_url']
-            
-            # Obtener arrestos del ciudadano
-            cursor.execute('''
-            SELECT id, razon, tiempo_prision, monto_multa, foto_url, fecha_arresto, oficial_id
-            FROM arrestos WHERE user_id = %s AND estado = 'Activo'
-            ''', (str(ciudadano.id),))
-            arrestos = cursor.fetchall()
-            
-            # Obtener multas del ciudadano
-            cursor.execute('''
-            SELECT id, razon, monto_multa, foto_url, fecha_multa, oficial_id
-            FROM multas WHERE user_id = %s AND estado = 'Pendiente'
-            ''', (str(ciudadano.id),))
-            multas = cursor.fetchall()
-            
-            # Validar URL del avatar
-            default_avatar_url = "https://discord.com/assets/1f0bfc0865d324c2587920a7d80c609b.png"
-            avatar_url = None
-            if roblox_avatar and isinstance(roblox_avatar, str) and roblox_avatar.startswith(('http://', 'https://')):
-                avatar_url = roblox_avatar
-            else:
-                try:
-                    avatar_url = ciudadano.display_avatar.url if ciudadano.display_avatar else default_avatar_url
-                except Exception as e:
-                    logger.warning(f"Error al obtener display_avatar.url para el usuario {ciudadano.id}: {str(e)}")
-                    avatar_url = default_avatar_url
-            
-            if not avatar_url:
-                logger.warning(f"No se pudo determinar una URL válida para el thumbnail del usuario {ciudadano.id}")
+        cedula = antecedentes.cedula
+        nombre = cedula.primer_nombre
+        apellido = cedula.apellido_paterno
+        rut = cedula.rut
+        roblox_avatar = cedula.avatar_url
+        
+        arrestos = antecedentes.arrestos
+        multas = antecedentes.multas
+        
+        # Validar URL del avatar
+        default_avatar_url = "https://discord.com/assets/1f0bfc0865d324c2587920a7d80c609b.png"
+        avatar_url = None
+        if roblox_avatar and isinstance(roblox_avatar, str) and roblox_avatar.startswith(('http://', 'https://')):
+            avatar_url = roblox_avatar
+        else:
+            try:
+                avatar_url = ciudadano.display_avatar.url if ciudadano.display_avatar else default_avatar_url
+            except Exception as e:
+                logger.warning(f"Error al obtener display_avatar.url para el usuario {ciudadano.id}: {str(e)}")
                 avatar_url = default_avatar_url
-            
-            # Si no hay antecedentes, mostrar mensaje
-            if not arrestos and not multas:
-                embed = discord.Embed(
-                    title="🟢 SIN ANTECEDENTES 🟢",
-                    description=f"{ciudadano.mention} no tiene antecedentes penales registrados.",
-                    color=discord.Color.green()
-                )
-                embed.add_field(
-                    name="👤 Ciudadano",
-                    value=f"**Nombre:** {nombre} {apellido}\n**RUT:** {rut}",
-                    inline=False
-                )
-                embed.set_thumbnail(url=avatar_url)
-                embed.set_footer(
-                    text="Sistema de Justicia - SantiagoRP",
-                    icon_url=interaction.guild.icon.url if interaction.guild.icon else None
-                )
-                await interaction.followup.send(embed=embed)
-                return
-            
-            # Crear embed principal
+        
+        if not avatar_url:
+            logger.warning(f"No se pudo determinar una URL válida para el thumbnail del usuario {ciudadano.id}")
+            avatar_url = default_avatar_url
+        
+        # Si no hay antecedentes, mostrar mensaje
+        if not arrestos and not multas:
             embed = discord.Embed(
-                title="📜 ANTECEDENTES PENALES 📜",
-                description=f"**Reporte completo de antecedentes para {ciudadano.mention}**",
-                color=discord.Color.purple(),
-                timestamp=datetime.now()
+                title="🟢 SIN ANTECEDENTES 🟢",
+                description=f"{ciudadano.mention} no tiene antecedentes penales registrados.",
+                color=discord.Color.green()
             )
-            
             embed.add_field(
-                name="👤 DATOS DEL CIUDADANO",
-                value=f"**Nombre:** {nombre} {apellido}\n**RUT:** {rut}\n**ID:** {ciudadano.id}",
+                name="👤 Ciudadano",
+                value=f"**Nombre:** {nombre} {apellido}\n**RUT:** {rut}",
                 inline=False
             )
-            
-            # Mostrar arrestos
-            if arrestos:
-                arrestos_texto = ""
-                for arresto in arrestos:
-                    arresto_id = arresto['id']
-                    razon = arresto['razon']
-                    tiempo_prision = arresto['tiempo_prision']
-                    monto_multa = arresto['monto_multa']
-                    foto_url = arresto['foto_url']
-                    fecha_arresto = arresto['fecha_arresto']
-                    oficial_id = arresto['oficial_id']
-                    
-                    oficial_nombre = "Oficial Desconocido"
-                    try:
-                        if oficial_id and oficial_id.isdigit():
-                            oficial = interaction.guild.get_member(int(oficial_id))
-                            oficial_nombre = oficial.display_name if oficial else "Oficial Desconocido"
-                        else:
-                            logger.warning(f"ID de oficial inválido en arresto {arresto_id}: {oficial_id}")
-                    except ValueError as e:
-                        logger.error(f"Error al convertir oficial_id en arresto {arresto_id}: {str(e)}")
-                    
-                    arrestos_texto += (
-                        f"**Expediente N° {arresto_id:06d}**\n"
-                        f"📜 **Delito:** {razon}\n"
-                        f"⛓️ **Sentencia:** {tiempo_prision}\n"
-                        f"💸 **Multa:** ${monto_multa:,} CLP\n"
-                        f"📅 **Fecha:** {fecha_arresto}\n"
-                        f"👮 **Oficial:** {oficial_nombre}\n\n"
-                    )
-                embed.add_field(
-                    name="🚨 ARRESTOS",
-                    value=arrestos_texto or "No hay arrestos registrados.",
-                    inline=False
-                )
-            else:
-                embed.add_field(
-                    name="🚨 ARRESTOS",
-                    value="No hay arrestos registrados.",
-                    inline=False
-                )
-            
-            # Mostrar multas
-            if multas:
-                multas_texto = ""
-                for multa in multas:
-                    multa_id = multa['id']
-                    razon = multa['razon']
-                    monto_multa = multa['monto_multa']
-                    foto_url = multa['foto_url']
-                    fecha_multa = multa['fecha_multa']
-                    oficial_id = multa['oficial_id']
-                    
-                    oficial_nombre = "Oficial Desconocido"
-                    try:
-                        if oficial_id and oficial_id.isdigit():
-                            oficial = interaction.guild.get_member(int(oficial_id))
-                            oficial_nombre = oficial.display_name if oficial else "Oficial Desconocido"
-                        else:
-                            logger.warning(f"ID de oficial inválido en multa {multa_id}: {oficial_id}")
-                    except ValueError as e:
-                        logger.error(f"Error al convertir oficial_id en multa {multa_id}: {str(e)}")
-                    
-                    multas_texto += (
-                        f"**Multa N° {multa_id:06d}**\n"
-                        f"📜 **Motivo:** {razon}\n"
-                        f"💸 **Monto:** ${monto_multa:,} CLP\n"
-                        f"📅 **Fecha:** {fecha_multa}\n"
-                        f"👮 **Oficial:** {oficial_nombre}\n\n"
-                    )
-                embed.add_field(
-                    name="📝 MULTAS",
-                    value=multas_texto or "No hay multas registradas.",
-                    inline=False
-                )
-            else:
-                embed.add_field(
-                    name="📝 MULTAS",
-                    value="No hay multas registradas.",
-                    inline=False
-                )
-            
             embed.set_thumbnail(url=avatar_url)
             embed.set_footer(
                 text="Sistema de Justicia - SantiagoRP",
                 icon_url=interaction.guild.icon.url if interaction.guild.icon else None
             )
-            
             await interaction.followup.send(embed=embed)
+            return
+        
+        # Crear embed principal
+        embed = discord.Embed(
+            title="📜 ANTECEDENTES PENALES 📜",
+            description=f"**Reporte completo de antecedentes para {ciudadano.mention}**",
+            color=discord.Color.purple(),
+            timestamp=datetime.now()
+        )
+        
+        embed.add_field(
+            name="👤 DATOS DEL CIUDADANO",
+            value=f"**Nombre:** {nombre} {apellido}\n**RUT:** {rut}\n**ID:** {ciudadano.id}",
+            inline=False
+        )
+        
+        # Mostrar arrestos
+        if arrestos:
+            arrestos_texto = ""
+            for arresto in arrestos:
+                arresto_id = arresto.id
+                razon = arresto.razon
+                tiempo_prision = arresto.tiempo_prision
+                monto_multa = arresto.monto_multa
+                foto_url = arresto.foto_url
+                fecha_arresto = arresto.fecha_arresto
+                oficial_id = arresto.oficial_id
+                
+                oficial = interaction.guild.get_member(oficial_id)
+                oficial_nombre = oficial.display_name if oficial else "Oficial Desconocido"
+                
+                arrestos_texto += (
+                    f"**Expediente N° {arresto_id:06d}**\n"
+                    f"📜 **Delito:** {razon}\n"
+                    f"⛓️ **Sentencia:** {tiempo_prision}\n"
+                    f"💸 **Multa:** ${monto_multa:,} CLP\n"
+                    f"📅 **Fecha:** {formatear_fecha(fecha_arresto, FORMATO_FECHA_HORA_ISO)}\n"
+                    f"👮 **Oficial:** {oficial_nombre}\n\n"
+                )
+            embed.add_field(
+                name="🚨 ARRESTOS",
+                value=arrestos_texto or "No hay arrestos registrados.",
+                inline=False
+            )
+        else:
+            embed.add_field(
+                name="🚨 ARRESTOS",
+                value="No hay arrestos registrados.",
+                inline=False
+            )
+        
+        # Mostrar multas
+        if multas:
+            multas_texto = ""
+            for multa in multas:
+                multa_id = multa.id
+                razon = multa.razon
+                monto_multa = multa.monto_multa
+                foto_url = multa.foto_url
+                fecha_multa = multa.fecha_multa
+                oficial_id = multa.oficial_id
+                
+                oficial = interaction.guild.get_member(oficial_id)
+                oficial_nombre = oficial.display_name if oficial else "Oficial Desconocido"
+                
+                multas_texto += (
+                    f"**Multa N° {multa_id:06d}**\n"
+                    f"📜 **Motivo:** {razon}\n"
+                    f"💸 **Monto:** ${monto_multa:,} CLP\n"
+                    f"📅 **Fecha:** {formatear_fecha(fecha_multa, FORMATO_FECHA_HORA_ISO)}\n"
+                    f"👮 **Oficial:** {oficial_nombre}\n\n"
+                )
+            embed.add_field(
+                name="📝 MULTAS",
+                value=multas_texto or "No hay multas registradas.",
+                inline=False
+            )
+        else:
+            embed.add_field(
+                name="📝 MULTAS",
+                value="No hay multas registradas.",
+                inline=False
+            )
+        
+        embed.set_thumbnail(url=avatar_url)
+        embed.set_footer(
+            text="Sistema de Justicia - SantiagoRP",
+            icon_url=interaction.guild.icon.url if interaction.guild.icon else None
+        )
         
-        finally:
-            cursor.close()
-            conn.close()
+        await interaction.followup.send(embed=embed)
     
     except mysql.connector.Error as e:
         logger.error(f"Error al consultar antecedentes en la base de datos: {e}")
@@ -4038,6 +3571,8 @@ async def slash_ver_antecedentes(interaction: discord.Interaction, ciudadano: di
         )
         embed.set_footer(text="Sistema de Justicia - SantiagoRP")
         await interaction.followup.send(embed=embed, ephemeral=True)
+    except db.DatabaseUnavailable:
+        raise
     except Exception as e:
         logger.error(f"Error inesperado en ver_antecedentes: {str(e)}")
         embed = discord.Embed(
@@ -4217,5 +3752,109 @@ async def slash_ayuda(interaction: discord.Interaction):
     # Enviar mensaje
     await interaction.response.send_message(embed=embed, ephemeral=True)
 
+# Máximo de caracteres de un embed completo (título, descripción, campos y pie) según Discord
+LIMITE_CARACTERES_EMBED = 6000
+AVISO_CONSULTAS_OMITIDAS = "\n⚠️ {} consultas más no caben en el mensaje; pide menos o sin EXPLAIN."
+
+
+def recortar_texto(texto, limite):
+    """``texto`` con a lo sumo ``limite`` caracteres, terminado en "..." si se recortó."""
+    return texto if len(texto) <= limite else texto[:limite - 3] + "..."
+
+
+@bot.tree.command(name="top-consultas", description="Muestra las consultas SQL más costosas del bot (solo staff)")
+@app_commands.describe(
+    cantidad="Cantidad de consultas a mostrar (1 a 10)",
+    orden="Criterio para ordenar las consultas",
+    explain="Incluir el plan de ejecución (EXPLAIN) de cada consulta"
+)
+@app_commands.choices(orden=[
+    app_commands.Choice(name="Tiempo total", value="total_ms"),
+    app_commands.Choice(name="Tiempo promedio", value="avg_ms"),
+    app_commands.Choice(name="Percentil 95", value="p95_ms"),
+    app_commands.Choice(name="Cantidad de ejecuciones", value="count")
+])
+async def slash_top_consultas(interaction: discord.Interaction, cantidad: int = 5,
+                              orden: str = "total_ms", explain: bool = False):
+    """Reporte de las consultas más costosas para ajustar índices con datos reales"""
+    ROLES_AUTORIZADOS = [
+        1339386615235346439,
+        1347803116741066834,
+        1339386615222767662,
+        1346545514492985486,
+        1339386615247798362
+    ]
+    if not any(role.id in ROLES_AUTORIZADOS for role in interaction.user.roles):
+        embed = discord.Embed(
+            title="❌ Sin permisos",
+            description="No tienes permiso para ver las estadísticas de la base de datos.",
+            color=discord.Color.red()
+        )
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+        return
+    
+    await interaction.response.defer(ephemeral=True)
+    cantidad = max(1, min(cantidad, 10))
+    
+    if explain:
+        reporte = await db.explain_slowest(cantidad, orden)
+    else:
+        reporte = [(consulta, None) for consulta in query_stats.top(cantidad, orden)]
+    
+    embed = discord.Embed(
+        title="📊 Consultas SQL más costosas",
+        description=f"Umbral de consulta lenta: {query_stats.slow_threshold * 1000:.0f} ms",
+        color=discord.Color.blue()
+    )
+    if not reporte:
+        embed.description += "\nTodavía no hay consultas registradas."
+    
+    # Las búsquedas puntuales que resuelve la caché de entidades no llegan a esta lista
+    cache_entidades = "\n".join(
+        f"**{nombre}:** {datos['hits']} aciertos · {datos['misses']} fallos ({datos['hit_rate']:.0%}) · {datos['size']} en memoria"
+        for nombre, datos in entity_cache.stats().items()
+    )
+    pie = f"Caché de sentencias preparadas: {db.statement_cache_stats()['hit_rate']:.0%} de aciertos"
+    # Lo que queda del límite de Discord para todo el embed tras las partes fijas (y el aviso de omitidas)
+    disponible = (
+        LIMITE_CARACTERES_EMBED - len(embed.title) - len(embed.description) - len(pie)
+        - len("Caché de entidades") - len(cache_entidades) - len(AVISO_CONSULTAS_OMITIDAS.format(cantidad))
+    )
+    omitidas = 0
+    for posicion, (consulta, plan) in enumerate(reporte, start=1):
+        detalle = (
+            f"**Llamadas:** {consulta['count']} · **Total:** {consulta['total_ms']:.0f} ms\n"
+            f"**Promedio:** {consulta['avg_ms']:.1f} ms · **p95:** {consulta['p95_ms']:.1f} ms · **Máx:** {consulta['max_ms']:.1f} ms"
+        )
+        if consulta['errors']:
+            detalle += f"\n⚠️ **Terminaron en error:** {consulta['errors']}"
+        if isinstance(plan, list):
+            for fila in plan[:3]:
+                if 'detail' in fila:
+                    # EXPLAIN QUERY PLAN de SQLite trae el plan en una sola columna de texto
+                    detalle += f"\n🔎 {recortar_texto(str(fila['detail']), 200)}"
+                    continue
+                detalle += "\n🔎 " + recortar_texto(
+                    f"`{fila.get('table')}` tipo={fila.get('type')} índice={fila.get('key') or '—'} "
+                    f"filas={fila.get('rows')} {fila.get('Extra') or ''}", 200
+                )
+        elif plan:
+            detalle += f"\n🔎 EXPLAIN falló: {recortar_texto(str(plan), 200)}"
+        # El SQL se recorta antes de armar el bloque para no cortar el cierre del ```
+        espacio_sql = min(400, 1024 - len("```sql\n\n```") - len(detalle))
+        valor = f"```sql\n{recortar_texto(consulta['sql'], espacio_sql)}\n```" + detalle
+        nombre = f"#{posicion}"
+        if len(nombre) + len(valor) > disponible:
+            omitidas = len(reporte) - posicion + 1
+            break
+        disponible -= len(nombre) + len(valor)
+        embed.add_field(name=nombre, value=valor, inline=False)
+    if omitidas:
+        embed.description += AVISO_CONSULTAS_OMITIDAS.format(omitidas)
+    
+    embed.add_field(name="Caché de entidades", value=cache_entidades, inline=False)
+    embed.set_footer(text=pie)
+    await interaction.followup.send(embed=embed, ephemeral=True)
+
 # Iniciar el bot
 bot.run(TOKEN)
@@ -0,0 +1,123 @@
+-- Esquema inicial: las tablas que antes creaba init_db en cada on_ready.
+-- Usa IF NOT EXISTS para que las bases de datos existentes lo adopten sin cambios.
+
+CREATE TABLE IF NOT EXISTS users (
+    user_id BIGINT PRIMARY KEY,
+    username TEXT NOT NULL,
+    points INTEGER DEFAULT 0,
+    last_daily TEXT
+) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS guild_settings (
+    guild_id BIGINT PRIMARY KEY,
+    prefix VARCHAR(10) DEFAULT '!',
+    welcome_channel_id BIGINT,
+    welcome_message TEXT
+) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS cedulas (
+    user_id BIGINT PRIMARY KEY,
+    rut VARCHAR(20) NOT NULL UNIQUE,
+    primer_nombre TEXT NOT NULL,
+    segundo_nombre TEXT NOT NULL,
+    apellido_paterno TEXT NOT NULL,
+    apellido_materno TEXT NOT NULL,
+    fecha_nacimiento TEXT NOT NULL,
+    edad INTEGER NOT NULL,
+    nacionalidad TEXT NOT NULL,
+    genero TEXT NOT NULL,
+    usuario_roblox TEXT NOT NULL,
+    fecha_emision TEXT NOT NULL,
+    fecha_vencimiento TEXT NOT NULL,
+    avatar_url TEXT
+) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS licencias (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id BIGINT NOT NULL,
+    tipo_licencia TEXT NOT NULL,
+    nombre_licencia TEXT NOT NULL,
+    fecha_emision TEXT NOT NULL,
+    fecha_vencimiento TEXT NOT NULL,
+    emitida_por BIGINT NOT NULL,
+    FOREIGN KEY (user_id) REFERENCES cedulas(user_id)
+) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS vehiculos (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id BIGINT NOT NULL,
+    placa VARCHAR(20) NOT NULL UNIQUE,
+    modelo TEXT NOT NULL,
+    marca TEXT NOT NULL,
+    gama TEXT NOT NULL,
+    anio INTEGER NOT NULL,
+    color TEXT NOT NULL,
+    revision_tecnica TEXT NOT NULL,
+    permiso_circulacion TEXT NOT NULL,
+    codigo_pago TEXT NOT NULL,
+    imagen_url TEXT NOT NULL,
+    fecha_registro TEXT NOT NULL,
+    registrado_por BIGINT NOT NULL,
+    FOREIGN KEY (user_id) REFERENCES cedulas(user_id)
+) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS payment_codes (
+    code VARCHAR(50) PRIMARY KEY,
+    amount BIGINT UNSIGNED NOT NULL,
+    description TEXT NOT NULL,
+    user_id BIGINT NOT NULL,
+    used BOOLEAN DEFAULT FALSE,
+    created_at TEXT NOT NULL,
+    used_at TEXT,
+    created_by BIGINT NOT NULL,
+    FOREIGN KEY (user_id) REFERENCES cedulas(user_id)
+) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS propiedades (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id BIGINT NOT NULL,
+    numero_domicilio VARCHAR(30) NOT NULL UNIQUE,
+    zona TEXT NOT NULL,
+    color TEXT NOT NULL,
+    numero_pisos INTEGER NOT NULL,
+    codigo_pago TEXT NOT NULL,
+    imagen_url TEXT NOT NULL,
+    fecha_registro TEXT NOT NULL,
+    registrado_por BIGINT NOT NULL,
+    FOREIGN KEY (user_id) REFERENCES cedulas(user_id)
+) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS arrestos (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    rut TEXT NOT NULL,
+    razon TEXT NOT NULL,
+    tiempo_prision TEXT NOT NULL,
+    monto_multa INTEGER NOT NULL,
+    foto_url TEXT NOT NULL,
+    fecha_arresto TEXT NOT NULL,
+    oficial_id TEXT NOT NULL,
+    estado VARCHAR(20) DEFAULT 'Activo'
+) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS multas (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    rut TEXT NOT NULL,
+    razon TEXT NOT NULL,
+    monto_multa INTEGER NOT NULL,
+    foto_url TEXT NOT NULL,
+    fecha_multa TEXT NOT NULL,
+    oficial_id TEXT NOT NULL,
+    estado VARCHAR(20) DEFAULT 'Pendiente'
+) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS emergencias (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id BIGINT,
+    razon TEXT,
+    servicio TEXT,
+    ubicacion TEXT,
+    fecha TEXT,
+    servicios_notificados TEXT
+) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;
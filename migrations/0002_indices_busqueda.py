@@ -0,0 +1,24 @@
+"""Índices secundarios para las columnas por las que filtran los comandos.
+
+Las columnas TEXT (tipo_licencia y el user_id de arrestos y multas) solo admiten
+índices con largo de prefijo.
+"""
+from schema import create_index_if_missing
+
+INDICES = [
+    ('licencias', 'idx_licencias_user_tipo', 'user_id, tipo_licencia(10)'),
+    ('arrestos', 'idx_arrestos_user_estado', 'user_id(20), estado'),
+    ('multas', 'idx_multas_user_estado', 'user_id(20), estado'),
+    ('payment_codes', 'idx_payment_codes_user_used', 'user_id, used'),
+    ('propiedades', 'idx_propiedades_user_domicilio', 'user_id, numero_domicilio'),
+    ('vehiculos', 'idx_vehiculos_user', 'user_id'),
+]
+
+
+def upgrade(conn):
+    cursor = conn.cursor()
+    try:
+        for table, name, columns in INDICES:
+            create_index_if_missing(cursor, table, name, columns)
+    finally:
+        cursor.close()
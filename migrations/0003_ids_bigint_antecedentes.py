@@ -0,0 +1,54 @@
+"""Convierte user_id y oficial_id de arrestos y multas de TEXT a BIGINT sin bloquear las tablas.
+
+1. Agrega columnas BIGINT auxiliares (operación en línea).
+2. Las rellena por tramos de la clave primaria; se puede retomar si se corta.
+3. Reemplaza las columnas TEXT por las nuevas y recrea el índice (user_id, estado)
+   sin prefijo, en un solo ALTER en línea.
+"""
+from schema import MigrationError, backfill_in_chunks, column_type, index_columns
+
+# Tabla -> columna tras la que va oficial_id (para conservar el orden original)
+TABLAS = {
+    'arrestos': 'fecha_arresto',
+    'multas': 'fecha_multa',
+}
+
+
+def _a_bigint(columna):
+    # Los valores que no son un ID numérico quedan en NULL y se reportan antes del cambio
+    return f"CASE WHEN {columna} REGEXP '^[0-9]+$' THEN CAST({columna} AS UNSIGNED) END"
+
+
+def _convertir(conn, cursor, tabla, columna_previa):
+    if column_type(cursor, tabla, 'user_id') == 'bigint':
+        return
+    if column_type(cursor, tabla, 'user_id_num') is None:
+        cursor.execute(f'ALTER TABLE {tabla} ADD COLUMN user_id_num BIGINT NULL, ADD COLUMN oficial_id_num BIGINT NULL')
+
+    asignaciones = f"user_id_num = {_a_bigint('user_id')}, oficial_id_num = {_a_bigint('oficial_id')}"
+    backfill_in_chunks(conn, tabla, asignaciones, 'user_id_num IS NULL OR oficial_id_num IS NULL')
+
+    cursor.execute(f'SELECT COUNT(*) FROM {tabla} WHERE user_id_num IS NULL OR oficial_id_num IS NULL')
+    invalidas = cursor.fetchone()[0]
+    if invalidas:
+        raise MigrationError(f"{tabla} tiene {invalidas} filas con user_id u oficial_id no numérico; corrígelas y reinicia")
+
+    indice = f'idx_{tabla}_user_estado'
+    quitar_indice = f'DROP INDEX {indice}, ' if index_columns(cursor, tabla, indice) else ''
+    cursor.execute(f'''
+    ALTER TABLE {tabla}
+        {quitar_indice}DROP COLUMN user_id, DROP COLUMN oficial_id,
+        CHANGE COLUMN user_id_num user_id BIGINT NOT NULL AFTER id,
+        CHANGE COLUMN oficial_id_num oficial_id BIGINT NOT NULL AFTER {columna_previa},
+        ADD INDEX {indice} (user_id, estado),
+        ALGORITHM=INPLACE, LOCK=NONE
+    ''')
+
+
+def upgrade(conn):
+    cursor = conn.cursor()
+    try:
+        for tabla, columna_previa in TABLAS.items():
+            _convertir(conn, cursor, tabla, columna_previa)
+    finally:
+        cursor.close()
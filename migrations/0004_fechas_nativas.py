@@ -0,0 +1,89 @@
+"""Convierte las fechas guardadas como texto a columnas DATE/DATETIME.
+
+Sigue el mismo esquema en línea que 0003: columna auxiliar, backfill por tramos
+(se puede retomar) y un solo ALTER que reemplaza la columna de texto. Acepta
+los dos formatos que han usado los comandos: ``%d/%m/%Y[ %H:%M:%S]`` y
+``%Y-%m-%d[ %H:%M:%S]``.
+"""
+from schema import MigrationError, backfill_in_chunks, column_type, create_index_if_missing
+
+# (tabla, columna, tipo, admite NULL)
+COLUMNAS = [
+    ('cedulas', 'fecha_emision', 'DATE', False),
+    ('cedulas', 'fecha_vencimiento', 'DATE', False),
+    ('licencias', 'fecha_emision', 'DATE', False),
+    ('licencias', 'fecha_vencimiento', 'DATE', False),
+    ('vehiculos', 'fecha_registro', 'DATE', False),
+    ('propiedades', 'fecha_registro', 'DATE', False),
+    ('arrestos', 'fecha_arresto', 'DATETIME', False),
+    ('multas', 'fecha_multa', 'DATETIME', False),
+    ('payment_codes', 'created_at', 'DATETIME', False),
+    ('payment_codes', 'used_at', 'DATETIME', True),
+]
+
+# Índices para las búsquedas por rango (licencias por vencer, arrestos del día, etc.)
+INDICES = [
+    ('licencias', 'idx_licencias_vencimiento', 'fecha_vencimiento'),
+    ('arrestos', 'idx_arrestos_fecha', 'fecha_arresto'),
+    ('multas', 'idx_multas_fecha', 'fecha_multa'),
+    ('payment_codes', 'idx_payment_codes_created', 'created_at'),
+]
+
+
+def _a_fecha(columna):
+    # %T equivale a %H:%i:%s (se evita "%s" porque el conector lo toma como parámetro)
+    return f"""CASE
+        WHEN {columna} REGEXP '^[0-9]{{2}}/[0-9]{{2}}/[0-9]{{4}} [0-9]{{2}}:[0-9]{{2}}:[0-9]{{2}}$' THEN STR_TO_DATE({columna}, '%d/%m/%Y %T')
+        WHEN {columna} REGEXP '^[0-9]{{2}}/[0-9]{{2}}/[0-9]{{4}}$' THEN STR_TO_DATE({columna}, '%d/%m/%Y')
+        WHEN {columna} REGEXP '^[0-9]{{4}}-[0-9]{{2}}-[0-9]{{2}} [0-9]{{2}}:[0-9]{{2}}:[0-9]{{2}}$' THEN STR_TO_DATE({columna}, '%Y-%m-%d %T')
+        WHEN {columna} REGEXP '^[0-9]{{4}}-[0-9]{{2}}-[0-9]{{2}}$' THEN STR_TO_DATE({columna}, '%Y-%m-%d')
+    END"""
+
+
+def _columna_anterior(cursor, tabla, columna):
+    cursor.execute('''
+    SELECT COLUMN_NAME FROM information_schema.COLUMNS
+    WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+      AND ORDINAL_POSITION < (
+          SELECT ORDINAL_POSITION FROM information_schema.COLUMNS
+          WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+      )
+    ORDER BY ORDINAL_POSITION DESC LIMIT 1
+    ''', (tabla, tabla, columna))
+    return cursor.fetchone()[0]
+
+
+def _convertir(conn, cursor, tabla, columna, tipo, nullable):
+    if column_type(cursor, tabla, columna) == tipo.lower():
+        return
+    auxiliar = f'{columna}_nueva'
+    if column_type(cursor, tabla, auxiliar) is None:
+        cursor.execute(f'ALTER TABLE {tabla} ADD COLUMN {auxiliar} {tipo} NULL')
+
+    backfill_in_chunks(conn, tabla, f'{auxiliar} = {_a_fecha(columna)}',
+                       f'{auxiliar} IS NULL AND {columna} IS NOT NULL')
+
+    cursor.execute(f'SELECT COUNT(*) FROM {tabla} WHERE {auxiliar} IS NULL AND {columna} IS NOT NULL')
+    invalidas = cursor.fetchone()[0]
+    if invalidas:
+        raise MigrationError(f"{tabla}.{columna} tiene {invalidas} fechas con formato desconocido; corrígelas y reinicia")
+
+    # La columna auxiliar quedó al final de la tabla; se mueve al lugar de la original
+    anterior = _columna_anterior(cursor, tabla, columna)
+    cursor.execute(f'''
+    ALTER TABLE {tabla}
+        DROP COLUMN {columna},
+        CHANGE COLUMN {auxiliar} {columna} {tipo} {'NULL' if nullable else 'NOT NULL'} AFTER {anterior},
+        ALGORITHM=INPLACE, LOCK=NONE
+    ''')
+
+
+def upgrade(conn):
+    cursor = conn.cursor()
+    try:
+        for tabla, columna, tipo, nullable in COLUMNAS:
+            _convertir(conn, cursor, tabla, columna, tipo, nullable)
+        for tabla, nombre, columnas in INDICES:
+            create_index_if_missing(cursor, tabla, nombre, columnas)
+    finally:
+        cursor.close()
@@ -0,0 +1,9 @@
+-- Caché persistente de avatares de Roblox: nombre de usuario -> ID -> URL del rostro.
+-- roblox_user_id NULL significa que el usuario no existe (caché negativa).
+
+CREATE TABLE IF NOT EXISTS roblox_avatares (
+    username VARCHAR(50) PRIMARY KEY,
+    roblox_user_id BIGINT NULL,
+    avatar_url TEXT NULL,
+    refreshed_at DATETIME NOT NULL
+) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;
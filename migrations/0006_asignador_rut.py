@@ -0,0 +1,25 @@
+"""Contador persistente y clave de la permutación con que se asignan los RUT (ver ``rut_allocator``).
+
+La clave se genera una sola vez aquí: si cambiara, el contador podría volver a
+entregar RUT ya asignados.
+"""
+import secrets
+
+
+def upgrade(conn):
+    cursor = conn.cursor()
+    try:
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS rut_asignador (
+            id TINYINT PRIMARY KEY,
+            siguiente BIGINT NOT NULL,
+            clave CHAR(64) NOT NULL
+        ) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci
+        ''')
+        # Se puede reintentar: la fila solo se crea si falta
+        cursor.execute('SELECT COUNT(*) FROM rut_asignador')
+        if cursor.fetchone()[0] == 0:
+            cursor.execute('INSERT INTO rut_asignador (id, siguiente, clave) VALUES (1, 0, %s)',
+                           (secrets.token_hex(32),))
+    finally:
+        cursor.close()
@@ -0,0 +1,136 @@
+-- Esquema completo para el backend SQLite.
+-- Equivale al resultado de las migraciones 0001 a 0004 de MySQL: IDs BIGINT,
+-- fechas DATE/DATETIME e índices de búsqueda. Los tipos DATE y DATETIME se
+-- declaran así para que sqlite3 los devuelva como date/datetime.
+
+CREATE TABLE IF NOT EXISTS users (
+    user_id BIGINT PRIMARY KEY,
+    username TEXT NOT NULL,
+    points INTEGER DEFAULT 0,
+    last_daily TEXT
+);
+
+CREATE TABLE IF NOT EXISTS guild_settings (
+    guild_id BIGINT PRIMARY KEY,
+    prefix VARCHAR(10) DEFAULT '!',
+    welcome_channel_id BIGINT,
+    welcome_message TEXT
+);
+
+CREATE TABLE IF NOT EXISTS cedulas (
+    user_id BIGINT PRIMARY KEY,
+    rut VARCHAR(20) NOT NULL UNIQUE,
+    primer_nombre TEXT NOT NULL,
+    segundo_nombre TEXT NOT NULL,
+    apellido_paterno TEXT NOT NULL,
+    apellido_materno TEXT NOT NULL,
+    fecha_nacimiento TEXT NOT NULL,
+    edad INTEGER NOT NULL,
+    nacionalidad TEXT NOT NULL,
+    genero TEXT NOT NULL,
+    usuario_roblox TEXT NOT NULL,
+    fecha_emision DATE NOT NULL,
+    fecha_vencimiento DATE NOT NULL,
+    avatar_url TEXT
+);
+
+CREATE TABLE IF NOT EXISTS licencias (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id BIGINT NOT NULL,
+    tipo_licencia TEXT NOT NULL,
+    nombre_licencia TEXT NOT NULL,
+    fecha_emision DATE NOT NULL,
+    fecha_vencimiento DATE NOT NULL,
+    emitida_por BIGINT NOT NULL,
+    FOREIGN KEY (user_id) REFERENCES cedulas(user_id)
+);
+
+CREATE TABLE IF NOT EXISTS vehiculos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id BIGINT NOT NULL,
+    placa VARCHAR(20) NOT NULL UNIQUE,
+    modelo TEXT NOT NULL,
+    marca TEXT NOT NULL,
+    gama TEXT NOT NULL,
+    anio INTEGER NOT NULL,
+    color TEXT NOT NULL,
+    revision_tecnica TEXT NOT NULL,
+    permiso_circulacion TEXT NOT NULL,
+    codigo_pago TEXT NOT NULL,
+    imagen_url TEXT NOT NULL,
+    fecha_registro DATE NOT NULL,
+    registrado_por BIGINT NOT NULL,
+    FOREIGN KEY (user_id) REFERENCES cedulas(user_id)
+);
+
+CREATE TABLE IF NOT EXISTS payment_codes (
+    code VARCHAR(50) PRIMARY KEY,
+    amount BIGINT NOT NULL CHECK (amount >= 0),
+    description TEXT NOT NULL,
+    user_id BIGINT NOT NULL,
+    used BOOLEAN DEFAULT FALSE,
+    created_at DATETIME NOT NULL,
+    used_at DATETIME,
+    created_by BIGINT NOT NULL,
+    FOREIGN KEY (user_id) REFERENCES cedulas(user_id)
+);
+
+CREATE TABLE IF NOT EXISTS propiedades (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id BIGINT NOT NULL,
+    numero_domicilio VARCHAR(30) NOT NULL UNIQUE,
+    zona TEXT NOT NULL,
+    color TEXT NOT NULL,
+    numero_pisos INTEGER NOT NULL,
+    codigo_pago TEXT NOT NULL,
+    imagen_url TEXT NOT NULL,
+    fecha_registro DATE NOT NULL,
+    registrado_por BIGINT NOT NULL,
+    FOREIGN KEY (user_id) REFERENCES cedulas(user_id)
+);
+
+CREATE TABLE IF NOT EXISTS arrestos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id BIGINT NOT NULL,
+    rut TEXT NOT NULL,
+    razon TEXT NOT NULL,
+    tiempo_prision TEXT NOT NULL,
+    monto_multa INTEGER NOT NULL,
+    foto_url TEXT NOT NULL,
+    fecha_arresto DATETIME NOT NULL,
+    oficial_id BIGINT NOT NULL,
+    estado VARCHAR(20) DEFAULT 'Activo'
+);
+
+CREATE TABLE IF NOT EXISTS multas (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id BIGINT NOT NULL,
+    rut TEXT NOT NULL,
+    razon TEXT NOT NULL,
+    monto_multa INTEGER NOT NULL,
+    foto_url TEXT NOT NULL,
+    fecha_multa DATETIME NOT NULL,
+    oficial_id BIGINT NOT NULL,
+    estado VARCHAR(20) DEFAULT 'Pendiente'
+);
+
+CREATE TABLE IF NOT EXISTS emergencias (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id BIGINT,
+    razon TEXT,
+    servicio TEXT,
+    ubicacion TEXT,
+    fecha TEXT,
+    servicios_notificados TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_licencias_user_tipo ON licencias (user_id, tipo_licencia);
+CREATE INDEX IF NOT EXISTS idx_arrestos_user_estado ON arrestos (user_id, estado);
+CREATE INDEX IF NOT EXISTS idx_multas_user_estado ON multas (user_id, estado);
+CREATE INDEX IF NOT EXISTS idx_payment_codes_user_used ON payment_codes (user_id, used);
+CREATE INDEX IF NOT EXISTS idx_propiedades_user_domicilio ON propiedades (user_id, numero_domicilio);
+CREATE INDEX IF NOT EXISTS idx_vehiculos_user ON vehiculos (user_id);
+CREATE INDEX IF NOT EXISTS idx_licencias_vencimiento ON licencias (fecha_vencimiento);
+CREATE INDEX IF NOT EXISTS idx_arrestos_fecha ON arrestos (fecha_arresto);
+CREATE INDEX IF NOT EXISTS idx_multas_fecha ON multas (fecha_multa);
+CREATE INDEX IF NOT EXISTS idx_payment_codes_created ON payment_codes (created_at);
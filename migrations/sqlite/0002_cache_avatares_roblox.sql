@@ -0,0 +1,8 @@
+-- Caché persistente de avatares de Roblox (equivale a la migración 0005 de MySQL).
+
+CREATE TABLE IF NOT EXISTS roblox_avatares (
+    username VARCHAR(50) PRIMARY KEY,
+    roblox_user_id BIGINT,
+    avatar_url TEXT,
+    refreshed_at DATETIME NOT NULL
+);
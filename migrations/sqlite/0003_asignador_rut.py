@@ -0,0 +1,20 @@
+"""Contador y clave de la asignación de RUT (equivale a la migración 0006 de MySQL)."""
+import secrets
+
+
+def upgrade(conn):
+    cursor = conn.cursor()
+    try:
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS rut_asignador (
+            id INTEGER PRIMARY KEY,
+            siguiente BIGINT NOT NULL,
+            clave CHAR(64) NOT NULL
+        )
+        ''')
+        cursor.execute('SELECT COUNT(*) FROM rut_asignador')
+        if cursor.fetchone()[0] == 0:
+            cursor.execute('INSERT INTO rut_asignador (id, siguiente, clave) VALUES (1, 0, %s)',
+                           (secrets.token_hex(32),))
+    finally:
+        cursor.close()
@@ -0,0 +1,118 @@
+"""Filas de las tablas principales como objetos compactos con ``__slots__``.
+
+Las consultas de entidades leen con cursores de tuplas (``db.fetch_one(..., row=...)``)
+y arman estos objetos por posición, sin crear un diccionario por fila ni repetir
+las claves. El orden de ``__slots__`` es el orden de las columnas de ``columns()``,
+y el primer campo es siempre la clave primaria. Los campos con pocos valores
+distintos (``interned``) se internan para que todas las filas compartan la misma
+cadena en memoria.
+"""
+import sys
+
+
+class Model:
+    """Base de las filas: construcción por posición, comparación y ``as_dict``."""
+
+    __slots__ = ()
+    interned = ()  # Campos de texto repetitivos que se internan
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._interned_positions = tuple(
+            i for i, name in enumerate(cls.__slots__) if name in cls.interned
+        )
+
+    def __init__(self, *values):
+        if len(values) != len(self.__slots__):
+            raise TypeError(f"{type(self).__name__} espera {len(self.__slots__)} valores, se recibieron {len(values)}")
+        for name, value in zip(self.__slots__, values):
+            setattr(self, name, value)
+
+    @classmethod
+    def columns(cls, alias=None):
+        """Lista SQL de las columnas en el orden de ``__slots__`` (con prefijo ``alias.``)."""
+        prefix = f'{alias}.' if alias else ''
+        return ', '.join(prefix + name for name in cls.__slots__)
+
+    @classmethod
+    def from_values(cls, values, start=0):
+        """Arma la fila desde ``values[start:]``; None si la clave primaria es NULL (LEFT JOIN sin coincidencia)."""
+        fields = list(values[start:start + len(cls.__slots__)])
+        if fields[0] is None:
+            return None
+        for i in cls._interned_positions:
+            if isinstance(fields[i], str):
+                fields[i] = sys.intern(fields[i])
+        return cls(*fields)
+
+    @classmethod
+    def from_row(cls, values):
+        """Fábrica para ``db.fetch_one``/``db.fetch_all`` cuando la consulta trae solo esta tabla."""
+        return cls.from_values(values)
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.__slots__[0]}={getattr(self, self.__slots__[0])!r})"
+
+
+class Cedula(Model):
+    __slots__ = ('user_id', 'rut', 'primer_nombre', 'segundo_nombre', 'apellido_paterno',
+                 'apellido_materno', 'fecha_nacimiento', 'edad', 'nacionalidad', 'genero',
+                 'usuario_roblox', 'fecha_emision', 'fecha_vencimiento', 'avatar_url')
+    interned = ('nacionalidad', 'genero')
+
+
+class Licencia(Model):
+    __slots__ = ('id', 'user_id', 'tipo_licencia', 'nombre_licencia', 'fecha_emision',
+                 'fecha_vencimiento', 'emitida_por')
+    interned = ('tipo_licencia', 'nombre_licencia')
+
+
+class Vehiculo(Model):
+    __slots__ = ('id', 'user_id', 'placa', 'modelo', 'marca', 'gama', 'anio', 'color',
+                 'revision_tecnica', 'permiso_circulacion', 'codigo_pago', 'imagen_url',
+                 'fecha_registro', 'registrado_por')
+    interned = ('marca', 'gama', 'color', 'revision_tecnica', 'permiso_circulacion')
+
+
+class Propiedad(Model):
+    __slots__ = ('id', 'user_id', 'numero_domicilio', 'zona', 'color', 'numero_pisos',
+                 'codigo_pago', 'imagen_url', 'fecha_registro', 'registrado_por')
+    interned = ('zona', 'color')
+
+
+class Arresto(Model):
+    __slots__ = ('id', 'user_id', 'rut', 'razon', 'tiempo_prision', 'monto_multa', 'foto_url',
+                 'fecha_arresto', 'oficial_id', 'estado')
+    interned = ('tiempo_prision', 'estado')
+
+
+class Multa(Model):
+    __slots__ = ('id', 'user_id', 'rut', 'razon', 'monto_multa', 'foto_url', 'fecha_multa',
+                 'oficial_id', 'estado')
+    interned = ('estado',)
+
+
+class PaymentCode(Model):
+    __slots__ = ('code', 'amount', 'description', 'user_id', 'used', 'created_at', 'used_at',
+                 'created_by')
+
+
+class Antecedentes:
+    """Cédula del ciudadano con sus arrestos activos y multas pendientes."""
+
+    __slots__ = ('cedula', 'arrestos', 'multas')
+
+    def __init__(self, cedula, arrestos=(), multas=()):
+        self.cedula = cedula
+        self.arrestos = list(arrestos)
+        self.multas = list(multas)
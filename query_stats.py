@@ -0,0 +1,136 @@
+"""Tiempos de las sentencias SQL agrupados por sentencia normalizada.
+
+La capa de datos llama a ``record`` después de cada sentencia, también de las
+que fallan (por ejemplo, canceladas por ``MAX_EXECUTION_TIME``, un lock wait
+timeout o un deadlock), que se cuentan aparte en ``errors``. Por cada texto
+normalizado se guarda un histograma de latencias, y las que superan
+``slow_threshold`` se registran en el log con los parámetros censurados (solo
+tipo y largo, nunca el valor). Para poder pedir el ``EXPLAIN`` después, se
+conserva en memoria la ejecución más lenta de cada sentencia.
+"""
+import logging
+import re
+import threading
+
+logger = logging.getLogger('bot.db.slow')
+
+# Límites superiores de los buckets del histograma, en milisegundos
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float('inf'))
+
+slow_threshold = 0.2  # Segundos a partir de los cuales una sentencia se considera lenta
+max_statements = 500  # Sentencias distintas que se siguen como máximo
+
+_WHITESPACE = re.compile(r'\s+')
+_STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.)*'")
+_NUMBER_LITERAL = re.compile(r'(?<![\w%])\d+(?:\.\d+)?\b')
+_REPEATED_ROWS = re.compile(r'(\([^()]*\))(?:\s*,\s*\1)+')
+
+_lock = threading.Lock()
+_statements = {}
+
+
+class StatementTimings:
+    """Histograma y totales de una sentencia normalizada."""
+
+    __slots__ = ('sql', 'count', 'errors', 'total', 'max', 'buckets', 'slowest_query', 'slowest_params')
+
+    def __init__(self, sql):
+        self.sql = sql
+        self.count = 0
+        self.errors = 0  # Ejecuciones que terminaron en error (incluidas en ``count``)
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * len(BUCKETS_MS)
+        self.slowest_query = None
+        self.slowest_params = None
+
+    def percentile(self, fraction):
+        """Límite superior (ms) del bucket donde cae el percentil pedido."""
+        target = self.count * fraction
+        seen = 0
+        for limit, hits in zip(BUCKETS_MS, self.buckets):
+            seen += hits
+            if seen >= target:
+                return min(limit, self.max * 1000)
+        return self.max * 1000
+
+    def as_dict(self):
+        return {
+            'sql': self.sql,
+            'count': self.count,
+            'errors': self.errors,
+            'total_ms': self.total * 1000,
+            'avg_ms': self.total * 1000 / self.count if self.count else 0.0,
+            'p95_ms': self.percentile(0.95),
+            'max_ms': self.max * 1000,
+        }
+
+
+def normalize(query):
+    """Texto canónico de una sentencia: sin literales, espacios colapsados y filas de VALUES agrupadas."""
+    sql = _WHITESPACE.sub(' ', query).strip()
+    sql = _STRING_LITERAL.sub('?', sql)
+    sql = _NUMBER_LITERAL.sub('?', sql)
+    return _REPEATED_ROWS.sub(r'\1, ...', sql)
+
+
+def redact(params):
+    """Describe los parámetros sin exponer sus valores."""
+    described = []
+    for value in params or ():
+        if value is None:
+            described.append('NULL')
+        elif isinstance(value, (str, bytes)):
+            described.append(f'<{type(value).__name__}:{len(value)}>')
+        else:
+            described.append(f'<{type(value).__name__}>')
+    return '(' + ', '.join(described) + ')'
+
+
+def record(query, elapsed, params=(), failed=False):
+    """Registra la duración (segundos) de una ejecución de ``query``; ``failed`` si terminó en error."""
+    sql = normalize(query)
+    elapsed_ms = elapsed * 1000
+    with _lock:
+        timings = _statements.get(sql)
+        if timings is None:
+            if len(_statements) >= max_statements:
+                return
+            timings = _statements[sql] = StatementTimings(sql)
+        timings.count += 1
+        if failed:
+            timings.errors += 1
+        timings.total += elapsed
+        for i, limit in enumerate(BUCKETS_MS):
+            if elapsed_ms <= limit:
+                timings.buckets[i] += 1
+                break
+        if elapsed >= timings.max:
+            timings.max = elapsed
+            timings.slowest_query = query
+            timings.slowest_params = tuple(params or ())
+    if elapsed >= slow_threshold:
+        estado = " fallida" if failed else ""
+        logger.warning(f"Consulta lenta{estado} ({elapsed_ms:.0f} ms): {sql} {redact(params)}")
+
+
+def top(n=10, key='total_ms'):
+    """Las ``n`` sentencias con mayor ``key`` (total_ms, avg_ms, p95_ms, max_ms o count)."""
+    with _lock:
+        rows = [timings.as_dict() for timings in _statements.values()]
+    rows.sort(key=lambda row: row[key], reverse=True)
+    return rows[:n]
+
+
+def slowest_sample(sql):
+    """``(query, params)`` de la ejecución más lenta de la sentencia normalizada ``sql``."""
+    with _lock:
+        timings = _statements.get(sql)
+        if timings is None:
+            return None
+        return timings.slowest_query, timings.slowest_params
+
+
+def reset():
+    with _lock:
+        _statements.clear()
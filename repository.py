@@ -0,0 +1,243 @@
+"""Consultas compuestas que traen en una sola sentencia todo lo que necesita un comando.
+
+Cada función parte de la cédula del ciudadano y agrega con LEFT JOIN lo demás,
+así que devuelve None cuando el ciudadano no tiene cédula registrada. Las que
+sirven a comandos de solo lectura aceptan ``replica=True`` para leer desde la
+réplica (ver ``db.fetch_one``).
+
+Las filas se devuelven como objetos de ``models``, armados por posición desde
+cursores de tuplas; por eso cada SELECT lista las columnas con ``columns()``.
+Las búsquedas puntuales de cédulas, vehículos y propiedades pasan primero por
+``entity_cache``.
+"""
+import db
+import entity_cache
+from entity_cache import MISSING
+from models import Antecedentes, Arresto, Cedula, Licencia, Multa, PaymentCode, Propiedad, Vehiculo
+
+_CEDULA = Cedula.columns('c')
+_N_CEDULA = len(Cedula.__slots__)
+
+
+async def load_cedula(user_id, replica=False):
+    """Cédula completa del ciudadano, o None."""
+    user_id = int(user_id)
+    cedula = entity_cache.cedulas.get(user_id)
+    if cedula is not MISSING:
+        return cedula
+    generation = entity_cache.cedulas.generation
+    cedula = await db.fetch_one(f'''
+    SELECT {_CEDULA} FROM cedulas c WHERE c.user_id = %s
+    ''', (user_id,), replica_key=user_id if replica else None, row=Cedula.from_row)
+    entity_cache.cedulas.set(user_id, cedula, generation)
+    return cedula
+
+
+def _cedula_y(model):
+    """Fábrica de filas ``(cedula, model)`` para SELECT que traen la cédula seguida de ``model``."""
+    def build(values):
+        return Cedula.from_values(values), model.from_values(values, _N_CEDULA)
+    return build
+
+
+async def load_license_context(user_id, tipo_licencia, replica=False):
+    """``(cedula, licencia)`` del ciudadano para el tipo de licencia indicado.
+
+    ``licencia`` es None cuando el ciudadano no tiene esa licencia.
+    """
+    return await db.fetch_one(f'''
+    SELECT {_CEDULA}, {Licencia.columns('l')}
+    FROM cedulas c
+    LEFT JOIN licencias l ON l.user_id = c.user_id AND l.tipo_licencia = %s
+    WHERE c.user_id = %s
+    LIMIT 1
+    ''', (tipo_licencia, user_id), replica_key=int(user_id) if replica else None,
+        row=_cedula_y(Licencia))
+
+
+def _registration_row(values):
+    return (Cedula.from_values(values), bool(values[_N_CEDULA]),
+            PaymentCode.from_values(values, _N_CEDULA + 1))
+
+
+async def load_vehicle_registration_context(user_id, placa, codigo_pago):
+    """``(cedula, placa_registrada, codigo)`` para registrar un vehículo.
+
+    ``codigo`` es None cuando el código de pago no existe o no pertenece al ciudadano.
+    """
+    return await db.fetch_one(f'''
+    SELECT {_CEDULA},
+           EXISTS(SELECT 1 FROM vehiculos v WHERE v.placa = %s) AS placa_registrada,
+           {PaymentCode.columns('p')}
+    FROM cedulas c
+    LEFT JOIN payment_codes p ON p.code = %s AND p.user_id = c.user_id
+    WHERE c.user_id = %s
+    ''', (placa, codigo_pago, user_id), row=_registration_row)
+
+
+async def load_property_registration_context(user_id, numero_domicilio, codigo_pago):
+    """``(cedula, domicilio_registrado, codigo)`` para registrar una propiedad."""
+    return await db.fetch_one(f'''
+    SELECT {_CEDULA},
+           EXISTS(SELECT 1 FROM propiedades pr WHERE pr.numero_domicilio = %s) AS domicilio_registrado,
+           {PaymentCode.columns('p')}
+    FROM cedulas c
+    LEFT JOIN payment_codes p ON p.code = %s AND p.user_id = c.user_id
+    WHERE c.user_id = %s
+    ''', (numero_domicilio, codigo_pago, user_id), row=_registration_row)
+
+
+async def load_property_context(user_id, numero_domicilio, replica=False):
+    """``(cedula, propiedad)`` del ciudadano para ese número de domicilio.
+
+    ``propiedad`` es None cuando no está registrada a su nombre.
+    """
+    user_id = int(user_id)
+    cedula = entity_cache.cedulas.get(user_id)
+    if cedula is None:
+        return None
+    propiedad = entity_cache.propiedades.get(numero_domicilio)
+    if cedula is not MISSING and propiedad is not MISSING:
+        if propiedad is not None and int(propiedad.user_id) != user_id:
+            propiedad = None
+        return cedula, propiedad
+
+    generations = entity_cache.cedulas.generation, entity_cache.propiedades.generation
+    contexto = await db.fetch_one(f'''
+    SELECT {_CEDULA}, {Propiedad.columns('p')}
+    FROM cedulas c
+    LEFT JOIN propiedades p ON p.user_id = c.user_id AND p.numero_domicilio = %s
+    WHERE c.user_id = %s
+    LIMIT 1
+    ''', (numero_domicilio, user_id), replica_key=user_id if replica else None,
+        row=_cedula_y(Propiedad))
+    entity_cache.cedulas.set(user_id, contexto and contexto[0], generations[0])
+    # Sin propiedad a su nombre no se sabe si el domicilio es de otro: no se guarda el negativo
+    if contexto and contexto[1] is not None:
+        entity_cache.propiedades.set(numero_domicilio, contexto[1], generations[1])
+    return contexto
+
+
+def _property_with_owner_row(values):
+    return Propiedad.from_values(values), Cedula.from_values(values, len(Propiedad.__slots__))
+
+
+async def load_property_with_owner(user_id, numero_domicilio):
+    """``(propiedad, cedula)`` del ciudadano, si la propiedad existe.
+
+    A diferencia del resto, parte de la propiedad: devuelve None cuando no existe,
+    y ``cedula`` es None si el dueño no tiene cédula.
+    """
+    return await db.fetch_one(f'''
+    SELECT {Propiedad.columns('p')}, {_CEDULA}
+    FROM propiedades p
+    LEFT JOIN cedulas c ON c.user_id = p.user_id
+    WHERE p.user_id = %s AND p.numero_domicilio = %s
+    LIMIT 1
+    ''', (user_id, numero_domicilio), row=_property_with_owner_row)
+
+
+def _vehicle_with_owner_row(values):
+    return Vehiculo.from_values(values), Cedula.from_values(values, len(Vehiculo.__slots__))
+
+
+async def load_vehicle_with_owner(placa, replica=False):
+    """``(vehiculo, cedula)`` de la placa, o None si no está registrada a nombre de una cédula."""
+    vehiculo = entity_cache.vehiculos.get(placa)
+    if vehiculo is None:
+        return None
+    if vehiculo is not MISSING:
+        cedula = await load_cedula(vehiculo.user_id, replica)
+        return (vehiculo, cedula) if cedula else None
+
+    generations = entity_cache.vehiculos.generation, entity_cache.cedulas.generation
+    # LEFT JOIN para distinguir "placa sin registrar" (se guarda como negativo) de "dueño sin cédula"
+    fila = await db.fetch_one(f'''
+    SELECT {Vehiculo.columns('v')}, {_CEDULA}
+    FROM vehiculos v
+    LEFT JOIN cedulas c ON v.user_id = c.user_id
+    WHERE v.placa = %s
+    ''', (placa,), replica_key=('placa', placa) if replica else None, row=_vehicle_with_owner_row)
+    vehiculo, cedula = fila or (None, None)
+    entity_cache.vehiculos.set(placa, vehiculo, generations[0])
+    if vehiculo is None:
+        return None
+    entity_cache.cedulas.set(int(vehiculo.user_id), cedula, generations[1])
+    return (vehiculo, cedula) if cedula else None
+
+
+async def load_enforcement_context(user_id, oficial_id):
+    """Cédulas del ciudadano y del oficial que lo arresta o multa.
+
+    Devuelve ``(ciudadano, oficial)``; cualquiera de los dos puede ser None.
+    """
+    user_id, oficial_id = int(user_id), int(oficial_id)
+    por_id = {}
+    faltantes = []
+    for clave in dict.fromkeys((user_id, oficial_id)):
+        cedula = entity_cache.cedulas.get(clave)
+        if cedula is MISSING:
+            faltantes.append(clave)
+        else:
+            por_id[clave] = cedula
+    if faltantes:
+        generation = entity_cache.cedulas.generation
+        cedulas = await db.fetch_all(f'''
+        SELECT {_CEDULA} FROM cedulas c WHERE c.user_id IN ({', '.join(['%s'] * len(faltantes))})
+        ''', faltantes, row=Cedula.from_row)
+        leidas = {int(cedula.user_id): cedula for cedula in cedulas}
+        for clave in faltantes:
+            por_id[clave] = leidas.get(clave)
+            entity_cache.cedulas.set(clave, por_id[clave], generation)
+    return por_id.get(user_id), por_id.get(oficial_id)
+
+
+def _criminal_record_entry(values):
+    """Arresto o Multa de la parte derecha de la fila (None si el ciudadano no tiene ninguno)."""
+    tipo, id_, user_id, rut, razon, tiempo_prision, monto_multa, foto_url, fecha, oficial_id, estado = (
+        values[_N_CEDULA:]
+    )
+    if tipo == 'arresto':
+        return Arresto.from_values((id_, user_id, rut, razon, tiempo_prision, monto_multa,
+                                    foto_url, fecha, oficial_id, estado))
+    if tipo == 'multa':
+        return Multa.from_values((id_, user_id, rut, razon, monto_multa, foto_url, fecha,
+                                  oficial_id, estado))
+    return None
+
+
+async def load_criminal_record(user_id, replica=False):
+    """Cédula del ciudadano junto con sus arrestos activos y multas pendientes.
+
+    Devuelve un ``models.Antecedentes`` o None si el ciudadano no tiene cédula.
+    """
+    filas = await db.fetch_all(f'''
+    SELECT {_CEDULA},
+           r.tipo, r.id, r.user_id, r.rut, r.razon, r.tiempo_prision, r.monto_multa,
+           r.foto_url, r.fecha, r.oficial_id, r.estado
+    FROM cedulas c
+    LEFT JOIN (
+        SELECT 'arresto' AS tipo, id, user_id, rut, razon, tiempo_prision, monto_multa,
+               foto_url, fecha_arresto AS fecha, oficial_id, estado
+        FROM arrestos WHERE user_id = %s AND estado = 'Activo'
+        UNION ALL
+        SELECT 'multa' AS tipo, id, user_id, rut, razon, NULL, monto_multa,
+               foto_url, fecha_multa AS fecha, oficial_id, estado
+        FROM multas WHERE user_id = %s AND estado = 'Pendiente'
+    ) r ON 1 = 1
+    WHERE c.user_id = %s
+    ORDER BY r.tipo, r.id
+    ''', (user_id, user_id, user_id), replica_key=int(user_id) if replica else None,
+        row=tuple)
+    if not filas:
+        return None
+
+    # La cédula se repite en cada fila; se arma una sola vez
+    antecedentes = Antecedentes(Cedula.from_values(filas[0]))
+    for fila in filas:
+        registro = _criminal_record_entry(fila)
+        if isinstance(registro, Arresto):
+            antecedentes.arrestos.append(registro)
+        elif isinstance(registro, Multa):
+            antecedentes.multas.append(registro)
+    return antecedentes
@@ -0,0 +1,162 @@
+"""Utilidades de tolerancia a fallos: backoff exponencial con jitter, circuit breaker,
+limitador de tasa (token bucket) y coalescencia de llamadas (single-flight)."""
+import asyncio
+import logging
+import random
+import time
+
+logger = logging.getLogger('bot.resilience')
+
+
+def backoff_delay(attempt, base=0.1, cap=2.0):
+    """Espera antes del reintento ``attempt`` (0, 1, 2...) con backoff exponencial y jitter completo."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class CircuitOpenError(Exception):
+    """El circuito está abierto y la llamada se rechaza sin intentarla."""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"Circuito '{name}' abierto; reintentar en {retry_after:.0f} s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Circuit breaker de tres estados (cerrado, abierto, semiabierto).
+
+    Tras ``failure_threshold`` fallos consecutivos el circuito se abre y rechaza
+    las llamadas durante ``reset_timeout`` segundos. Luego deja pasar una llamada
+    de prueba: si funciona se cierra, y si falla vuelve a abrirse.
+    Está pensado para usarse desde el event loop, sin hilos concurrentes.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0, error_class=CircuitOpenError):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.error_class = error_class
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+    @property
+    def state(self):
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self._state
+
+    def before_call(self):
+        """Lanza ``error_class`` si la llamada no debe intentarse."""
+        state = self.state
+        if state == self.CLOSED:
+            return
+        if state == self.HALF_OPEN and not self._trial_in_flight:
+            self._state = self.HALF_OPEN
+            self._trial_in_flight = True
+            return
+        retry_after = max(self.reset_timeout - (time.monotonic() - self._opened_at), 0)
+        raise self.error_class(self.name, retry_after)
+
+    def record_success(self):
+        if self._state != self.CLOSED:
+            logger.info(f"Circuito '{self.name}' cerrado nuevamente")
+        self._state = self.CLOSED
+        self._failures = 0
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self._failures += 1
+        self._trial_in_flight = False
+        if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+            if self._state != self.OPEN:
+                logger.warning(f"Circuito '{self.name}' abierto tras {self._failures} fallos consecutivos")
+            self._state = self.OPEN
+            self._opened_at = time.monotonic()
+
+    def stats(self):
+        return {'state': self.state, 'failures': self._failures}
+
+
+class TokenBucket:
+    """Limitador de tasa: ``rate`` llamadas por segundo con ráfagas de hasta ``burst``.
+
+    ``acquire`` espera (sin bloquear el event loop) hasta que haya un token.
+    ``pause`` vacía el balde por un tiempo, para respetar un ``Retry-After``.
+    """
+
+    def __init__(self, rate, burst=None):
+        if rate <= 0:
+            raise ValueError(f"Tasa inválida: {rate}")
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+        self.waited = 0.0  # Segundos acumulados de espera
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        # El lock mantiene el orden de llegada entre las tareas que esperan
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                delay = (1 - self._tokens) / self.rate
+                self.waited += delay
+                await asyncio.sleep(delay)
+                self._refill()
+            self._tokens -= 1
+
+    def pause(self, seconds):
+        """Deja el balde en negativo para que las próximas llamadas esperen ``seconds``."""
+        self._refill()
+        self._tokens = min(self._tokens, -seconds * self.rate)
+
+    def stats(self):
+        self._refill()
+        return {'tokens': round(self._tokens, 2), 'waited': round(self.waited, 2)}
+
+
+class SingleFlight:
+    """Coalescencia de llamadas: las llamadas concurrentes con la misma clave comparten un resultado.
+
+    La primera llamada ejecuta la corrutina; las que llegan mientras está en
+    curso esperan el mismo futuro. Si un llamador se cancela, la ejecución
+    compartida sigue para los demás.
+    """
+
+    def __init__(self):
+        self._inflight = {}
+        self.shared = 0  # Llamadas que se ahorraron uniéndose a una en curso
+
+    def __contains__(self, key):
+        return key in self._inflight
+
+    def __len__(self):
+        return len(self._inflight)
+
+    async def do(self, key, fn, *args):
+        """Resultado de ``await fn(*args)``, ejecutada una sola vez por ``key`` a la vez."""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn(*args))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def _finished(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # Evita el aviso de excepción no leída si todos los llamadores se cancelaron
@@ -0,0 +1,245 @@
+"""Cliente HTTP de las APIs públicas de Roblox.
+
+Se crea una sola vez al iniciar el bot (``start`` en ``setup_hook``) y se
+comparte entre todos los comandos: la sesión mantiene las conexiones abiertas
+(keep-alive), cachea las resoluciones DNS y limita las conexiones por host, así
+que una búsqueda no paga de nuevo el handshake TCP/TLS. Los timeouts separan la
+conexión de la lectura para que un host caído falle rápido.
+
+Todas las peticiones pasan por un token bucket por proceso para no superar los
+límites de tasa de Roblox; un 429 pausa el balde durante el ``Retry-After``.
+
+Un circuit breaker general se abre tras varios fallos seguidos (errores de red,
+timeouts o respuestas 5xx) y, mientras está abierto, las llamadas fallan al
+instante con ``RobloxCircuitOpen``. Además cada endpoint lleva su propio
+registro de salud: uno que viene fallando se salta hasta que pase
+``endpoint_reset``, en vez de gastar el tiempo de cada búsqueda en él.
+"""
+import asyncio
+import logging
+
+import aiohttp
+
+from resilience import CircuitBreaker, TokenBucket
+
+logger = logging.getLogger('bot.roblox')
+
+DEFAULT_AVATAR_URL = "https://tr.rbxcdn.com/e5b3371b4efc7642a22c1b36265a9ba9/420/420/AvatarHeadshot/Png"
+
+USERNAMES_URL = "https://users.roblox.com/v1/usernames/users"
+USER_SEARCH_URL = "https://users.roblox.com/v1/users/search"
+HEADSHOT_URL = "https://thumbnails.roblox.com/v1/users/avatar-headshot"
+# Máximo de IDs o nombres que aceptan los endpoints por lotes en una sola llamada
+MAX_BATCH = 100
+HEADSHOT_FALLBACK_URL = "https://www.roblox.com/headshot-thumbnail/image?userId={user_id}&width=420&height=420&format=png"
+
+# Endpoints con registro de salud propio
+ENDPOINTS = ('usernames', 'search', 'thumbnails')
+
+
+class RobloxUnavailable(Exception):
+    """Ningún endpoint de Roblox respondió; no se sabe si el usuario existe."""
+
+
+class RobloxCircuitOpen(RobloxUnavailable):
+    """El circuito de Roblox está abierto y la llamada no se intentó."""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"Circuito '{name}' abierto; reintentar en {retry_after:.0f} s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class RobloxClient:
+    """Sesión aiohttp de larga vida para las APIs de Roblox."""
+
+    def __init__(self, total_timeout=4.0, connect_timeout=2.0, read_timeout=3.0,
+                 limit=20, limit_per_host=8, dns_cache_ttl=300, keepalive_timeout=60.0,
+                 rate=5.0, burst=10, breaker_threshold=5, breaker_reset=30.0,
+                 endpoint_threshold=3, endpoint_reset=300.0):
+        self.timeout = aiohttp.ClientTimeout(total=total_timeout, connect=connect_timeout,
+                                             sock_read=read_timeout)
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.rate_limiter = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker('roblox', breaker_threshold, breaker_reset,
+                                      error_class=RobloxCircuitOpen)
+        self.endpoint_health = {
+            name: CircuitBreaker(f'roblox-{name}', endpoint_threshold, endpoint_reset)
+            for name in ENDPOINTS
+        }
+        self.throttled = 0  # Respuestas 429 recibidas
+        self._session = None
+
+    async def start(self):
+        """Crea la sesión compartida; debe llamarse con el event loop corriendo."""
+        if self._session is not None and not self._session.closed:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            ttl_dns_cache=self.dns_cache_ttl,
+            keepalive_timeout=self.keepalive_timeout,
+            enable_cleanup_closed=True,
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=self.timeout,
+            headers={'Accept': 'application/json'},
+            raise_for_status=False,
+        )
+
+    @property
+    def session(self):
+        if self._session is None or self._session.closed:
+            raise RuntimeError("El cliente de Roblox no fue iniciado (llama a RobloxClient.start)")
+        return self._session
+
+    def endpoint_is_healthy(self, endpoint):
+        """False mientras el endpoint está marcado como caído (se vuelve a probar tras ``endpoint_reset``)."""
+        # Se mira solo el estado, sin consumir la llamada de prueba del semiabierto
+        return self.endpoint_health[endpoint].state != CircuitBreaker.OPEN
+
+    def _record(self, endpoint, ok):
+        for breaker in (self.breaker, self.endpoint_health[endpoint]):
+            if ok:
+                breaker.record_success()
+            else:
+                breaker.record_failure()
+
+    async def _request_json(self, endpoint, method, url, **kwargs):
+        """JSON de la respuesta, o None si el estado no es 200.
+
+        Lanza ``RobloxUnavailable`` ante errores de red, timeouts o respuestas 5xx
+        (que cuentan como fallos del circuito), y ``RobloxCircuitOpen`` sin
+        intentar la llamada si el circuito está abierto.
+        """
+        # El token se espera antes de tomar la prueba del semiabierto: tras un 429 la
+        # espera puede durar todo el Retry-After
+        await self.rate_limiter.acquire()
+        self.breaker.before_call()
+        try:
+            async with self.session.request(method, url, **kwargs) as resp:
+                if resp.status >= 500:
+                    self._record(endpoint, False)
+                    raise RobloxUnavailable(f"Roblox respondió {resp.status} para {url}")
+                self._record(endpoint, True)
+                if resp.status == 429:
+                    self._throttle(resp)
+                if resp.status != 200:
+                    logger.debug(f"Roblox respondió {resp.status} para {url}")
+                    return None
+                return await resp.json(content_type=None)
+        except RobloxUnavailable:
+            raise
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            self._record(endpoint, False)
+            raise RobloxUnavailable(f"Error al llamar a {url}: {e!r}") from e
+        except BaseException:
+            # Una llamada cancelada o con un error inesperado no puede dejar tomada la prueba del semiabierto
+            self._record(endpoint, False)
+            raise
+
+    def _throttle(self, resp):
+        self.throttled += 1
+        try:
+            retry_after = float(resp.headers.get('Retry-After', 1))
+        except ValueError:
+            retry_after = 1.0
+        logger.warning(f"Roblox limitó la tasa de peticiones (429); pausa de {retry_after:g} s")
+        self.rate_limiter.pause(retry_after)
+
+    async def _get_json(self, endpoint, url, params=None):
+        return await self._request_json(endpoint, 'GET', url, params=params)
+
+    async def _post_json(self, endpoint, url, payload):
+        return await self._request_json(endpoint, 'POST', url, json=payload)
+
+    async def _lookup_exact(self, username):
+        data = await self._post_json('usernames', USERNAMES_URL,
+                                     {'usernames': [username], 'excludeBannedUsers': False})
+        if data is None:
+            return False, None
+        for user in data.get('data') or ():
+            return True, user.get('id')
+        return True, None
+
+    async def _lookup_search(self, username):
+        data = await self._get_json('search', USER_SEARCH_URL, params={'keyword': username, 'limit': 10})
+        if data is None:
+            return False, None
+        for user in data.get('data') or ():
+            if user.get('name', '').lower() == username.lower():
+                return True, user.get('id')
+        return True, None
+
+    async def find_user_id(self, username):
+        """ID de Roblox del usuario con ese nombre exacto, o None si no existe.
+
+        Prueba los endpoints sanos en orden. Lanza ``RobloxUnavailable`` si
+        ninguno respondió, para no confundir una caída de Roblox con un usuario
+        inexistente.
+        """
+        for endpoint, lookup in (('usernames', self._lookup_exact), ('search', self._lookup_search)):
+            if not self.endpoint_is_healthy(endpoint):
+                continue
+            try:
+                answered, user_id = await lookup(username)
+            except RobloxCircuitOpen:
+                raise
+            except RobloxUnavailable as e:
+                logger.warning(f"Error al buscar {username} en {endpoint}: {e}")
+                continue
+            if answered:
+                return user_id
+        raise RobloxUnavailable(f"Ninguna API de Roblox respondió al buscar {username}")
+
+    async def find_user_ids(self, usernames):
+        """IDs de hasta ``MAX_BATCH`` nombres exactos en una llamada: ``{nombre en minúsculas: id}``.
+
+        Los nombres que no existen no aparecen en el resultado.
+        """
+        if len(usernames) > MAX_BATCH:
+            raise ValueError(f"Se pueden buscar hasta {MAX_BATCH} nombres por llamada")
+        data = await self._post_json('usernames', USERNAMES_URL,
+                                     {'usernames': list(usernames), 'excludeBannedUsers': False})
+        if data is None:
+            raise RobloxUnavailable(f"La búsqueda de {len(usernames)} usuarios no respondió")
+        return {user['requestedUsername'].lower(): user['id'] for user in data.get('data') or ()}
+
+    async def headshot_urls(self, user_ids, size="420x420"):
+        """URLs del rostro de hasta ``MAX_BATCH`` avatares en una llamada: ``{id: url}``.
+
+        Las miniaturas que Roblox todavía no generó (estado Pending) no aparecen.
+        """
+        if len(user_ids) > MAX_BATCH:
+            raise ValueError(f"Se pueden pedir hasta {MAX_BATCH} avatares por llamada")
+        params = {'userIds': ','.join(str(user_id) for user_id in user_ids), 'size': size, 'format': 'Png'}
+        data = await self._get_json('thumbnails', HEADSHOT_URL, params=params)
+        if data is None:
+            raise RobloxUnavailable(f"La API de miniaturas no respondió para {len(user_ids)} avatares")
+        return {
+            thumbnail['targetId']: thumbnail['imageUrl']
+            for thumbnail in data.get('data') or ()
+            if thumbnail.get('imageUrl')
+        }
+
+    async def headshot_url(self, user_id, size="420x420"):
+        """URL de la imagen del rostro del avatar, o None si la API no la entrega."""
+        urls = await self.headshot_urls([user_id], size)
+        return urls.get(int(user_id))
+
+    def stats(self):
+        return {
+            **self.rate_limiter.stats(),
+            'throttled': self.throttled,
+            'circuit': self.breaker.state,
+            'endpoints': {name: breaker.state for name, breaker in self.endpoint_health.items()},
+        }
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
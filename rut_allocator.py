@@ -0,0 +1,130 @@
+"""Asignación de RUT únicos sin sondear la tabla de cédulas.
+
+Cada RUT sale de un contador persistente (tabla ``rut_asignador``) pasado por
+una permutación con clave: una red de Feistel sobre 28 bits con *cycle walking*
+para quedarse dentro de los 90 millones de bases posibles (10.000.000 a
+99.999.999). Como la permutación es biyectiva, dos valores distintos del
+contador nunca dan el mismo RUT, y sin la clave los RUT se ven aleatorios.
+
+Para no escribir en la base de datos en cada cédula, cada proceso reserva un
+bloque de ``block_size`` valores del contador con una sola transacción corta;
+los valores que quedan sin usar al reiniciar son solo huecos. El índice UNIQUE
+de ``cedulas.rut`` queda como última defensa, por ejemplo ante un RUT aleatorio
+asignado antes de este esquema (ver ``/crear-cedula``).
+"""
+import asyncio
+import hashlib
+
+from mysql.connector import errors
+
+import db
+from validaciones import calcular_digito_verificador
+
+RUT_MIN = 10_000_000
+RUT_MAX = 99_999_999
+DOMAIN = RUT_MAX - RUT_MIN + 1
+
+
+def format_rut(rut_base):
+    """``'12345678-5'``: la base con su dígito verificador."""
+    return f"{rut_base}-{calcular_digito_verificador(rut_base)}"
+
+
+class FeistelPermutation:
+    """Permutación con clave de ``range(domain)``.
+
+    La red trabaja sobre la menor cantidad par de bits que cubre el dominio (28
+    para los RUT) y cada ronda mezcla una mitad con un BLAKE2b con clave de la
+    otra. Los resultados fuera del dominio se vuelven a permutar (cycle walking)
+    hasta caer dentro; como el dominio ocupa más de un cuarto del espacio, son a
+    lo sumo cuatro vueltas en promedio.
+    """
+
+    def __init__(self, key, domain=DOMAIN, rounds=6):
+        if domain < 2:
+            raise ValueError(f"Dominio inválido para la permutación: {domain}")
+        self.key = key
+        self.domain = domain
+        self.rounds = rounds
+        self._half_bits = ((domain - 1).bit_length() + 1) // 2
+        self._half_mask = (1 << self._half_bits) - 1
+
+    def _round(self, i, half):
+        digest = hashlib.blake2b(bytes((i,)) + half.to_bytes(4, 'big'), key=self.key, digest_size=4).digest()
+        return int.from_bytes(digest, 'big') & self._half_mask
+
+    def _encrypt(self, value):
+        left, right = value >> self._half_bits, value & self._half_mask
+        for i in range(self.rounds):
+            left, right = right, left ^ self._round(i, right)
+        return (left << self._half_bits) | right
+
+    def permute(self, value):
+        if not 0 <= value < self.domain:
+            raise ValueError(f"Valor fuera del dominio: {value}")
+        value = self._encrypt(value)
+        while value >= self.domain:
+            value = self._encrypt(value)
+        return value
+
+
+def _reserve_block(conn, size):
+    """Avanza el contador en ``size`` y devuelve ``(primer valor reservado, clave)``."""
+    conn.start_transaction()
+    cursor = conn.cursor()
+    try:
+        # El UPDATE bloquea la fila: dos procesos nunca reservan el mismo tramo
+        cursor.execute('UPDATE rut_asignador SET siguiente = siguiente + %s WHERE id = 1', (size,))
+        cursor.execute('SELECT siguiente, clave FROM rut_asignador WHERE id = 1')
+        row = cursor.fetchone()
+        conn.commit()
+    except BaseException:
+        try:
+            conn.rollback()
+        except errors.Error:
+            pass
+        raise
+    finally:
+        cursor.close()
+    if row is None:
+        raise RuntimeError("Falta la fila del contador de RUT (¿se aplicó la migración de rut_asignador?)")
+    end, key = row
+    return end - size, key
+
+
+class RutAllocator:
+    """Entrega RUT únicos desde bloques reservados del contador persistente."""
+
+    def __init__(self, block_size=16):
+        if block_size < 1:
+            raise ValueError(f"Tamaño de bloque inválido: {block_size}")
+        self.block_size = block_size
+        self._next = 0
+        self._end = 0
+        self._permutation = None
+        self._lock = asyncio.Lock()
+        self.allocated = 0
+        self.blocks = 0  # Bloques reservados en la base de datos
+
+    async def _reserve(self):
+        # Repetirla tras perder la conexión es seguro: a lo sumo deja un tramo sin usar
+        start, key = await db.run_in_connection(_reserve_block, self.block_size, idempotent=True)
+        if start + self.block_size > DOMAIN:
+            raise RuntimeError("Se agotaron los RUT disponibles")
+        if self._permutation is None:
+            self._permutation = FeistelPermutation(bytes.fromhex(key))
+        self._next, self._end = start, start + self.block_size
+        self.blocks += 1
+
+    async def allocate(self):
+        """Un RUT nuevo con dígito verificador; solo va a la base de datos al agotar el bloque."""
+        async with self._lock:
+            if self._next >= self._end:
+                await self._reserve()
+            value = self._next
+            self._next += 1
+        self.allocated += 1
+        return format_rut(RUT_MIN + self._permutation.permute(value))
+
+    def stats(self):
+        return {'allocated': self.allocated, 'blocks': self.blocks, 'remaining': self._end - self._next}
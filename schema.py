@@ -0,0 +1,311 @@
+"""Migraciones versionadas del esquema de la base de datos.
+
+Cada migración es un archivo ``NNNN_descripcion.sql`` o ``NNNN_descripcion.py``
+dentro de ``migrations/``. Se aplican en orden de versión y cada una queda
+registrada en la tabla ``schema_version``, así que al iniciar el proceso solo
+se ejecutan las pendientes. Las migraciones ``.py`` definen ``upgrade(conn)``.
+
+El backend SQLite tiene su propia serie en ``migrations/sqlite/``, que parte
+directamente del esquema actual (tipos nativos e índices incluidos).
+"""
+import hashlib
+import importlib.util
+import logging
+import os
+import re
+import time
+from collections import namedtuple
+
+import db
+
+logger = logging.getLogger('bot.schema')
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+SQLITE_MIGRATIONS_DIR = os.path.join(MIGRATIONS_DIR, 'sqlite')
+# Nombre del lock de MySQL que evita que dos procesos migren al mismo tiempo
+LOCK_NAME = 'strpbot_schema_migrations'
+
+_FILENAME = re.compile(r'^(\d{4})_(\w+)\.(sql|py)$')
+
+Migration = namedtuple('Migration', ['version', 'name', 'path', 'kind', 'checksum'])
+
+# Índices que necesitan las consultas de los comandos: nombre -> (tabla, columnas)
+REQUIRED_INDEXES = {
+    'idx_licencias_user_tipo': ('licencias', ('user_id', 'tipo_licencia')),
+    'idx_arrestos_user_estado': ('arrestos', ('user_id', 'estado')),
+    'idx_multas_user_estado': ('multas', ('user_id', 'estado')),
+    'idx_payment_codes_user_used': ('payment_codes', ('user_id', 'used')),
+    'idx_propiedades_user_domicilio': ('propiedades', ('user_id', 'numero_domicilio')),
+    'idx_vehiculos_user': ('vehiculos', ('user_id',)),
+    'idx_licencias_vencimiento': ('licencias', ('fecha_vencimiento',)),
+    'idx_arrestos_fecha': ('arrestos', ('fecha_arresto',)),
+    'idx_multas_fecha': ('multas', ('fecha_multa',)),
+    'idx_payment_codes_created': ('payment_codes', ('created_at',)),
+}
+
+
+class MigrationError(Exception):
+    """Los archivos de migración son inconsistentes o una migración falló."""
+
+
+def discover_migrations(path=MIGRATIONS_DIR):
+    """Lista las migraciones del directorio ordenadas por versión."""
+    migrations = []
+    seen = {}
+    for filename in sorted(os.listdir(path)):
+        match = _FILENAME.match(filename)
+        if not match:
+            continue
+        version = int(match.group(1))
+        if version in seen:
+            raise MigrationError(f"Versión de migración duplicada {version}: {seen[version]} y {filename}")
+        seen[version] = filename
+        full_path = os.path.join(path, filename)
+        with open(full_path, 'rb') as f:
+            checksum = hashlib.sha256(f.read()).hexdigest()
+        migrations.append(Migration(version, match.group(2), full_path, match.group(3), checksum))
+    return migrations
+
+
+def split_sql(script):
+    """Separa un script SQL en sentencias, ignorando comentarios ``--`` y los ``;`` entre comillas."""
+    statements = []
+    current = []
+    quote = None
+    i = 0
+    while i < len(script):
+        char = script[i]
+        if quote:
+            current.append(char)
+            if char == '\\':
+                current.append(script[i + 1:i + 2])
+                i += 1
+            elif char == quote:
+                quote = None
+        elif char in ("'", '"', '`'):
+            quote = char
+            current.append(char)
+        elif script.startswith('--', i):
+            end = script.find('\n', i)
+            i = len(script) if end == -1 else end
+            continue
+        elif char == ';':
+            statement = ''.join(current).strip()
+            if statement:
+                statements.append(statement)
+            current = []
+        else:
+            current.append(char)
+        i += 1
+    statement = ''.join(current).strip()
+    if statement:
+        statements.append(statement)
+    return statements
+
+
+def migrations_dir():
+    """Directorio de migraciones del backend configurado en ``db``."""
+    return SQLITE_MIGRATIONS_DIR if db.backend == 'sqlite' else MIGRATIONS_DIR
+
+
+def index_columns(cursor, table, name):
+    """Columnas del índice ``name`` en orden, o una tupla vacía si no existe."""
+    if db.backend == 'sqlite':
+        cursor.execute('''
+        SELECT i.name FROM sqlite_master m, pragma_index_info(m.name) i
+        WHERE m.type = 'index' AND m.tbl_name = %s AND m.name = %s
+        ORDER BY i.seqno
+        ''', (table, name))
+        return tuple(row[0] for row in cursor.fetchall())
+    cursor.execute('''
+    SELECT COLUMN_NAME FROM information_schema.STATISTICS
+    WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+    ORDER BY SEQ_IN_INDEX
+    ''', (table, name))
+    return tuple(row[0] for row in cursor.fetchall())
+
+
+def create_index_if_missing(cursor, table, name, columns):
+    """Crea el índice sin bloquear escrituras, salvo que ya exista (para poder reintentar).
+
+    ``columns`` es la lista SQL, con largo de prefijo para las columnas TEXT.
+    """
+    if index_columns(cursor, table, name):
+        return False
+    logger.info(f"Creando índice {name} en {table}")
+    cursor.execute(f'CREATE INDEX {name} ON {table} ({columns}) ALGORITHM=INPLACE LOCK=NONE')
+    return True
+
+
+def column_type(cursor, table, column):
+    """Tipo de datos de la columna (``DATA_TYPE`` en minúsculas), o None si no existe."""
+    if db.backend == 'sqlite':
+        cursor.execute('SELECT lower(type) FROM pragma_table_info(%s) WHERE name = %s', (table, column))
+        row = cursor.fetchone()
+        return row[0] if row else None
+    cursor.execute('''
+    SELECT DATA_TYPE FROM information_schema.COLUMNS
+    WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+    ''', (table, column))
+    row = cursor.fetchone()
+    return row[0].lower() if row else None
+
+
+def backfill_in_chunks(conn, table, assignments, pending, chunk_size=1000, pause=0.05):
+    """Actualiza ``table`` por tramos de ``chunk_size`` filas recorriendo la clave primaria.
+
+    Cada tramo es una transacción corta, así que la tabla nunca queda bloqueada
+    completa. ``pending`` filtra las filas que aún faltan, lo que permite
+    retomar el proceso si se interrumpe. Devuelve la cantidad de filas actualizadas.
+    """
+    cursor = conn.cursor()
+    try:
+        last_id = 0
+        total = 0
+        while True:
+            cursor.execute(
+                f'SELECT MAX(id) FROM (SELECT id FROM {table} WHERE id > %s ORDER BY id LIMIT %s) AS tramo',
+                (last_id, chunk_size)
+            )
+            upper = cursor.fetchone()[0]
+            if upper is None:
+                break
+            cursor.execute(
+                f'UPDATE {table} SET {assignments} WHERE id > %s AND id <= %s AND ({pending})',
+                (last_id, upper)
+            )
+            conn.commit()
+            total += cursor.rowcount
+            last_id = upper
+            if pause:
+                time.sleep(pause)  # Deja respirar a las escrituras concurrentes
+        if total:
+            logger.info(f"Backfill de {table}: {total} filas actualizadas")
+        return total
+    finally:
+        cursor.close()
+
+
+def missing_indexes(conn):
+    """Nombres de los índices de ``REQUIRED_INDEXES`` que faltan o tienen otras columnas."""
+    cursor = conn.cursor()
+    try:
+        return [
+            name for name, (table, columns) in REQUIRED_INDEXES.items()
+            if index_columns(cursor, table, name) != columns
+        ]
+    finally:
+        cursor.close()
+
+
+def _run_sql_migration(conn, migration):
+    with open(migration.path, encoding='utf-8') as f:
+        statements = split_sql(f.read())
+    cursor = conn.cursor()
+    try:
+        for statement in statements:
+            cursor.execute(statement)
+    finally:
+        cursor.close()
+
+
+def _run_python_migration(conn, migration):
+    spec = importlib.util.spec_from_file_location(f'migrations.m{migration.version:04d}', migration.path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.upgrade(conn)
+
+
+def _applied_versions(cursor):
+    cursor.execute('SELECT version, checksum FROM schema_version')
+    return dict(cursor.fetchall())
+
+
+_SCHEMA_VERSION_TABLE = '''
+CREATE TABLE IF NOT EXISTS schema_version (
+    version INT PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    checksum CHAR(64) NOT NULL,
+    applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+)'''
+
+
+def _acquire_lock(cursor, lock_timeout):
+    # SQLite es de un solo proceso por archivo: no hace falta un lock con nombre
+    if db.backend == 'sqlite':
+        return
+    cursor.execute('SELECT GET_LOCK(%s, %s)', (LOCK_NAME, lock_timeout))
+    if cursor.fetchone()[0] != 1:
+        raise MigrationError("Otro proceso está aplicando migraciones; no se obtuvo el lock a tiempo")
+
+
+def _release_lock(cursor):
+    if db.backend == 'sqlite':
+        return
+    cursor.execute('SELECT RELEASE_LOCK(%s)', (LOCK_NAME,))
+    cursor.fetchall()
+
+
+def migrate(conn, path=None, lock_timeout=60):
+    """Aplica las migraciones pendientes con la conexión ``conn``; devuelve las versiones aplicadas.
+
+    Las sentencias DDL de MySQL se confirman solas, por eso cada migración se
+    registra en ``schema_version`` recién cuando termina completa y debe poder
+    reintentarse si el proceso se corta a la mitad.
+    """
+    migrations = discover_migrations(path or migrations_dir())
+    cursor = conn.cursor()
+    try:
+        _acquire_lock(cursor, lock_timeout)
+        try:
+            if db.backend == 'sqlite':
+                cursor.execute(_SCHEMA_VERSION_TABLE)
+            else:
+                cursor.execute(_SCHEMA_VERSION_TABLE + ' CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci')
+            applied = _applied_versions(cursor)
+            newly_applied = []
+            for migration in migrations:
+                if migration.version in applied:
+                    if applied[migration.version] != migration.checksum:
+                        logger.warning(f"La migración {migration.version:04d}_{migration.name} cambió después de aplicarse")
+                    continue
+                logger.info(f"Aplicando migración {migration.version:04d}_{migration.name}")
+                try:
+                    if migration.kind == 'sql':
+                        _run_sql_migration(conn, migration)
+                    else:
+                        _run_python_migration(conn, migration)
+                except Exception as e:
+                    raise MigrationError(f"Falló la migración {migration.version:04d}_{migration.name}: {e}") from e
+                cursor.execute(
+                    'INSERT INTO schema_version (version, name, checksum) VALUES (%s, %s, %s)',
+                    (migration.version, migration.name, migration.checksum)
+                )
+                conn.commit()
+                newly_applied.append(migration.version)
+            return newly_applied
+        finally:
+            _release_lock(cursor)
+    finally:
+        cursor.close()
+
+
+async def run_migrations(path=None, timeout=3600):
+    """Aplica las migraciones pendientes; se llama una sola vez al iniciar el proceso."""
+    applied = await db.run_in_connection(migrate, path, timeout=timeout)
+    if applied:
+        logger.info(f"✅ Esquema actualizado a la versión {applied[-1]} ({len(applied)} migraciones aplicadas)")
+    else:
+        logger.info("✅ Esquema de la base de datos al día")
+    return applied
+
+
+async def check_indexes():
+    """Autodiagnóstico de inicio: avisa si falta alguno de los índices de búsqueda."""
+    missing = await db.run_in_connection(missing_indexes, idempotent=True)
+    for name in missing:
+        table, columns = REQUIRED_INDEXES[name]
+        logger.warning(f"⚠️ Falta el índice {name} en {table}({', '.join(columns)}); las búsquedas harán escaneos completos")
+    if not missing:
+        logger.info("✅ Índices de búsqueda verificados")
+    return missing
@@ -0,0 +1,150 @@
+"""Backend SQLite para desarrollo local, instalaciones de una sola máquina y pruebas de carga.
+
+Adapta ``sqlite3`` a la parte de la API de ``mysql.connector`` que usa ``db.py``
+(cursores con ``dictionary=True``, ``start_transaction``, ``ping``...) para que
+el pool, los reintentos y los handlers funcionen igual con ambos backends. Los
+errores se traducen a las clases de ``mysql.connector.errors``, así que los
+``except mysql.connector.Error`` de los comandos siguen sirviendo.
+"""
+import datetime
+import functools
+import re
+import sqlite3
+
+from mysql.connector import errorcode, errors
+
+# Literales entre comillas (se dejan tal cual) o marcadores %s (pasan a ?)
+_PLACEHOLDER = re.compile(r"'(?:[^']|'')*'|%s")
+
+sqlite3.register_adapter(datetime.date, lambda value: value.isoformat())
+sqlite3.register_adapter(datetime.datetime, lambda value: value.isoformat(' '))
+sqlite3.register_converter('DATE', lambda value: datetime.date.fromisoformat(value.decode()))
+sqlite3.register_converter('DATETIME', lambda value: datetime.datetime.fromisoformat(value.decode()))
+
+
+@functools.lru_cache(maxsize=512)
+def translate(query):
+    """Convierte los marcadores ``%s`` de MySQL a los ``?`` de SQLite."""
+    return _PLACEHOLDER.sub(lambda match: '?' if match.group(0) == '%s' else match.group(0), query)
+
+
+def _translate_error(exc):
+    message = str(exc)
+    if isinstance(exc, sqlite3.IntegrityError):
+        errno = None
+        if 'UNIQUE' in message or 'PRIMARY KEY' in message:
+            errno = errorcode.ER_DUP_ENTRY
+        elif 'FOREIGN KEY' in message:
+            errno = errorcode.ER_NO_REFERENCED_ROW_2
+        return errors.IntegrityError(msg=message, errno=errno)
+    if isinstance(exc, sqlite3.OperationalError):
+        if 'locked' in message or 'busy' in message:
+            # Se trata como una espera de bloqueo de MySQL para que db.py lo reintente
+            return errors.OperationalError(msg=message, errno=errorcode.ER_LOCK_WAIT_TIMEOUT)
+        return errors.ProgrammingError(msg=message)
+    return errors.DatabaseError(msg=message)
+
+
+class SQLiteCursor:
+    """Cursor de sqlite3 con la interfaz de los cursores de mysql.connector."""
+
+    def __init__(self, raw_cursor, dictionary=False):
+        self._cursor = raw_cursor
+        self._dictionary = dictionary
+
+    @property
+    def column_names(self):
+        return tuple(column[0] for column in self._cursor.description or ())
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def execute(self, query, params=()):
+        try:
+            self._cursor.execute(translate(query), tuple(params or ()))
+        except sqlite3.Error as e:
+            raise _translate_error(e) from e
+
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return dict(zip(self.column_names, row))
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchall(self):
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """Conexión sqlite3 en modo autocommit; las transacciones se abren con start_transaction()."""
+
+    def __init__(self, raw_connection):
+        self._conn = raw_connection
+
+    @property
+    def autocommit(self):
+        return not self._conn.in_transaction
+
+    @autocommit.setter
+    def autocommit(self, value):
+        # Con isolation_level=None sqlite3 ya confirma cada sentencia fuera de BEGIN
+        pass
+
+    @property
+    def in_transaction(self):
+        return self._conn.in_transaction
+
+    def cursor(self, dictionary=False, buffered=False, prepared=False):
+        if prepared:
+            raise errors.NotSupportedError("SQLite no usa cursores preparados (sqlite3 ya cachea las sentencias)")
+        return SQLiteCursor(self._conn.cursor(), dictionary)
+
+    def start_transaction(self):
+        try:
+            # IMMEDIATE toma el lock de escritura al inicio y evita deadlocks entre conexiones
+            self._conn.execute('BEGIN IMMEDIATE')
+        except sqlite3.Error as e:
+            raise _translate_error(e) from e
+
+    def commit(self):
+        try:
+            self._conn.commit()
+        except sqlite3.Error as e:
+            raise _translate_error(e) from e
+
+    def rollback(self):
+        try:
+            self._conn.rollback()
+        except sqlite3.Error as e:
+            raise _translate_error(e) from e
+
+    def ping(self, reconnect=False):
+        try:
+            self._conn.execute('SELECT 1').fetchone()
+        except sqlite3.Error as e:
+            raise _translate_error(e) from e
+
+    def close(self):
+        self._conn.close()
+
+
+def connect(database, timeout=5.0, cached_statements=128):
+    """Abre una conexión al archivo ``database`` (``:memory:`` usa una base compartida en memoria)."""
+    uri = False
+    if database == ':memory:':
+        # Cada conexión del pool debe ver la misma base de datos en memoria
+        database, uri = 'file:strpbot?mode=memory&cache=shared', True
+    raw = sqlite3.connect(database, timeout=timeout, isolation_level=None, check_same_thread=False,
+                          detect_types=sqlite3.PARSE_DECLTYPES, cached_statements=cached_statements,
+                          uri=uri)
+    return SQLiteConnection(raw)
@@ -0,0 +1,172 @@
+"""Validación de RUT, placas, años y fechas de nacimiento, fila a fila o por columnas.
+
+Los handlers usan las funciones escalares (``validar_placa``, ``validar_anio``...).
+Las versiones por lotes (``validar_ruts``, ``validar_placas``...) reciben una
+columna completa, por ejemplo de una importación o de una auditoría del
+registro, y devuelven una lista alineada con la entrada; ``auditar`` junta las
+filas inválidas de varias columnas.
+
+No hay dependencias externas: los patrones se compilan una sola vez, el dígito
+verificador sale de tablas precalculadas y las edades se calculan con enteros
+``AAAAMMDD`` en lugar de armar un ``datetime`` por fila.
+"""
+import re
+from datetime import date
+
+EDAD_MINIMA = 18
+EDAD_MAXIMA = 80
+ANIO_MINIMO = 1900
+
+PATRON_PLACA = re.compile(r'[A-Z]{3}-\d{3}')
+PATRON_RUT = re.compile(r'(\d{7,8})-([\dK])')
+# Mismo formato que acepta ``strptime("%d-%m-%Y")``: día y mes de uno o dos dígitos
+PATRON_FECHA = re.compile(r'(\d{1,2})-(\d{1,2})-(\d{4})')
+
+# Dígito verificador según el resto de la suma ponderada módulo 11
+_DV = '0K987654321'
+# Suma ponderada de los 4 dígitos bajos (factores 2, 3, 4, 5) y de los 4 altos (6, 7, 2, 3)
+_SUMA_BAJA = [2 * (n % 10) + 3 * (n // 10 % 10) + 4 * (n // 100 % 10) + 5 * (n // 1000) for n in range(10000)]
+_SUMA_ALTA = [6 * (n % 10) + 7 * (n // 10 % 10) + 2 * (n // 100 % 10) + 3 * (n // 1000) for n in range(10000)]
+_DIAS_MES = (0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+
+def calcular_digito_verificador(rut_base):
+    """Calcula el dígito verificador para un RUT."""
+    rut_base = int(rut_base)
+    if rut_base >= 100_000_000:
+        # Fuera del rango de los RUT: se aplica la serie de factores completa
+        factores = [2, 3, 4, 5, 6, 7, 2, 3]
+        suma = sum(int(digito) * factores[i % 8] for i, digito in enumerate(str(rut_base)[::-1]))
+    else:
+        suma = _SUMA_BAJA[rut_base % 10000] + _SUMA_ALTA[rut_base // 10000]
+    return _DV[suma % 11]
+
+
+def validar_rut(rut):
+    """Valida el formato ``12345678-5`` y el dígito verificador."""
+    coincidencia = PATRON_RUT.fullmatch(rut.upper()) if isinstance(rut, str) else None
+    if coincidencia is None:
+        return False
+    base, dv = coincidencia.groups()
+    return calcular_digito_verificador(base) == dv
+
+
+def validar_placa(placa):
+    """Valida que la placa tenga el formato ABC-123"""
+    return isinstance(placa, str) and PATRON_PLACA.fullmatch(placa) is not None
+
+
+def validar_anio(anio_str, anio_actual=None):
+    """Valida que el año sea un número entre 1900 y el año actual + 1"""
+    try:
+        anio = int(anio_str)
+    except (TypeError, ValueError):
+        return False, None
+    anio_actual = anio_actual or date.today().year
+    return ANIO_MINIMO <= anio <= anio_actual + 1, anio
+
+
+def _fecha_entera(fecha_str):
+    """``AAAAMMDD`` de una fecha ``DD-MM-AAAA`` existente, o None."""
+    coincidencia = PATRON_FECHA.fullmatch(fecha_str) if isinstance(fecha_str, str) else None
+    if coincidencia is None:
+        return None
+    dia, mes, anio = map(int, coincidencia.groups())
+    if not 1 <= mes <= 12 or anio < 1:
+        return None
+    bisiesto = anio % 4 == 0 and (anio % 100 != 0 or anio % 400 == 0)
+    if not 1 <= dia <= (29 if mes == 2 and bisiesto else _DIAS_MES[mes]):
+        return None
+    return anio * 10000 + mes * 100 + dia
+
+
+def _hoy_entero(hoy):
+    hoy = hoy or date.today()
+    return hoy.year * 10000 + hoy.month * 100 + hoy.day
+
+
+def validar_fecha_nacimiento(fecha_str, hoy=None):
+    """``(valida, edad)`` para una fecha ``DD-MM-AAAA``; válida si la edad está entre 18 y 80 años."""
+    fecha = _fecha_entera(fecha_str)
+    if fecha is None:
+        return False, None
+    # Con fechas AAAAMMDD la resta en decenas de miles es la edad cumplida
+    edad = (_hoy_entero(hoy) - fecha) // 10000
+    if EDAD_MINIMA <= edad <= EDAD_MAXIMA:
+        return True, edad
+    return False, None
+
+
+def validar_numero_pisos(pisos_str):
+    """Valida que el número de pisos sea un entero positivo"""
+    try:
+        pisos = int(pisos_str)
+        return pisos > 0, pisos
+    except (TypeError, ValueError):
+        return False, None
+
+
+def validar_ruts(ruts):
+    """``validar_rut`` sobre una columna: lista de bools alineada con ``ruts``."""
+    fullmatch = PATRON_RUT.fullmatch
+    suma_baja, suma_alta = _SUMA_BAJA, _SUMA_ALTA
+    resultados = []
+    for rut in ruts:
+        coincidencia = fullmatch(rut.upper()) if isinstance(rut, str) else None
+        if coincidencia is None:
+            resultados.append(False)
+            continue
+        base = int(coincidencia.group(1))
+        resultados.append(_DV[(suma_baja[base % 10000] + suma_alta[base // 10000]) % 11] == coincidencia.group(2))
+    return resultados
+
+
+def validar_placas(placas):
+    """``validar_placa`` sobre una columna: lista de bools alineada con ``placas``."""
+    fullmatch = PATRON_PLACA.fullmatch
+    return [isinstance(placa, str) and fullmatch(placa) is not None for placa in placas]
+
+
+def validar_anios(anios, anio_actual=None):
+    """``validar_anio`` sobre una columna: lista de ``(valido, anio)``."""
+    anio_actual = anio_actual or date.today().year
+    return [validar_anio(anio, anio_actual) for anio in anios]
+
+
+def validar_fechas_nacimiento(fechas, hoy=None):
+    """``validar_fecha_nacimiento`` sobre una columna: lista de ``(valida, edad)``."""
+    hoy = _hoy_entero(hoy)
+    resultados = []
+    for fecha in map(_fecha_entera, fechas):
+        edad = None if fecha is None else (hoy - fecha) // 10000
+        if edad is not None and EDAD_MINIMA <= edad <= EDAD_MAXIMA:
+            resultados.append((True, edad))
+        else:
+            resultados.append((False, None))
+    return resultados
+
+
+# Validador por lotes de cada columna que conoce ``auditar``
+VALIDADORES = {
+    'rut': validar_ruts,
+    'placa': validar_placas,
+    'anio': validar_anios,
+    'fecha_nacimiento': validar_fechas_nacimiento,
+}
+
+
+def _es_valido(resultado):
+    return resultado[0] if isinstance(resultado, tuple) else resultado
+
+
+def auditar(columnas):
+    """Índices de las filas inválidas por columna: ``{'rut': [3, 17], 'placa': []}``.
+
+    ``columnas`` asocia el nombre de cada columna de ``VALIDADORES`` con sus
+    valores; las columnas que no tienen validador se ignoran.
+    """
+    return {
+        nombre: [i for i, resultado in enumerate(VALIDADORES[nombre](valores)) if not _es_valido(resultado)]
+        for nombre, valores in columnas.items()
+        if nombre in VALIDADORES
+    }
@@ -0,0 +1,102 @@
+"""Buffer de escritura para filas de auditoría de solo anexado (group commit).
+
+Los comandos agregan filas con ``add`` sin esperar a la base de datos; una tarea
+en segundo plano las escribe con INSERT de varias filas cada ``flush_interval``
+segundos o apenas se juntan ``max_batch`` filas. La cola está acotada a
+``max_pending`` filas: si la base de datos no da abasto, las filas nuevas se
+descartan y se cuentan en lugar de crecer sin límite.
+"""
+import asyncio
+import logging
+from collections import deque
+
+import db
+
+logger = logging.getLogger('bot.write_buffer')
+
+
+class InsertBuffer:
+    """Acumula inserciones para una tabla y las confirma en lotes."""
+
+    def __init__(self, table, columns, flush_interval=0.5, max_batch=100, max_pending=5000):
+        if max_batch < 1 or max_pending < max_batch:
+            raise ValueError(f"Límites inválidos: max_batch={max_batch}, max_pending={max_pending}")
+        self.table = table
+        self.columns = tuple(columns)
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self._pending = deque()
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._closing = False
+        self._flush_lock = asyncio.Lock()
+        self._row_placeholder = '(' + ', '.join(['%s'] * len(self.columns)) + ')'
+        self.written = 0
+        self.dropped = 0
+
+    def add(self, *values):
+        """Encola una fila; devuelve False si se descartó porque el buffer está lleno."""
+        if len(values) != len(self.columns):
+            raise ValueError(f"{self.table} espera {len(self.columns)} valores, se recibieron {len(values)}")
+        if len(self._pending) >= self.max_pending:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 100 == 0:
+                logger.warning(f"Buffer de {self.table} lleno; {self.dropped} filas descartadas en total")
+            return False
+        self._pending.append(values)
+        if len(self._pending) >= self.max_batch:
+            self._wakeup.set()
+        return True
+
+    def start(self):
+        """Inicia la tarea que vacía el buffer periódicamente."""
+        if self._task is None or self._task.done():
+            self._closing = False
+            self._task = asyncio.create_task(self._run(), name=f'write_buffer:{self.table}')
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        """Escribe todas las filas pendientes en lotes de hasta ``max_batch``."""
+        async with self._flush_lock:
+            while self._pending:
+                batch = [self._pending.popleft() for _ in range(min(self.max_batch, len(self._pending)))]
+                query = (
+                    f"INSERT INTO {self.table} ({', '.join(self.columns)}) VALUES "
+                    + ', '.join([self._row_placeholder] * len(batch))
+                )
+                params = [value for row in batch for value in row]
+                try:
+                    # Cada tamaño de lote es un texto distinto; no vale la pena prepararlo
+                    await db.execute(query, params, prepared=False)
+                except Exception as e:
+                    # Se devuelven al frente de la cola (hasta donde quepan) para el próximo intento
+                    space = self.max_pending - len(self._pending)
+                    self._pending.extendleft(reversed(batch[:space]))
+                    self.dropped += len(batch) - min(space, len(batch))
+                    logger.error(f"Error al escribir {len(batch)} filas en {self.table}: {e}")
+                    return
+                self.written += len(batch)
+
+    async def close(self):
+        """Detiene la tarea periódica y escribe lo que quede pendiente."""
+        if self._task is not None:
+            # No se cancela la tarea para no perder un lote a mitad de escritura
+            self._closing = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+        if self._pending:
+            logger.error(f"Se perdieron {len(self._pending)} filas de {self.table} al cerrar")
+
+    def stats(self):
+        return {'pending': len(self._pending), 'written': self.written, 'dropped': self.dropped}